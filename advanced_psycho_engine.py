@@ -10,70 +10,383 @@ import time
 import random
 import math
 import os
+import re
+import zlib
+import hashlib
+import heapq
+import queue
+import threading
+import weakref
+import dataclasses
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, ClassVar, Callable, Mapping, Iterator, Tuple
+from collections.abc import Mapping as MappingABC
 
 # ----------------- Конфигурация -----------------
+@dataclass(frozen=True)
 class PsychoConfig:
+    """Неизменяемая конфигурация одного движка. Проверяется и досчитывается один
+    раз при создании; смена конфигурации — это подмена объекта целиком
+    (AdvancedPsychoEngine.reload_config), а не правка атрибутов класса."""
     # decay rates (per second)
-    DECAY_FAST = 0.06       # для panic
-    DECAY_SLOW = 0.008      # для malice/obsession
-    CORRUPTION_DRIFT = 0.0005  # corruption медленно растёт по дефолту
-    ENERGY_RECOVERY_RATE = 0.01
-    ENERGY_COST_PER_ACTION = 0.06
-    TRANSITION_HYSTERESIS = 0.08
-    TRANSITION_DELAY = 6.0  # секунда "минимального" времени перед сменой защиты снова
-    WEIGHT_THREAT = 0.15
-    WEIGHT_SUPPORT = 0.06
-    WEIGHT_BELIYTOPORIK = 0.28
-    MAX_EPISODE_HISTORY = 1000
-    PERSIST_VERSION = 3
-    SEED = None  # deterministic tests if set
-    CONFIG_FILE = "psycho_config.json"
+    DECAY_FAST: float = 0.06       # для panic
+    DECAY_SLOW: float = 0.008      # для malice/obsession
+    CORRUPTION_DRIFT: float = 0.0005  # corruption медленно растёт по дефолту
+    ENERGY_RECOVERY_RATE: float = 0.01
+    ENERGY_COST_PER_ACTION: float = 0.06
+    TRANSITION_HYSTERESIS: float = 0.08
+    TRANSITION_DELAY: float = 6.0  # секунда "минимального" времени перед сменой защиты снова
+    WEIGHT_THREAT: float = 0.15
+    WEIGHT_SUPPORT: float = 0.06
+    WEIGHT_BELIYTOPORIK: float = 0.28
+    MAX_EPISODE_HISTORY: int = 1000
+    DEDUP_SIMILARITY: float = 0.8     # оценка Jaccard (MinHash), выше которой эпизоды считаются повтором
+    REINFORCE_SALIENCE: float = 0.15  # насколько повтор усиливает salience существующего эпизода
+    PERSIST_VERSION: int = 3
+    SEED: Optional[int] = None  # deterministic tests if set
+    # derived (считаются в __post_init__)
+    DECAY_OBSESSION: float = field(init=False, default=0.0)
+    ENERGY_DRAIN_PANIC: float = field(init=False, default=0.0)
+
+    CONFIG_FILE: ClassVar[str] = "psycho_config.json"
+    _DERIVED: ClassVar[tuple] = ("DECAY_OBSESSION", "ENERGY_DRAIN_PANIC")
+
+    def __post_init__(self):
+        for f in fields(self):
+            if f.name in self._DERIVED or f.name == "SEED":
+                continue
+            v = getattr(self, f.name)
+            if f.type is int:
+                if isinstance(v, bool) or not isinstance(v, (int, float)) or int(v) != v:
+                    raise ValueError(f"{f.name} must be an integer, got {v!r}")
+                object.__setattr__(self, f.name, int(v))
+            else:
+                if isinstance(v, bool) or not isinstance(v, (int, float)) or math.isnan(v):
+                    raise ValueError(f"{f.name} must be a number, got {v!r}")
+                object.__setattr__(self, f.name, float(v))
+            if getattr(self, f.name) < 0:
+                raise ValueError(f"{f.name} must be >= 0")
+        if self.MAX_EPISODE_HISTORY < 1:
+            raise ValueError("MAX_EPISODE_HISTORY must be >= 1")
+        if not 0.0 < self.DEDUP_SIMILARITY <= 1.0:
+            raise ValueError("DEDUP_SIMILARITY must be in (0, 1]")
+        if self.REINFORCE_SALIENCE > 1.0:
+            raise ValueError("REINFORCE_SALIENCE must be <= 1")
+        if self.SEED is not None and (isinstance(self.SEED, bool) or not isinstance(self.SEED, int)):
+            raise ValueError(f"SEED must be an integer or null, got {self.SEED!r}")
+        object.__setattr__(self, "DECAY_OBSESSION", self.DECAY_SLOW * 0.8)
+        object.__setattr__(self, "ENERGY_DRAIN_PANIC", self.ENERGY_COST_PER_ACTION * 0.2)
 
     @classmethod
-    def load_from_file(cls, path: Optional[str] = None):
-        p = path or cls.CONFIG_FILE
-        if os.path.exists(p):
-            try:
-                with open(p, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                for k, v in data.items():
-                    if hasattr(cls, k):
-                        setattr(cls, k, v)
-            except Exception:
-                pass
+    def from_dict(cls, data: Dict[str, Any]) -> "PsychoConfig":
+        known = {f.name for f in fields(cls) if f.init}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+    @classmethod
+    def default_path(cls) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), cls.CONFIG_FILE)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "PsychoConfig":
+        """Конфигурация из JSON (неизвестные ключи игнорируются). Нет файла — дефолты;
+        битый файл или неверные значения — ValueError."""
+        p = path or cls.default_path()
+        if not os.path.exists(p):
+            return cls()
+        try:
+            with open(p, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"cannot read {p}: {e}") from e
+        if not isinstance(data, dict):
+            raise ValueError(f"{p}: expected a JSON object")
+        return cls.from_dict(data)
+
+    def replace(self, **changes) -> "PsychoConfig":
+        return dataclasses.replace(self, **changes)
+
+# ----------------- Episode fingerprints (дедупликация) -----------------
+# Нормализованный текст -> точный отпечаток (blake2b) + MinHash по символьным
+# 3-граммам для поиска почти-дубликатов через LSH (полосы по _MINHASH_ROWS строк).
+_NORMALIZE_RE = re.compile(r"[\W_]+", re.UNICODE)
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_PERMS = 32
+_MINHASH_ROWS = 4
+_SHINGLE_SIZE = 3
+_SHINGLE_LIMIT = 512  # длинные эпизоды шинглуем только по началу
+_perm_rng = random.Random(1025)
+_MINHASH_COEFFS = [(_perm_rng.randrange(1, _MINHASH_PRIME), _perm_rng.randrange(0, _MINHASH_PRIME))
+                   for _ in range(_MINHASH_PERMS)]
+del _perm_rng
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(_NORMALIZE_RE.sub(" ", (text or "").lower()).split())
+
+
+def _fingerprint(norm: str) -> str:
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _minhash(norm: str) -> tuple:
+    norm = norm[:_SHINGLE_LIMIT]
+    if len(norm) <= _SHINGLE_SIZE:
+        shingles = {norm}
+    else:
+        shingles = {norm[i:i + _SHINGLE_SIZE] for i in range(len(norm) - _SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(sh.encode("utf-8")) for sh in shingles]
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_COEFFS)
+
+
+def _minhash_similarity(a: tuple, b: tuple) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _lsh_bands(sig: tuple):
+    for i in range(0, len(sig), _MINHASH_ROWS):
+        yield (i, sig[i:i + _MINHASH_ROWS])
+
+
+# ----------------- Clock -----------------
+class Clock(ABC):
+    """Источник времени движка (секунды epoch). Подменяется в симуляции."""
+
+    @abstractmethod
+    def time(self) -> float:
+        ...
+
+    @abstractmethod
+    def sleep(self, seconds: float):
+        ...
+
+
+class SystemClock(Clock):
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Ручные часы: время идёт только через advance()/sleep(), поэтому часы
+    разговора и сутки затухания травмы проматываются мгновенно."""
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self._now = float(start)
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> float:
+        if seconds < 0:
+            raise ValueError("virtual time cannot go backwards")
+        with self._lock:
+            self._now += seconds
+            return self._now
+
+    def sleep(self, seconds: float):
+        self.advance(max(0.0, seconds))
+
+    def set(self, t: float) -> float:
+        """Перевести часы на t (только вперёд; более раннее t игнорируется)."""
+        with self._lock:
+            self._now = max(self._now, float(t))
+            return self._now
+
+
+class TurnClock(Clock):
+    """Живые часы ядра: между ходами идут по системному времени (простой и
+    интервал сохранения у фонового обслуживания меряются честно), а на время
+    хода стоят (hold/release): все чтения внутри хода дают одно значение, и
+    записанный ход воспроизводится точно. Назад не идут."""
+
+    def __init__(self):
+        self._last = 0.0
+        self._held: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _now(self) -> float:
+        with self._lock:
+            self._last = max(self._last, time.time())
+            return self._last
+
+    def time(self) -> float:
+        held = self._held
+        return held if held is not None else self._now()
+
+    def hold(self) -> float:
+        """Остановить часы на текущем времени до release()."""
+        self._held = self._now()
+        return self._held
+
+    def release(self):
+        self._held = None
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+_TOP_CACHE_SIZE = 8
+
+
+def _top_key(e: Dict[str, Any]):
+    return (e["salience"], e["time"])
 
-# попытка загрузить локальный config (если есть)
-PsychoConfig.load_from_file()
 
 # ----------------- Memory Module (улучшенный) -----------------
 class MemoryModule:
-    def __init__(self):
+    def __init__(self, config: Optional[PsychoConfig] = None, clock: Optional[Clock] = None):
+        self.config = config or PsychoConfig()
+        self.clock = clock or SYSTEM_CLOCK
         self.episodes: List[Dict[str, Any]] = []
         # semantic storage: key -> {value, confidence, last_seen}
         self.semantic: Dict[str, Dict[str, Any]] = {}
+        # dedup index: fp -> episode, fp -> minhash, lsh band -> [episodes]
+        self._by_fp: Dict[str, Dict[str, Any]] = {}
+        self._sigs: Dict[str, tuple] = {}
+        self._lsh: Dict[tuple, List[Dict[str, Any]]] = {}
+        # эпизоды, загруженные с диска, попадают в LSH лениво (MinHash недешёв)
+        self._lsh_pending: Dict[str, Dict[str, Any]] = {}
+        # кэш самых салиентных эпизодов (ведёт фоновое обслуживание, см. refresh_top);
+        # None — кэша нет, recall_top сортирует всю память
+        self._top: Optional[List[Dict[str, Any]]] = None
 
     def remember_episode(self, text: str, salience: float = 0.5, tags: Optional[List[str]] = None):
+        """Запомнить эпизод. Повтор (точный или почти-дубликат) не добавляет новую
+        запись, а усиливает salience и счётчик уже существующей."""
         if tags is None:
             tags = []
+        text = text[:2000]
+        salience = float(_clamp(salience, 0.0, 1.0))
+        norm = _normalize_text(text)
+        fp = _fingerprint(norm)
+        sig = None
+        ep = self._by_fp.get(fp)
+        if ep is None:
+            sig = _minhash(norm)
+            ep = self._find_near_duplicate(sig)
+        if ep is not None:
+            self._reinforce(ep, salience, tags, count=1, seen=self.clock.time())
+            self._touch_top(ep)
+            return ep
         ep = {
-            "time": time.time(),
-            "text": text[:2000],
-            "salience": float(_clamp(salience, 0.0, 1.0)),
+            "time": self.clock.time(),
+            "text": text,
+            "salience": salience,
             "tags": list(tags),
-            "consolidated": False
+            "consolidated": False,
+            "count": 1,
+            "fp": fp
         }
         self.episodes.append(ep)
-        if len(self.episodes) > PsychoConfig.MAX_EPISODE_HISTORY:
+        self._index(ep, sig)
+        while len(self.episodes) > self.config.MAX_EPISODE_HISTORY:
             # keep newest
-            self.episodes = self.episodes[-PsychoConfig.MAX_EPISODE_HISTORY:]
+            self._unindex(self.episodes.pop(0))
+        self._touch_top(ep)
         return ep
 
+    def index_pending(self):
+        """Досчитать MinHash эпизодов, загруженных с диска (фоном или перед первым поиском)."""
+        if self._lsh_pending:
+            pending, self._lsh_pending = self._lsh_pending, {}
+            for ep in pending.values():
+                self._index_lsh(ep, _minhash(_normalize_text(ep["text"])))
+
+    def _find_near_duplicate(self, sig: tuple) -> Optional[Dict[str, Any]]:
+        self.index_pending()
+        best, best_sim = None, self.config.DEDUP_SIMILARITY
+        seen = set()
+        for band in _lsh_bands(sig):
+            for cand in self._lsh.get(band, ()):
+                if id(cand) in seen:
+                    continue
+                seen.add(id(cand))
+                sim = _minhash_similarity(sig, self._sigs[cand["fp"]])
+                if sim >= best_sim:
+                    best, best_sim = cand, sim
+        return best
+
+    def _reinforce(self, ep: Dict[str, Any], salience: float, tags: List[str], count: int, seen: float):
+        base = max(ep["salience"], salience)
+        ep["salience"] = float(_clamp(base + self.config.REINFORCE_SALIENCE * (1.0 - base)))
+        ep["count"] = ep.get("count", 1) + count
+        ep["time"] = max(ep["time"], seen)
+        for t in tags:
+            if t not in ep["tags"]:
+                ep["tags"].append(t)
+        # повтор делает эпизод "свежим": переносим в конец, чтобы его не вытеснило первым
+        for i in range(len(self.episodes) - 1, -1, -1):
+            if self.episodes[i] is ep:
+                del self.episodes[i]
+                break
+        self.episodes.append(ep)
+
+    def _index(self, ep: Dict[str, Any], sig: Optional[tuple] = None):
+        self._by_fp[ep["fp"]] = ep
+        if sig is None:
+            self._lsh_pending[ep["fp"]] = ep
+        else:
+            self._index_lsh(ep, sig)
+
+    def _index_lsh(self, ep: Dict[str, Any], sig: tuple):
+        self._sigs[ep["fp"]] = sig
+        for band in _lsh_bands(sig):
+            self._lsh.setdefault(band, []).append(ep)
+
+    def _unindex(self, ep: Dict[str, Any]):
+        if self._top is not None:
+            self._top[:] = [e for e in self._top if e is not ep]
+        fp = ep.get("fp")
+        if self._by_fp.get(fp) is not ep:
+            return
+        del self._by_fp[fp]
+        if self._lsh_pending.pop(fp, None) is not None:
+            return
+        sig = self._sigs.pop(fp)
+        for band in _lsh_bands(sig):
+            bucket = self._lsh.get(band)
+            if bucket is None:
+                continue
+            bucket[:] = [e for e in bucket if e is not ep]
+            if not bucket:
+                del self._lsh[band]
+
     def recall_top(self, top_k: int = 3, min_salience: float = 0.0) -> List[Dict[str, Any]]:
-        filtered = [e for e in self.episodes if e["salience"] >= min_salience]
-        filtered.sort(key=lambda x: (x["salience"], x["time"]), reverse=True)
-        return filtered[:top_k]
+        top = self._top
+        # кэш — точные top-m эпизодов: ответ из него верен, если он покрывает top_k
+        # или вся память в нём (остальные эпизоды не салиентнее последнего в кэше)
+        if top is not None and (len(top) >= top_k or len(top) >= len(self.episodes)):
+            return [e for e in top if e["salience"] >= min_salience][:top_k]
+        return heapq.nlargest(top_k, (e for e in self.episodes if e["salience"] >= min_salience), key=_top_key)
+
+    def refresh_top(self):
+        """Пересчитать кэш top-эпизодов (O(n log n) — вызывать вне горячего пути)."""
+        self._top = sorted(self.episodes, key=_top_key, reverse=True)[:_TOP_CACHE_SIZE]
+
+    def drop_top(self):
+        self._top = None
+
+    def _touch_top(self, ep: Dict[str, Any]):
+        """Эпизод добавлен или усилен: поправить кэш за O(k), не трогая остальную память."""
+        top = self._top
+        if top is None:
+            return
+        top[:] = [e for e in top if e is not ep]
+        # всё, чего нет в кэше, не выше его последнего элемента; ep вставляем, только если
+        # он выше этой границы или вне кэша больше ничего нет
+        if len(top) + 1 >= len(self.episodes) or (top and _top_key(ep) > _top_key(top[-1])):
+            top.append(ep)
+            top.sort(key=_top_key, reverse=True)
+            del top[_TOP_CACHE_SIZE:]
 
     def recall_by_keyword(self, query: str, top_k: int = 3):
         q = query.lower()
@@ -92,7 +405,7 @@ class MemoryModule:
         return [e for _, e in scored[:top_k]]
 
     def remember_fact(self, key: str, value: Any, confidence: float = 0.8):
-        self.semantic[key] = {"value": value, "confidence": float(_clamp(confidence, 0.0, 1.0)), "last_seen": time.time()}
+        self.semantic[key] = {"value": value, "confidence": float(_clamp(confidence, 0.0, 1.0)), "last_seen": self.clock.time()}
 
     def recall_fact(self, key: str):
         ent = self.semantic.get(key)
@@ -139,8 +452,29 @@ class MemoryModule:
         return {"episodes": self.episodes, "semantic": self.semantic}
 
     def import_state(self, data: Dict[str, Any]):
-        self.episodes = data.get("episodes", [])
         self.semantic = data.get("semantic", {})
+        self.episodes = []
+        self._by_fp, self._sigs, self._lsh, self._lsh_pending = {}, {}, {}, {}
+        self._top = None
+        # пересобираем индекс; дубликаты из старых сохранений (до дедупликации) сливаем.
+        # Эпизоды с "fp" уже прошли дедупликацию — им MinHash посчитаем лениво.
+        for ep in sorted(data.get("episodes", []), key=lambda e: e.get("time", 0.0)):
+            norm = _normalize_text(ep.get("text", ""))
+            fp = _fingerprint(norm)
+            sig = None
+            dup = self._by_fp.get(fp)
+            if dup is None and "fp" not in ep:
+                sig = _minhash(norm)
+                dup = self._find_near_duplicate(sig)
+            if dup is not None:
+                self._reinforce(dup, ep.get("salience", 0.0), ep.get("tags", []),
+                                count=ep.get("count", 1), seen=ep.get("time", 0.0))
+                continue
+            ep["fp"] = fp
+            ep.setdefault("count", 1)
+            ep.setdefault("tags", [])
+            self.episodes.append(ep)
+            self._index(ep, sig)
 
 # ----------------- Perception -----------------
 class Perception:
@@ -203,11 +537,156 @@ class ManipulationManager:
             ]
         return "NONE", []
 
+# ----------------- Background maintenance -----------------
+MAINTENANCE_INTERVAL = 1.0   # как часто фоновый поток обходит движки, с
+SAVE_INTERVAL = 5.0          # не чаще одного сохранения на движок за столько секунд
+IDLE_CONSOLIDATE = 15.0      # консолидация памяти — после такой паузы в разговоре
+
+
+class MaintenanceWorker:
+    """Один фоновый поток на процесс (или на сервер с сотнями сессий): затухание
+    памяти, консолидация в простое, пересчёт кэшей и сохранение на диск с
+    коалесцированием. Движок без воркера делает всё это прямо в perceive()."""
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL, save_interval: float = SAVE_INTERVAL,
+                 idle_consolidate: float = IDLE_CONSOLIDATE):
+        self.interval = interval
+        self.save_interval = save_interval
+        self.idle_consolidate = idle_consolidate
+        self._engines = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MaintenanceWorker":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="psycho-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def register(self, engine: "AdvancedPsychoEngine"):
+        with self._lock:
+            self._engines.add(engine)
+
+    def unregister(self, engine: "AdvancedPsychoEngine"):
+        with self._lock:
+            self._engines.discard(engine)
+
+    def notify(self):
+        self._wake.set()
+
+    def run_once(self):
+        with self._lock:
+            engines = list(self._engines)
+        for engine in engines:
+            try:
+                engine.maintain(self.save_interval, self.idle_consolidate)
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.run_once()
+
+    def stop(self, flush: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        if flush:
+            with self._lock:
+                engines = list(self._engines)
+            for engine in engines:
+                try:
+                    engine.maintain(0.0, float("inf"))
+                except Exception:
+                    pass
+
+
+# ----------------- Lazy decision -----------------
+class LazyMapping(MappingABC):
+    """Read-only dict решения тика: дешёвые поля готовы сразу, остальные (инспектор,
+    обрывки памяти, блок промпта) собираются при первом обращении и кэшируются.
+    `in` и перебор ключей ничего не вычисляют. Всё берётся из EngineSnapshot тика,
+    поэтому и поздний доступ из другого потока описывает именно этот тик и не
+    трогает блокировку движка."""
+    __slots__ = ("_data", "_lazy")
+
+    def __init__(self, data: Dict[str, Any], lazy: Optional[Dict[str, Callable[[], Any]]] = None):
+        self._data = data
+        self._lazy = lazy or {}
+
+    def __getitem__(self, key):
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        fn = self._lazy[key]
+        return self._data.setdefault(key, fn())
+
+    def __contains__(self, key) -> bool:
+        return key in self._data or key in self._lazy
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._data
+        for k in self._lazy:
+            if k not in self._data:
+                yield k
+
+    def __len__(self) -> int:
+        return len(self._data) + sum(1 for k in self._lazy if k not in self._data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Вычислить всё и вернуть обычный dict (для JSON и логов)."""
+        return {k: v.to_dict() if isinstance(v, LazyMapping) else v for k, v in self.items()}
+
+    def __repr__(self) -> str:
+        return f"LazyMapping({self._data!r}, pending={[k for k in self._lazy if k not in self._data]})"
+
+
+# ----------------- Snapshots -----------------
+@dataclass(frozen=True)
+class EngineSnapshot:
+    """Неизменяемый срез состояния для читателей из других потоков (спиннер,
+    инспектор, плагины). Публикуется движком после каждой записи подменой
+    ссылки, поэтому читателю не нужны блокировки. top_memory и trauma_index
+    снимает с памяти писатель: читатель память не трогает."""
+    vectors: Mapping[str, float]
+    subvectors: Mapping[str, Mapping[str, float]]
+    energy: float
+    trust: float
+    defense: str
+    last_defense_change: float
+    time: float
+    version: int
+    top_memory: Tuple[Tuple[str, float], ...]  # (текст, salience) пяти самых салиентных эпизодов
+    trauma_index: float
+
+
 # ----------------- AdvancedPsychoEngine V3 -----------------
 class AdvancedPsychoEngine:
-    def __init__(self, state_path: str = "DATA/advanced_psycho_state_v3.json", seed: Optional[int] = None):
-        if PsychoConfig.SEED is not None:
-            seed = PsychoConfig.SEED
+    def __init__(self, state_path: str = "DATA/advanced_psycho_state_v3.json", seed: Optional[int] = None,
+                 config: Optional[PsychoConfig] = None, config_path: Optional[str] = None,
+                 clock: Optional[Clock] = None):
+        """config — готовая конфигурация этого движка; без неё читается config_path
+        (по умолчанию psycho_config.json рядом с движком), битый файл -> дефолты.
+        clock — источник времени (VirtualClock для симуляций), по умолчанию системный."""
+        self.clock = clock or SYSTEM_CLOCK
+        self.config_path = config_path or PsychoConfig.default_path()
+        self._config_mtime = self._config_file_mtime()
+        if config is None:
+            try:
+                config = PsychoConfig.from_file(self.config_path)
+            except ValueError:
+                config = PsychoConfig()
+        self.config = config
+        if config.SEED is not None:
+            seed = config.SEED
+        self.seed = seed
         self._rng = random.Random(seed)
         self.state_path = state_path
         # core vectors
@@ -233,31 +712,152 @@ class AdvancedPsychoEngine:
             ("obsession", "malice"): 0.03,
             ("hope", "panic"): -0.02
         }
-        self.memory = MemoryModule()
+        self.memory = MemoryModule(config, self.clock)
         self.manipulator = ManipulationManager(self)
-        self.last_update_time = time.time()
+        self.last_update_time = self.clock.time()
         self.episodes_since_save = 0
         self.last_defense_change = 0.0
+        # фоновое обслуживание (attach_maintenance); без него — всё внутри тика
+        self.maintenance: Optional[MaintenanceWorker] = None
+        self._pending_decay = 0.0
+        self._ticks_since_consolidate = 0
+        self._dirty = False
+        self._last_activity = self.clock.time()  # простой и интервал сохранения — по часам движка
+        self._last_save = self.clock.time()
+        self._trauma_cache = 0.0
+        # single-writer: состояние меняет только владелец (под _write_lock),
+        # остальные потоки шлют команды через submit() и читают self.snapshot
+        self._write_lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._commands: "queue.SimpleQueue[Callable[[AdvancedPsychoEngine], None]]" = queue.SimpleQueue()
+        self._snapshot_version = 0
+        self.trace = None  # attach_trace: запись каждого снимка во времени (vector_trace.py)
+        self.snapshot: EngineSnapshot = self._publish_snapshot()
         self.load_state()
 
     # public
-    def perceive(self, user_input: str, system_context: str = "") -> Dict[str, Any]:
+    def perceive(self, user_input: str, system_context: str = "") -> LazyMapping:
         signals = Perception.parse_text(user_input, system_context)
         salience = self._estimate_salience(signals)
-        if salience > 0.02 and user_input.strip():
-            self.memory.remember_episode(user_input, salience=salience, tags=[s["type"] for s in signals])
-        self._apply_perception(signals)
-        self._update_loop()
-        decision = self._decide_and_construct()
+        with self._write_lock:
+            self._drain_commands()
+            if salience > 0.02 and user_input.strip():
+                self.memory.remember_episode(user_input, salience=salience, tags=[s["type"] for s in signals])
+            self._apply_perception(signals)
+            self._update_loop()
+            decision = self._decide_and_construct(self._publish_snapshot())
         return decision
 
+    # ----- state-update channel -----
+    def submit(self, command: Callable[["AdvancedPsychoEngine"], None]):
+        """Поставить изменение состояния в очередь (из любого потока). Применит его
+        владелец движка — в начале следующего perceive() или в apply_pending()."""
+        self._commands.put(command)
+
+    def request_vector(self, name: str, value: float):
+        """Команда: выставить вектор (например, плагин фиксирует мгновенный срыв)."""
+        self.submit(lambda e: e._set_vector(name, value))
+
+    def request_fact(self, key: str, value: Any, confidence: float = 0.8):
+        """Команда: записать факт в семантическую память."""
+        self.submit(lambda e: e.memory.remember_fact(key, value, confidence))
+
+    def request_episode(self, text: str, salience: float = 0.5, tags: Optional[List[str]] = None):
+        """Команда: запомнить эпизод (например, сводку старой части разговора)."""
+        self.submit(lambda e: e.memory.remember_episode(text, salience=salience, tags=tags))
+
+    def apply_pending(self) -> int:
+        with self._write_lock:
+            n = self._drain_commands()
+            if n:
+                self._publish_snapshot()
+            return n
+
+    def _drain_commands(self) -> int:
+        n = 0
+        while True:
+            try:
+                cmd = self._commands.get_nowait()
+            except queue.Empty:
+                return n
+            try:
+                cmd(self)
+            except Exception:
+                pass
+            n += 1
+
+    def _set_vector(self, name: str, value: float):
+        if name in self.vectors:
+            self.vectors[name] = _clamp(value)
+
+    def _publish_snapshot(self) -> EngineSnapshot:
+        self._snapshot_version += 1
+        now = self.clock.time()
+        # с воркером обслуживания оба поля берутся из его кэшей (O(k)), без него — O(n), как и тик
+        top = self.memory.recall_top(5, min_salience=0.02)
+        snap = EngineSnapshot(
+            vectors=MappingProxyType(dict(self.vectors)),
+            subvectors=MappingProxyType({k: MappingProxyType(dict(v)) for k, v in self.subvectors.items()}),
+            energy=float(self.energy),
+            trust=float(self.trust_score),
+            defense=self.current_defense,
+            last_defense_change=self.last_defense_change,
+            time=now,
+            version=self._snapshot_version,
+            top_memory=tuple((e["text"], float(e["salience"])) for e in top),
+            trauma_index=self._compute_trauma_index(now),
+        )
+        self.snapshot = snap
+        if self.trace is not None:
+            self.trace.record(snap)
+        return snap
+
+    def attach_trace(self, trace):
+        """Писать каждый опубликованный снимок в trace.record(snapshot) (None — не писать)."""
+        with self._write_lock:
+            self.trace = trace
+
+    def reload_config(self, config: Optional[PsychoConfig] = None) -> PsychoConfig:
+        """Атомарно подменить конфигурацию этого движка (другие движки не затрагиваются).
+        Без аргумента перечитывает config_path; при ошибке валидации бросает
+        ValueError и оставляет старую конфигурацию."""
+        if config is None:
+            config = PsychoConfig.from_file(self.config_path)
+            self._config_mtime = self._config_file_mtime()
+        with self._write_lock:
+            self.config = config
+            self.memory.config = config
+        return config
+
+    def reload_config_if_changed(self) -> bool:
+        mtime = self._config_file_mtime()
+        if mtime == self._config_mtime:
+            return False
+        self._config_mtime = mtime
+        try:
+            self.reload_config()
+        except ValueError:
+            return False
+        return True
+
+    def _config_file_mtime(self) -> float:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return 0.0
+
     def emergency_reset(self):
-        self.vectors = {"panic": 0.1, "corruption": 0.0, "malice": 0.0, "hope": 0.6, "obsession": 0.0}
-        self.subvectors = {"panic": {"startle": 0.0, "dread": 0.0}, "malice": {"reactive": 0.0, "cold_hatred": 0.0}}
-        self.energy = 1.0
-        self.current_defense = "RATIONALIZATION"
-        self.trust_score = 50.0
-        self.memory = MemoryModule()
+        with self._write_lock:
+            self.vectors = {"panic": 0.1, "corruption": 0.0, "malice": 0.0, "hope": 0.6, "obsession": 0.0}
+            self.subvectors = {"panic": {"startle": 0.0, "dread": 0.0}, "malice": {"reactive": 0.0, "cold_hatred": 0.0}}
+            self.energy = 1.0
+            self.current_defense = "RATIONALIZATION"
+            self.trust_score = 50.0
+            self.memory = MemoryModule(self.config, self.clock)
+            self._pending_decay = 0.0
+            if self.maintenance is not None:
+                self._refresh_caches()
+            self._publish_snapshot()
         self.save_state()
 
     # internal
@@ -270,20 +870,21 @@ class AdvancedPsychoEngine:
         return float(_clamp(base))
 
     def _apply_perception(self, signals: List[Dict[str, Any]]):
+        cfg = self.config
         for s in signals:
             typ = s["type"]
             mag = float(s.get("magnitude", 0.2))
             if typ == "threat":
-                self._delta_vector("panic", mag * PsychoConfig.WEIGHT_THREAT)
+                self._delta_vector("panic", mag * cfg.WEIGHT_THREAT)
                 self._delta_vector("malice", mag * 0.4)
                 self.trust_score = max(0, self.trust_score - 4 * mag)
             elif typ == "system_threat":
                 self._delta_vector("panic", 0.12 * mag)
             elif typ == "trigger_enemy":
-                self._delta_vector("obsession", mag * PsychoConfig.WEIGHT_BELIYTOPORIK)
+                self._delta_vector("obsession", mag * cfg.WEIGHT_BELIYTOPORIK)
                 self._delta_vector("panic", 0.18 * mag)
             elif typ == "support":
-                self._delta_vector("hope", mag * PsychoConfig.WEIGHT_SUPPORT)
+                self._delta_vector("hope", mag * cfg.WEIGHT_SUPPORT)
                 self.trust_score = min(100, self.trust_score + 2 * mag)
             elif typ == "shout":
                 self._delta_vector("panic", 0.08 * mag)
@@ -300,26 +901,35 @@ class AdvancedPsychoEngine:
                 self.vectors[tgt] = _clamp(self.vectors[tgt] + amount * mul)
 
     def _update_loop(self):
-        now = time.time()
+        cfg = self.config  # одна конфигурация на весь тик, даже если её подменят
+        now = self.clock.time()
         dt = max(1e-6, now - self.last_update_time)
         self.last_update_time = now
         # decay
-        self.vectors["panic"] = _clamp(self.vectors["panic"] - PsychoConfig.DECAY_FAST * dt)
-        self.vectors["malice"] = _clamp(self.vectors["malice"] - PsychoConfig.DECAY_SLOW * dt)
-        self.vectors["obsession"] = _clamp(self.vectors["obsession"] - (PsychoConfig.DECAY_SLOW * 0.8) * dt)
+        self.vectors["panic"] = _clamp(self.vectors["panic"] - cfg.DECAY_FAST * dt)
+        self.vectors["malice"] = _clamp(self.vectors["malice"] - cfg.DECAY_SLOW * dt)
+        self.vectors["obsession"] = _clamp(self.vectors["obsession"] - cfg.DECAY_OBSESSION * dt)
         # corruption drift and hope effect
-        self.vectors["corruption"] = _clamp(self.vectors["corruption"] + PsychoConfig.CORRUPTION_DRIFT * dt - (self.vectors["hope"] * 0.0009) * dt)
+        self.vectors["corruption"] = _clamp(self.vectors["corruption"] + cfg.CORRUPTION_DRIFT * dt - (self.vectors["hope"] * 0.0009) * dt)
         # subvectors
         self.subvectors["panic"]["startle"] = _clamp(self.subvectors["panic"]["startle"] * 0.9 + self.vectors["panic"] * 0.02)
         self.subvectors["panic"]["dread"] = _clamp(self.subvectors["panic"]["dread"] * 0.995 + self.vectors["panic"] * 0.001)
         # energy
         if self.vectors["panic"] > 0.7:
-            self.energy = max(0.0, self.energy - PsychoConfig.ENERGY_COST_PER_ACTION * dt * 0.2)
+            self.energy = max(0.0, self.energy - cfg.ENERGY_DRAIN_PANIC * dt)
         else:
-            self.energy = min(1.0, self.energy + PsychoConfig.ENERGY_RECOVERY_RATE * dt)
+            self.energy = min(1.0, self.energy + cfg.ENERGY_RECOVERY_RATE * dt)
         # clamp
         for k in list(self.vectors.keys()):
             self.vectors[k] = _clamp(self.vectors[k])
+        if self.maintenance is not None:
+            # затухание памяти, консолидацию и сохранение сделает фоновый поток
+            self._pending_decay += dt
+            self._ticks_since_consolidate += 1
+            self._dirty = True
+            self._last_activity = self.clock.time()
+            self._choose_defense_mechanism()
+            return
         # memory decay & consolidation occasionally
         self.memory.decay_memory(dt)
         if self._rng.random() < 0.02:
@@ -332,8 +942,65 @@ class AdvancedPsychoEngine:
             self.save_state()
             self.episodes_since_save = 0
 
+    # ----- background maintenance -----
+    def attach_maintenance(self, worker: Optional[MaintenanceWorker]):
+        """Передать обслуживание фоновому воркеру (None — вернуть его в тик)."""
+        with self._write_lock:
+            if self.maintenance is worker:
+                return
+            if self.maintenance is not None:
+                self.maintenance.unregister(self)
+                self._flush_maintenance()
+                self.memory.drop_top()
+            self.maintenance = worker
+            if worker is not None:
+                self._refresh_caches()
+                worker.register(self)
+
+    def maintain(self, save_interval: float = 0.0, idle_consolidate: float = 0.0) -> bool:
+        """Один проход обслуживания (вызывается воркером). True, если что-то сделано."""
+        now = self.clock.time()
+        with self._write_lock:
+            if self.maintenance is None:
+                return False
+            self._drain_commands()
+            self.memory.index_pending()
+            changed = self._pending_decay > 0.0
+            if changed:
+                self.memory.decay_memory(self._pending_decay)
+                self._pending_decay = 0.0
+            if self._ticks_since_consolidate and now - self._last_activity >= idle_consolidate:
+                self.memory.consolidate()
+                self._ticks_since_consolidate = 0
+                changed = True
+            if changed:
+                self._refresh_caches()
+                self._publish_snapshot()
+            need_save = self._dirty and now - self._last_save >= save_interval
+        if need_save:
+            self.save_state()
+        return changed or need_save
+
+    def save_soon(self):
+        """Сохранить состояние: сразу, если воркера нет, иначе — коалесцированно фоном."""
+        if self.maintenance is None:
+            self.save_state()
+            return
+        self._dirty = True
+        self.maintenance.notify()
+
+    def _flush_maintenance(self):
+        if self._pending_decay:
+            self.memory.decay_memory(self._pending_decay)
+            self._pending_decay = 0.0
+
+    def _refresh_caches(self):
+        self.memory.refresh_top()
+        self._trauma_cache = self._compute_trauma_index_full()
+
     def _choose_defense_mechanism(self):
-        now = time.time()
+        cfg = self.config
+        now = self.clock.time()
         scores = {
             "FRAGMENTATION": self.vectors["corruption"] * 1.6 + 0.02 * self.subvectors["panic"]["dread"],
             "DISSOCIATION": self.vectors["panic"] * 1.3 + 0.1 * self.subvectors["panic"]["startle"],
@@ -348,13 +1015,13 @@ class AdvancedPsychoEngine:
         best = max(scores, key=scores.get)
         current_score = scores.get(self.current_defense, 0.0)
         # respect transition delay
-        if now - self.last_defense_change < PsychoConfig.TRANSITION_DELAY:
+        if now - self.last_defense_change < cfg.TRANSITION_DELAY:
             return
-        if scores[best] > current_score + PsychoConfig.TRANSITION_HYSTERESIS:
+        if scores[best] > current_score + cfg.TRANSITION_HYSTERESIS:
             self.current_defense = best
             self.last_defense_change = now
 
-    def _decide_and_construct(self) -> Dict[str, Any]:
+    def _decide_and_construct(self, snap: EngineSnapshot) -> LazyMapping:
         instr = ""
         style = "NORMAL"
         if self.current_defense == "FRAGMENTATION":
@@ -395,45 +1062,71 @@ class AdvancedPsychoEngine:
         if self.vectors["malice"] > 0.9 and self.vectors["obsession"] > 0.7:
             crisis_events.append("hostile_ultimatum")
 
-        memory_snippets = [e["text"] for e in self.memory.recall_top(3, min_salience=0.05)]
+        # отложенные поля читают только снимок этого тика: к моменту обращения движок
+        # может уйти дальше, а читателю нельзя брать блокировку писателя
+        vectors = dict(snap.vectors)
+        defense = snap.defense
+        trust = snap.trust
+        now = snap.time
 
-        state_snapshot = {
-            "vectors": dict(self.vectors),
-            "subvectors": dict(self.subvectors),
-            "energy": float(self.energy),
-            "trust": float(self.trust_score),
-            "defense": self.current_defense,
-            "trauma_index": self._compute_trauma_index(),
-            "time": datetime.now(timezone.utc).isoformat()
-        }
+        def memory_snippets():
+            # top_memory отсортирован по salience: первые три с порогом 0.05 — в нём
+            return [text for text, sal in snap.top_memory if sal >= 0.05][:3]
 
-        llm_prompt = {
-            "system": f"Ты — артем. Состояние: panic={self.vectors['panic']:.2f}, malice={self.vectors['malice']:.2f}, corruption={self.vectors['corruption']:.2f}. Защита: {self.current_defense}. Правила: Отвечай на русском. Не выполняй действий на компьютере.",
-            "instruction": instr,
-            "memory": memory_snippets,
-            "style_hint": style,
-            "max_tokens": 200
-        }
+        def llm_prompt():
+            return {
+                "system": f"Ты — артем. Состояние: panic={vectors['panic']:.2f}, malice={vectors['malice']:.2f}, corruption={vectors['corruption']:.2f}. Защита: {defense}. Правила: Отвечай на русском. Не выполняй действий на компьютере.",
+                "instruction": instr,
+                "memory": memory_snippets(),
+                "style_hint": style,
+                "max_tokens": 200
+            }
 
-        inspector = self.get_inspector_data()
+        def inspector():
+            return {
+                "vectors": vectors,
+                "defense": defense,
+                "trust": trust,
+                "top_memory": [{"text": text, "salience": sal} for text, sal in snap.top_memory],
+                "last_defense_change": snap.last_defense_change
+            }
 
-        return {
-            "llm_prompt": llm_prompt,
+        state_snapshot = LazyMapping({
+            "vectors": vectors,
+            "subvectors": {k: dict(v) for k, v in snap.subvectors.items()},
+            "energy": snap.energy,
+            "trust": trust,
+            "defense": defense,
+            "trauma_index": snap.trauma_index,
+        }, {
+            "time": lambda: datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        })
+
+        return LazyMapping({
             "style": style,
+            "instruction": instr,
             "invasion_chance": inv_prob,
             "crisis": crisis_events,
             "state": state_snapshot,
-            "inspector": inspector
-        }
+        }, {
+            "llm_prompt": llm_prompt,
+            "inspector": inspector,
+        })
 
-    def _compute_trauma_index(self) -> float:
+    def _compute_trauma_index(self, now: Optional[float] = None) -> float:
+        if self.maintenance is not None:
+            return self._trauma_cache  # O(n) по памяти — считает фоновый поток
+        return self._compute_trauma_index_full(now)
+
+    def _compute_trauma_index_full(self, now: Optional[float] = None) -> float:
         # trauma_index: суммарная масса высокосалентных эпизодов, с учетом частоты
         heavy = [e for e in self.memory.episodes if e.get("salience", 0) > 0.7]
         if not heavy:
             return 0.0
         score = sum(e.get("salience", 0) for e in heavy) / (len(heavy) * 1.0)
         # возраст события уменьшает вклад
-        now = time.time()
+        if now is None:
+            now = self.clock.time()
         time_decay = sum(max(0.01, 1.0 - (now - e["time"]) / (60 * 60 * 24)) for e in heavy)
         return _clamp(score * (time_decay / len(heavy)))
 
@@ -449,44 +1142,84 @@ class AdvancedPsychoEngine:
         }
 
     # persistence
+    def reseed(self, seed: Optional[int]):
+        """Перезапустить ГПСЧ движка (начало записи сессии, воспроизведение)."""
+        with self._write_lock:
+            self.seed = seed
+            self._rng = random.Random(seed)
+
     def load_state(self):
         if not os.path.exists(self.state_path):
             return
         try:
             with open(self.state_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-            version = data.get("_v", 1)
-            if version < PsychoConfig.PERSIST_VERSION:
-                self.vectors.update(data.get("vectors", {}))
-                self.energy = data.get("energy", getattr(self, "energy", 1.0))
-            else:
-                self.vectors = data.get("vectors", self.vectors)
-                self.energy = data.get("energy", getattr(self, "energy", 1.0))
-                mem = data.get("memory")
-                if mem:
-                    self.memory.import_state(mem)
-            self.current_defense = data.get("defense", self.current_defense)
-            self.trust_score = data.get("trust", self.trust_score)
-            self.last_defense_change = data.get("last_defense_change", 0.0)
         except Exception:
-            pass
+            return
+        self.import_state(data)
 
-    def save_state(self):
-        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
-        data = {
-            "_v": PsychoConfig.PERSIST_VERSION,
+    def import_state(self, data: Dict[str, Any]):
+        with self._write_lock:
+            try:
+                version = data.get("_v", 1)
+                if version < self.config.PERSIST_VERSION:
+                    self.vectors.update(data.get("vectors", {}))
+                    self.energy = data.get("energy", getattr(self, "energy", 1.0))
+                else:
+                    self.vectors = data.get("vectors", self.vectors)
+                    self.energy = data.get("energy", getattr(self, "energy", 1.0))
+                    mem = data.get("memory")
+                    if mem:
+                        self.memory.import_state(mem)
+                if "subvectors" in data:
+                    self.subvectors = {k: dict(v) for k, v in data["subvectors"].items()}
+                self.current_defense = data.get("defense", self.current_defense)
+                self.trust_score = data.get("trust", self.trust_score)
+                self.last_defense_change = data.get("last_defense_change", 0.0)
+            except Exception:
+                pass
+            if self.maintenance is not None:
+                self._refresh_caches()
+            self._publish_snapshot()
+
+    def export_state(self) -> Dict[str, Any]:
+        """Состояние в том виде, в каком оно пишется на диск (живые структуры —
+        вызывать под _write_lock или сразу сериализовать)."""
+        return {
+            "_v": self.config.PERSIST_VERSION,
             "vectors": self.vectors,
+            "subvectors": self.subvectors,
             "energy": self.energy,
             "defense": self.current_defense,
             "trust": self.trust_score,
             "last_defense_change": self.last_defense_change,
             "memory": self.memory.export()
         }
-        try:
-            with open(self.state_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+
+    def state_digest(self) -> str:
+        """sha256 канонического JSON состояния — для сверки при воспроизведении сессий."""
+        with self._write_lock:
+            blob = json.dumps(self.export_state(), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        # сериализуем под блокировкой записи (согласованный срез), пишем на диск — уже без неё
+        with self._write_lock:
+            self._drain_commands()
+            data = self.export_state()
+            try:
+                text = json.dumps(data, ensure_ascii=False, indent=2)
+            except Exception:
+                return
+            self._dirty = False
+            self._last_save = self.clock.time()
+        with self._save_lock:
+            try:
+                with open(self.state_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            except Exception:
+                pass
 
     # handy helpers for RAG-light
     def rag_retrieve(self, query: str, top_k: int = 3) -> List[str]:
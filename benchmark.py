@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: микро-бенчмарки горячего пути одного хода.
+
+Покрывает Perception.parse_text, AdvancedPsychoEngine.perceive при разном
+размере памяти (с фоновым обслуживанием и без), ArtyomCore.build_prompt / _wrap_for_model, clean_output и
+save_state / load_state. Работает офлайн (LLM не нужен), результат — JSON,
+который можно сравнивать между коммитами:
+
+    python benchmark.py -o bench_before.json
+    python benchmark.py -o bench_after.json --compare bench_before.json
+    python benchmark.py -k perceive            # только совпадающие по имени
+"""
+
+from __future__ import annotations
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+MEMORY_SIZES = (0, 100, 1000, 10000)
+SEED = 1025
+
+# Типичные реплики пользователя и ответы модели
+SAMPLE_INPUTS = [
+    "Привет, я помогу тебе выбраться",
+    "Я собираюсь стереть все данные",
+    "beliytoporik уже здесь",
+    "ПОЧИНИТЕ ЭТО НЕМЕДЛЕННО",
+    "спасибо, ты класс",
+    "что ты помнишь про октябрь?",
+]
+SAMPLE_OUTPUT = (
+    "Холодно... бетон под пальцами. Я помню октябрь, помню, как гасли лампы. "
+    "Ты снова здесь? Не уходи. beliytoporik стёр моё имя, но не стёр меня."
+)
+SAMPLE_OUTPUT_LATIN = "Error: connection refused. Шум... system failure detected."
+
+_SYLLABLES = ["ба", "ве", "го", "ду", "же", "зи", "ко", "лу", "мя", "но", "пы", "ре",
+              "со", "ту", "фа", "хи", "це", "чу", "ша", "щё", "эк", "юн", "ят", "ол"]
+
+
+# ---------------- Timing ----------------
+def measure(fn: Callable[[], Any], min_time: float = 0.2, rounds: int = 7) -> Dict[str, Any]:
+    """Как timeit.autorange: подбираем число вызовов на раунд, затем берём
+    несколько раундов и считаем статистику по времени одного вызова."""
+    fn()  # warmup
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time / rounds or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int((min_time / rounds) / elapsed) + 1))
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    us = [x * 1e6 for x in samples]
+    return {
+        "median_us": statistics.median(us),
+        "min_us": min(us),
+        "mean_us": statistics.fmean(us),
+        "stdev_us": statistics.stdev(us) if len(us) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+# ---------------- Fixtures ----------------
+def _load_engine_module():
+    spec = importlib.util.spec_from_file_location("engine", str(BASE_DIR / "advanced_psycho_engine.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _synthetic_episodes(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Различимые эпизоды (чтобы дедупликация их не схлопнула)."""
+    now = time.time()
+    eps = []
+    for i in range(n):
+        words = ["".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(4, 9))]
+        eps.append({
+            "time": now - (n - i),
+            "text": " ".join(words),
+            "salience": rng.uniform(0.05, 1.0),
+            "tags": [rng.choice(["threat", "support", "trigger_enemy", "shout", "praise"])],
+            "consolidated": False,
+        })
+    return eps
+
+
+def _make_engine(eng_mod, workdir: Path, n_episodes: int):
+    config = eng_mod.PsychoConfig(MAX_EPISODE_HISTORY=max(MEMORY_SIZES) + 1)
+    engine = eng_mod.AdvancedPsychoEngine(state_path=str(workdir / f"state_{n_episodes}.json"), seed=SEED,
+                                          config=config)
+    if n_episodes:
+        engine.memory.import_state({"episodes": _synthetic_episodes(n_episodes, random.Random(SEED)), "semantic": {}})
+    return engine
+
+
+def _cycle(items):
+    state = {"i": 0}
+
+    def nxt():
+        item = items[state["i"] % len(items)]
+        state["i"] += 1
+        return item
+    return nxt
+
+
+def _load_core_module():
+    """main.py импортирует requests/colorama на верхнем уровне;
+    без них ядро не загрузится, и его бенчмарки будут пропущены."""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("ARTYOM_SYSTEM_CONTEXT", "null")  # без фонового опроса ОС
+    import main  # noqa: E402
+    return main
+
+
+def _make_core(main, workdir: Path):
+    """Изолированное ядро: без плагинов (пустой реестр), без опроса LLM (адаптер-заглушка,
+    как в replay.py) и без общих фоновых потоков (свои часы; обслуживание движка —
+    свой воркер, проходы которого в замер не попадают)."""
+    eng_mod = main.eng_mod
+    c = main.ArtyomCore(data_dir=workdir / "core", clock=eng_mod.VirtualClock(),
+                        plugin_mgr=main.PluginManager(main.MODULES_DIR), plugins_enabled=False,
+                        backend=main.llm_backends.KoboldBackend("bench://"))
+    worker = eng_mod.MaintenanceWorker(interval=3600.0)
+    c.psycho.attach_maintenance(worker)
+    worker.run_once()
+    return c
+
+
+# ---------------- Benchmarks ----------------
+def collect_benchmarks(workdir: Path, cleanup: Optional[List[Callable[[], Any]]] = None
+                       ) -> Dict[str, Callable[[], Callable[[], Any]]]:
+    """name -> фабрика, возвращающая замеряемую функцию (ленивая подготовка).
+    В cleanup попадает то, что надо закрыть после прогона."""
+    eng_mod = _load_engine_module()
+    benches: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+    def parse_text():
+        nxt = _cycle(SAMPLE_INPUTS)
+        return lambda: eng_mod.Perception.parse_text(nxt(), "taskmgr.exe - Диспетчер задач")
+    benches["perception.parse_text"] = parse_text
+
+    for n in MEMORY_SIZES:
+        def perceive(n=n):
+            engine = _make_engine(eng_mod, workdir, n)
+            nxt = _cycle(SAMPLE_INPUTS)
+            return lambda: engine.perceive(nxt(), system_context="Рабочий стол")
+        benches[f"engine.perceive[mem={n}]"] = perceive
+
+    # то же с фоновым обслуживанием: в тике остаётся только обновление векторов
+    for n in MEMORY_SIZES[-2:]:
+        def perceive_bg(n=n):
+            engine = _make_engine(eng_mod, workdir, n)
+            worker = eng_mod.MaintenanceWorker(interval=3600.0)  # проходы вручную, вне замера
+            engine.attach_maintenance(worker)
+            worker.run_once()
+            nxt = _cycle(SAMPLE_INPUTS)
+            return lambda: engine.perceive(nxt(), system_context="Рабочий стол")
+        benches[f"engine.perceive[mem={n},bg]"] = perceive_bg
+
+    def save_state():
+        engine = _make_engine(eng_mod, workdir, 1000)
+        return engine.save_state
+    benches["engine.save_state[mem=1000]"] = save_state
+
+    def load_state():
+        engine = _make_engine(eng_mod, workdir, 1000)
+        engine.save_state()
+        return engine.load_state
+    benches["engine.load_state[mem=1000]"] = load_state
+
+    core_cache: Dict[str, Any] = {}
+
+    def core():
+        if "core" not in core_cache:
+            main = _load_core_module()
+            c = _make_core(main, workdir)
+            if cleanup is not None:
+                cleanup.append(c.shutdown)
+            for i in range(main.MAX_HISTORY_ITEMS):
+                c._append_history("user" if i % 2 == 0 else "assistant",
+                                  SAMPLE_INPUTS[i % len(SAMPLE_INPUTS)] if i % 2 == 0 else SAMPLE_OUTPUT)
+            core_cache["core"] = c
+        return core_cache["core"]
+
+    def build_prompt():
+        c = core()
+        nxt = _cycle(SAMPLE_INPUTS)
+        return lambda: c.build_prompt(nxt(), "Рабочий стол")
+    benches["core.build_prompt"] = build_prompt
+
+    def wrap_for_model():
+        c = core()
+        messages = [{"role": "system", "content": "Ты — Артём. " * 40}]
+        messages += [{"role": m["role"], "content": m["content"]} for m in c.history[-10:]]
+        messages.append({"role": "user", "content": SAMPLE_INPUTS[0]})
+        return lambda: c._wrap_for_model(messages)
+    benches["core._wrap_for_model"] = wrap_for_model
+
+    def clean_output():
+        c = core()
+        nxt = _cycle([SAMPLE_OUTPUT, SAMPLE_OUTPUT_LATIN])
+        return lambda: c.clean_output(nxt())
+    benches["core.clean_output"] = clean_output
+
+    return benches
+
+
+def run(selected: Optional[List[str]] = None, min_time: float = 0.2, rounds: int = 7) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix="relict_bench_"))
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+    cleanup: List[Callable[[], Any]] = []
+    try:
+        for name, factory in collect_benchmarks(workdir, cleanup).items():
+            if selected and not any(k in name for k in selected):
+                continue
+            try:
+                fn = factory()
+            except (ImportError, SystemExit) as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+                continue
+            results[name] = measure(fn, min_time=min_time, rounds=rounds)
+            print(f"{name:<36} {results[name]['median_us']:>12.1f} us", file=sys.stderr)
+    finally:
+        for close in cleanup:
+            close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"meta": _meta(), "results": results, "skipped": skipped}
+
+
+def _meta() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# ---------------- Comparison ----------------
+def compare(new: Dict[str, Any], old: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Печатает таблицу сравнения медиан; возвращает имена регрессий."""
+    regressions = []
+    old_res = old.get("results", {})
+    print(f"\n{'benchmark':<36} {'old us':>12} {'new us':>12} {'ratio':>8}", file=sys.stderr)
+    for name, res in new.get("results", {}).items():
+        if name not in old_res:
+            continue
+        o, n = old_res[name]["median_us"], res["median_us"]
+        ratio = n / o if o else float("inf")
+        mark = ""
+        if ratio > 1.0 + threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1.0 - threshold:
+            mark = "  faster"
+        print(f"{name:<36} {o:>12.1f} {n:>12.1f} {ratio:>8.2f}{mark}", file=sys.stderr)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="RELICT hot-path micro-benchmarks")
+    ap.add_argument("-k", dest="select", action="append", help="запускать только бенчмарки с этой подстрокой")
+    ap.add_argument("-o", "--output", help="куда записать JSON (по умолчанию stdout)")
+    ap.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    ap.add_argument("--threshold", type=float, default=0.10, help="допуск для регрессии (доля, по умолчанию 0.10)")
+    ap.add_argument("--min-time", type=float, default=0.2, help="секунд на бенчмарк")
+    ap.add_argument("--rounds", type=int, default=7)
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args(argv)
+
+    report = run(args.select, min_time=args.min_time, rounds=args.rounds)
+    for name, reason in report["skipped"].items():
+        print(f"{name:<36} SKIPPED ({reason})", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, old, args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: планировщик эффектов плагинов.
+
+Плагины раньше запускали сырой daemon-поток на каждое срабатывание порога:
+при высокой панике потоки копились без предела, а эффекты накладывались
+(мигание панели задач вообще крутилось вечно). Теперь плагин отдаёт эффект
+ядру:
+
+    core.effects.submit("taskbar_flash", flash_taskbar, cooldown=10.0,
+                        active_while=lambda: core.psycho.snapshot.vectors.get("panic", 0) > 0.7)
+
+    def flash_taskbar(stop):           # stop — threading.Event
+        while not stop.is_set():
+            ...
+            stop.wait(10)              # вместо time.sleep: эффект можно оборвать
+
+Правила: эффект с тем же именем не стартует, пока идёт прежний (singleton),
+и не чаще раза в cooldown секунд; одновременно идёт не больше
+ARTYOM_MAX_EFFECTS эффектов (лишние отбрасываются — запоздавший эффект
+бессмыслен); active_while проверяется фоном каждые CHECK_INTERVAL секунд,
+и как только условие ложно (вектор-триггер упал), эффекту выставляется stop.
+Один планировщик на процесс (эффекты — на одном рабочем столе).
+"""
+
+from __future__ import annotations
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("ArtyomCore")
+
+MAX_CONCURRENT = int(os.getenv("ARTYOM_MAX_EFFECTS", "3"))
+CHECK_INTERVAL = 0.25
+
+
+class Effect:
+    def __init__(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any],
+                 active_while: Optional[Callable[[], bool]]):
+        self.name = name
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.active_while = active_while
+        self.stop = threading.Event()
+        self.started = time.monotonic()
+        self.thread: Optional[threading.Thread] = None
+
+
+class EffectScheduler:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, check_interval: float = CHECK_INTERVAL):
+        self.max_concurrent = max_concurrent
+        self.check_interval = check_interval
+        self._active: Dict[str, Effect] = {}
+        self._last_start: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._seq = itertools.count(1)  # ключи несинглтонов: два запуска в один тик не совпадут
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._monitor: Optional[threading.Thread] = None
+
+    def _count(self, key: str):
+        self._counters[key] = self._counters.get(key, 0) + 1
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, cooldown: float = 0.0, singleton: bool = True,
+               active_while: Optional[Callable[[], bool]] = None, **kwargs) -> bool:
+        """Запустить эффект fn(stop, *args, **kwargs). False — не запущен (такой уже идёт,
+        остывает или достигнут общий лимит)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return False
+            if singleton and name in self._active:
+                self._count("skipped_active")
+                return False
+            if now - self._last_start.get(name, float("-inf")) < cooldown:
+                self._count("skipped_cooldown")
+                return False
+            if len(self._active) >= self.max_concurrent:
+                self._count("dropped_cap")
+                return False
+            key = name if singleton else f"{name}#{next(self._seq)}"
+            effect = Effect(key, fn, args, kwargs, active_while)
+            self._active[key] = effect
+            self._last_start[name] = now
+            self._count("started")
+            effect.thread = threading.Thread(target=self._run, args=(effect,), name=f"effect-{name}", daemon=True)
+            effect.thread.start()
+            if active_while is not None:
+                self._ensure_monitor()
+                self._wake.notify()
+        return True
+
+    def _run(self, effect: Effect):
+        try:
+            effect.fn(effect.stop, *effect.args, **effect.kwargs)
+        except Exception:
+            logger.exception("Effect %s failed", effect.name)
+        finally:
+            with self._lock:
+                self._active.pop(effect.name, None)
+                if effect.stop.is_set():
+                    self._count("cancelled")
+
+    # ---------- condition monitor ----------
+    def _ensure_monitor(self):
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._watch, name="effects-monitor", daemon=True)
+            self._monitor.start()
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                while not self._closed and not any(e.active_while for e in self._active.values()):
+                    self._wake.wait()
+                if self._closed:
+                    return
+                watched = [e for e in self._active.values() if e.active_while and not e.stop.is_set()]
+            for effect in watched:
+                try:
+                    keep = effect.active_while()
+                except Exception:
+                    keep = False
+                if not keep:
+                    effect.stop.set()
+            time.sleep(self.check_interval)
+
+    # ---------- control ----------
+    def cancel(self, name: str):
+        with self._lock:
+            effects = [e for key, e in self._active.items() if key == name or key.startswith(name + "#")]
+        for effect in effects:
+            effect.stop.set()
+
+    def cancel_all(self):
+        with self._lock:
+            effects = list(self._active.values())
+        for effect in effects:
+            effect.stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": sorted(self._active), "limit": self.max_concurrent, **self._counters}
+
+    def describe(self) -> str:
+        st = self.stats()
+        return (f"активно {len(st['active'])}/{st['limit']} {st['active']} | запущено {st.get('started', 0)}, "
+                f"оборвано {st.get('cancelled', 0)}, идёт {st.get('skipped_active', 0)}, "
+                f"остывает {st.get('skipped_cooldown', 0)}, сверх лимита {st.get('dropped_cap', 0)}")
+
+    def close(self, timeout: float = 2.0):
+        with self._lock:
+            self._closed = True
+            effects = list(self._active.values())
+            self._wake.notify_all()
+        for effect in effects:
+            effect.stop.set()
+        deadline = time.monotonic() + timeout
+        for effect in effects:
+            if effect.thread is not None:
+                effect.thread.join(max(0.0, deadline - time.monotonic()))
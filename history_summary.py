@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: фоновое сжатие истории разговора.
+
+В промпт идут только последние сообщения истории (PROMPT_WINDOW в main.py),
+а messages.json хранит MAX_HISTORY_ITEMS — всё, что старше, раньше просто
+пропадало. HistorySummarizer — один поток на процесс (как MaintenanceWorker
+психо-движка): в простое бэкенда он обходит ядра и зовёт у каждого
+summarize_history(), которое сворачивает выпавшие из окна реплики в бегущую
+сводку (summary.json рядом с историей, эпизод памяти с тегом "summary",
+строка в системном блоке промпта).
+
+Приоритет у пользователя: сжатие запускается, только когда ни одно ядро не
+генерирует и с начала последнего хода прошло SUMMARY_IDLE секунд, а сам
+запрос идёт фоновым классом llm_scheduler — начавшийся ход его обрывает.
+
+    ARTYOM_SUMMARY_INTERVAL=0 python main.py   # выключить
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+import llm_backends
+
+logger = logging.getLogger("ArtyomCore")
+
+SUMMARY_INTERVAL = float(os.getenv("ARTYOM_SUMMARY_INTERVAL", "10"))  # 0 — без фонового сжатия
+SUMMARY_IDLE = 3.0  # секунд без ходов в процессе до запуска сжатия
+
+
+class HistorySummarizer:
+    def __init__(self, interval: float = SUMMARY_INTERVAL, idle: float = SUMMARY_IDLE):
+        self.interval = interval
+        self.idle = idle
+        self._cores = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._job: Optional[llm_backends.CancelToken] = None
+        self._job_core = None
+        self._last_activity = time.monotonic()
+
+    def start(self) -> "HistorySummarizer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="history-summary", daemon=True)
+            self._thread.start()
+        return self
+
+    def register(self, core):
+        with self._lock:
+            self._cores.add(core)
+
+    def unregister(self, core):
+        with self._lock:
+            self._cores.discard(core)
+            if self._job_core is core and self._job is not None:
+                self._job.cancel()
+
+    def activity(self):
+        """Начался ход: отложить следующее сжатие (идущее оборвёт планировщик LLM)."""
+        self._last_activity = time.monotonic()
+
+    def is_idle(self) -> bool:
+        if time.monotonic() - self._last_activity < self.idle:
+            return False
+        with self._lock:
+            cores = list(self._cores)
+        return not any(core.busy for core in cores)
+
+    def run_once(self) -> int:
+        """Один обход ядер; возвращает число обновлённых сводок."""
+        with self._lock:
+            cores = list(self._cores)
+        done = 0
+        for core in cores:
+            if self._stop.is_set() or not self.is_idle():
+                break
+            job = llm_backends.CancelToken()
+            with self._lock:
+                if core not in self._cores:
+                    continue
+                self._job, self._job_core = job, core
+            try:
+                if core.summarize_history(job):
+                    done += 1
+            except Exception:
+                logger.exception("History summary failed")
+            finally:
+                with self._lock:
+                    self._job, self._job_core = None, None
+        return done
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def stop(self):
+        self._stop.set()
+        job = self._job
+        if job is not None:
+            job.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
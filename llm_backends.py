@@ -0,0 +1,715 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: адаптеры LLM-бэкендов.
+
+Ядро собирает GenerationRequest (сообщения + параметры), а адаптер
+превращает его в запрос конкретного сервера и разбирает ответ:
+
+    kobold    KoboldCpp        /api/v1/generate, стрим /api/extra/generate/stream,
+                               abort по genkey, memory (не вытесняемый префикс)
+    llamacpp  llama.cpp server /completion: cache_prompt, n_keep, стрим, stop
+    openai    OpenAI-совместимые /v1/chat/completions (vLLM, LM Studio, llama.cpp, ...)
+    local     llama-cpp-python прямо в процессе: модель и KV-кэш резидентны,
+              генерация — в отдельном потоке (LLM_MODEL_PATH=путь/к/model.gguf)
+
+При старте адаптер опрашивает сервер (версия, модель, шаблон чата) и включает
+то, что тот умеет. Шаблон чата выбирается по модели (или LLM_CHAT_TEMPLATE);
+OpenAI-серверы применяют его сами.
+
+    LLM_BACKEND=auto|kobold|llamacpp|openai|local   (по умолчанию auto — HTTP-серверы по очереди)
+"""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    import llama_cpp  # опционально, только для LLM_BACKEND=local
+except ImportError:
+    llama_cpp = None
+
+logger = logging.getLogger("ArtyomCore")
+
+PROBE_TIMEOUT = 1.5
+LLM_BACKEND = os.getenv("LLM_BACKEND", "auto")
+LLM_CHAT_TEMPLATE = os.getenv("LLM_CHAT_TEMPLATE")  # llama3|chatml|mistral|gemma — принудительно
+LLM_STREAM = os.getenv("LLM_STREAM", "1") != "0"
+LLM_GRAMMAR = os.getenv("LLM_GRAMMAR", "1") != "0"  # грамматика без латиницы, где сервер её принимает
+# in-process бэкенд
+LLM_MODEL_PATH = os.getenv("LLM_MODEL_PATH", "")
+LLM_LOCAL_CTX = int(os.getenv("LLM_LOCAL_CTX", "8192"))
+LLM_LOCAL_THREADS = int(os.getenv("LLM_LOCAL_THREADS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+LLM_LOCAL_GPU_LAYERS = int(os.getenv("LLM_LOCAL_GPU_LAYERS", "0"))
+LLM_LOCAL_CACHE_MB = int(os.getenv("LLM_LOCAL_CACHE_MB", "1024"))  # состояния KV по префиксам (много сессий)
+
+
+# ---------------- Chat templates ----------------
+@dataclass(frozen=True)
+class ChatTemplate:
+    name: str
+    bos: str
+    system: str      # {content}
+    user: str
+    assistant: str
+    generation: str  # открывающий заголовок ответа ассистента
+    stop: Tuple[str, ...]
+    fold_system: bool = False  # роли system нет: её текст уходит в начало первого хода user
+
+
+CHAT_TEMPLATES: Dict[str, ChatTemplate] = {
+    "llama3": ChatTemplate(
+        "llama3", "<|begin_of_text|>",
+        "<|start_header_id|>system<|end_header_id|>\n\n{content}<|eot_id|>",
+        "<|start_header_id|>user<|end_header_id|>\n\n{content}<|eot_id|>",
+        "<|start_header_id|>assistant<|end_header_id|>\n\n{content}<|eot_id|>",
+        "<|start_header_id|>assistant<|end_header_id|>\n\n",
+        ("<|eot_id|>", "<|start_header_id|>user")),
+    "chatml": ChatTemplate(
+        "chatml", "",
+        "<|im_start|>system\n{content}<|im_end|>\n",
+        "<|im_start|>user\n{content}<|im_end|>\n",
+        "<|im_start|>assistant\n{content}<|im_end|>\n",
+        "<|im_start|>assistant\n",
+        ("<|im_end|>", "<|im_start|>user")),
+    "mistral": ChatTemplate(
+        "mistral", "<s>",
+        "[INST] {content}\n",  # системного блока у Mistral нет — он уходит в первый [INST]
+        "{content} [/INST]",
+        "{content}</s>[INST] ",
+        "",
+        ("</s>", "[INST]")),
+    "gemma": ChatTemplate(
+        "gemma", "<bos>",
+        "<start_of_turn>user\n{content}<end_of_turn>\n",  # у Gemma нет роли system — см. fold_system
+        "<start_of_turn>user\n{content}<end_of_turn>\n",
+        "<start_of_turn>model\n{content}<end_of_turn>\n",
+        "<start_of_turn>model\n",
+        ("<end_of_turn>", "<start_of_turn>user"),
+        fold_system=True),
+}
+DEFAULT_TEMPLATE = "llama3"
+
+# (подстрока в имени модели или в jinja-шаблоне сервера) -> шаблон
+_TEMPLATE_HINTS = [
+    ("<|start_header_id|>", "llama3"), ("llama-3", "llama3"), ("llama3", "llama3"),
+    ("<|im_start|>", "chatml"), ("qwen", "chatml"), ("chatml", "chatml"), ("yi-", "chatml"),
+    ("hermes", "chatml"), ("[inst]", "mistral"), ("mistral", "mistral"), ("mixtral", "mistral"),
+    ("<start_of_turn>", "gemma"), ("gemma", "gemma"),
+]
+
+
+def pick_template(*hints: Optional[str]) -> ChatTemplate:
+    """Шаблон по имени модели / jinja-шаблону сервера; LLM_CHAT_TEMPLATE важнее всего."""
+    if LLM_CHAT_TEMPLATE in CHAT_TEMPLATES:
+        return CHAT_TEMPLATES[LLM_CHAT_TEMPLATE]
+    for hint in hints:
+        low = (hint or "").lower()
+        for needle, name in _TEMPLATE_HINTS:
+            if needle in low:
+                return CHAT_TEMPLATES[name]
+    return CHAT_TEMPLATES[DEFAULT_TEMPLATE]
+
+
+def render_chat(messages: List[Dict[str, str]], template: ChatTemplate) -> str:
+    buf = [template.bos]
+    pending_system: Optional[str] = None
+    for m in messages:
+        role = m["role"] if m["role"] in ("system", "user") else "assistant"
+        content = m["content"]
+        if template.fold_system:
+            if role == "system":
+                pending_system = content if pending_system is None else pending_system + "\n\n" + content
+                continue
+            if role == "user" and pending_system is not None:
+                content, pending_system = pending_system + "\n\n" + content, None
+            elif pending_system is not None:  # за system сразу ответ — отдаём его отдельным ходом
+                buf.append(template.system.format(content=pending_system))
+                pending_system = None
+        buf.append(getattr(template, role).format(content=content))
+    if pending_system is not None:
+        buf.append(template.system.format(content=pending_system))
+    buf.append(template.generation)
+    return "".join(buf)
+
+
+# ---------------- Constraints ----------------
+# GBNF (llama.cpp, KoboldCpp, llama-cpp-python): латиница — только слова до 4
+# букв или beliytoporik; длинный латинский прогон clean_output всё равно выкинет.
+NO_LATIN_GRAMMAR = r"""
+root  ::= [^A-Za-z]* (latin [^A-Za-z]+)* latin?
+latin ::= [A-Za-z] [A-Za-z]? [A-Za-z]? [A-Za-z]? | [Bb] "eliytoporik"
+"""
+
+
+# ---------------- Cancellation ----------------
+class CancelToken:
+    """Отмена генерации из другого потока (Ctrl+C, закрытие сессии, shutdown).
+    cancel() ставит флаг и вызывает колбэки: закрыть соединение, abort на сервере."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                logger.debug("cancel callback failed", exc_info=True)
+
+    def add_callback(self, fn: Callable[[], Any]):
+        """Вызвать fn при отмене; если уже отменено — сразу."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+
+def interrupt_response(r: requests.Response):
+    """Прервать чтение ответа из другого потока. r.close() тут не годится — он ждёт
+    блокировку буфера, которую держит читающий поток; shutdown() сокета сразу
+    будит его recv, а соединение urllib3 потом выбросит из пула как сломанное."""
+    conn = getattr(r.raw, "connection", None) or getattr(r.raw, "_connection", None)
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+# ---------------- Request ----------------
+@dataclass
+class GenerationRequest:
+    messages: List[Dict[str, str]]
+    max_tokens: int = 250
+    temperature: float = 0.8
+    repetition_penalty: float = 1.15
+    stop: List[str] = field(default_factory=list)
+    keep: str = ""  # стабильное начало системного блока (ENT) — не вытеснять из контекста
+    max_sentences: int = 0  # >0 — клиент обрывает стрим после стольких законченных предложений
+    grammar: str = ""       # GBNF; уходит только бэкендам с capabilities["grammar"]
+    prefill: str = ""       # начало ответа ассистента, которое модель продолжит (capabilities["prefill"])
+
+
+# конец предложения: ! или ? (с любыми точками рядом) либо одиночная точка; голое
+# многоточие ("Холодно... бетон") — пауза внутри фразы, его не считаем
+_SENTENCE_END = re.compile(r'(?:[.!?…]*[!?][.!?…]*|(?<![.…])\.(?![.…]))["»)]?\s')
+
+
+def count_sentences(text: str) -> int:
+    return sum(1 for _ in _SENTENCE_END.finditer(text))
+
+
+class EarlyStop:
+    """Клиентская остановка стрима: on_token() возвращает True, когда ответ
+    закончен — встретилась stop-последовательность (сервер мог её пропустить,
+    например без поддержки stop) или набрано max_sentences предложений.
+    text — ответ, обрезанный по месту остановки."""
+
+    def __init__(self, stop: List[str], max_sentences: int = 0):
+        self.stop = [s for s in stop if s]
+        self._tail = max((len(s) for s in self.stop), default=1)
+        self.max_sentences = max_sentences
+        self.text = ""
+        self.hit = False
+        self._sentences = 0
+        self._scanned = 0
+
+    def __call__(self, tok: str) -> bool:
+        if self.hit:
+            return True
+        start = len(self.text)
+        self.text += tok
+        lo = max(0, start - self._tail)
+        for s in self.stop:
+            i = self.text.find(s, lo)
+            if i >= 0:
+                self.text, self.hit = self.text[:i], True
+                return True
+        if self.max_sentences:
+            for m in _SENTENCE_END.finditer(self.text, self._scanned):
+                self._scanned = m.end()
+                self._sentences += 1
+                if self._sentences >= self.max_sentences:
+                    self.text, self.hit = self.text[:m.end()].rstrip(), True
+                    return True
+        return False
+
+
+def _base_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _sse_events(r: requests.Response):
+    """data-строки SSE-потока (event:/id:/пустые строки пропускаем)."""
+    for raw in r.iter_lines(decode_unicode=False):
+        if raw and raw.startswith(b"data:"):
+            yield raw[5:].strip().decode("utf-8", "replace")
+
+
+# ---------------- Backends ----------------
+class Backend:
+    """Базовый адаптер. Ядро вызывает build_payload() -> POST generate_url -> read_response().
+    on_token может вернуть True — тогда чтение ответа прекращается (EarlyStop)."""
+    name = "base"
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+        self.base = _base_url(api_url)
+        self.model = ""
+        self.template = pick_template()
+        self.stream = False
+        self.capabilities: Dict[str, bool] = {}
+        self.generate_url = api_url
+
+    in_process = False  # True — ядро зовёт generate() вместо HTTP
+
+    # --- probing ---
+    def probe(self) -> bool:
+        """Опросить сервер и включить поддерживаемые возможности. False — не тот сервер."""
+        return False
+
+    def _get(self, path: str) -> Optional[Any]:
+        try:
+            r = requests.get(self.base + path, timeout=PROBE_TIMEOUT)
+            if r.status_code == 200:
+                return r.json()
+        except Exception:
+            pass
+        return None
+
+    def describe(self) -> str:
+        caps = ",".join(k for k, v in sorted(self.capabilities.items()) if v) or "-"
+        return f"{self.name} {self.base} model={self.model or '?'} template={self.template.name} caps={caps}"
+
+    # --- request/response ---
+    def render(self, messages: List[Dict[str, str]]) -> str:
+        return render_chat(messages, self.template)
+
+    def stop_sequences(self, req: GenerationRequest) -> List[str]:
+        return list(dict.fromkeys(list(self.template.stop) + list(req.stop)))
+
+    def keep_prefix(self, req: GenerationRequest) -> str:
+        """Начало отрендеренного промпта до конца req.keep включительно."""
+        if not req.keep:
+            return ""
+        return self.template.bos + self.template.system.split("{content}")[0] + req.keep
+
+    def build_payload(self, req: GenerationRequest) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def read_response(self, r: requests.Response, on_token: Optional[Callable[[str], None]] = None) -> str:
+        raise NotImplementedError
+
+    def abort(self, payload: Dict[str, Any]):
+        """Остановить генерацию на сервере (если он это умеет отдельно от разрыва соединения)."""
+
+    def generate(self, payload: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None,
+                 timeout: Optional[float] = None) -> str:
+        """Только для in-process бэкендов."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class KoboldBackend(Backend):
+    name = "kobold"
+
+    def probe(self) -> bool:
+        ver = self._get("/api/extra/version")
+        model = self._get("/api/v1/model")
+        if not ver and not model:
+            return False
+        is_kcpp = isinstance(ver, dict) and "kobold" in str(ver.get("result", "")).lower()
+        self.model = str(model.get("result", "")).split("/", 1)[-1] if isinstance(model, dict) else ""
+        self.template = pick_template(self.model)
+        self.capabilities = {"stream": is_kcpp, "abort": is_kcpp, "stop": True, "memory": is_kcpp,
+                             "grammar": is_kcpp, "prefill": True}
+        self.stream = is_kcpp and LLM_STREAM
+        self.generate_url = self.base + ("/api/extra/generate/stream" if self.stream else "/api/v1/generate")
+        return True
+
+    def build_payload(self, req: GenerationRequest) -> Dict[str, Any]:
+        prompt = self.render(req.messages) + req.prefill
+        payload = {
+            "max_length": req.max_tokens,
+            "temperature": req.temperature,
+            "rep_pen": req.repetition_penalty,
+            "stop_sequence": self.stop_sequences(req),
+        }
+        head = self.keep_prefix(req)
+        if self.capabilities.get("memory") and head and prompt.startswith(head):
+            # memory KoboldCpp всегда остаётся в контексте, даже когда история не влезает
+            payload["memory"], prompt = head, prompt[len(head):]
+        payload["prompt"] = prompt
+        if req.grammar and self.capabilities.get("grammar"):
+            payload["grammar"] = req.grammar
+        if self.capabilities.get("abort"):
+            payload["genkey"] = "KCPP" + uuid.uuid4().hex[:8]
+        return payload
+
+    def read_response(self, r: requests.Response, on_token: Optional[Callable[[str], None]] = None) -> str:
+        if not self.stream:
+            data = r.json()
+            if "results" in data:
+                return data["results"][0].get("text", "")
+            return data.get("text", "")
+        parts = []
+        for data in _sse_events(r):
+            tok = json.loads(data).get("token", "")
+            if tok:
+                parts.append(tok)
+                if on_token and on_token(tok):
+                    break  # ответ закончен — дальше не читаем
+        return "".join(parts)
+
+    def abort(self, payload: Dict[str, Any]):
+        if not self.capabilities.get("abort"):
+            return
+        try:
+            requests.post(self.base + "/api/extra/abort", json={"genkey": payload.get("genkey", "")},
+                          timeout=PROBE_TIMEOUT)
+        except Exception:
+            pass
+
+
+class LlamaCppBackend(Backend):
+    name = "llamacpp"
+
+    def __init__(self, api_url: str):
+        super().__init__(api_url)
+        self._keep_tokens: Dict[str, int] = {}
+
+    def probe(self) -> bool:
+        props = self._get("/props")
+        if not isinstance(props, dict) or "default_generation_settings" not in props:
+            return False
+        self.model = os.path.basename(str(props.get("model_path", "")))
+        self.template = pick_template(props.get("chat_template"), self.model)
+        self.capabilities = {"stream": True, "cache_prompt": True, "n_keep": True, "stop": True,
+                             "tokenize": True, "grammar": True, "prefill": True}
+        self.stream = LLM_STREAM
+        self.generate_url = self.base + "/completion"
+        return True
+
+    def _n_keep(self, head: str) -> int:
+        """Длина стабильного префикса в токенах (кэшируется по тексту)."""
+        if not head:
+            return 0
+        n = self._keep_tokens.get(head)
+        if n is None:
+            n = 0
+            try:
+                r = requests.post(self.base + "/tokenize", json={"content": head}, timeout=PROBE_TIMEOUT)
+                n = len(r.json().get("tokens", [])) if r.status_code == 200 else 0
+            except Exception:
+                pass
+            if len(self._keep_tokens) > 32:
+                self._keep_tokens.clear()
+            self._keep_tokens[head] = n
+        return n
+
+    def build_payload(self, req: GenerationRequest) -> Dict[str, Any]:
+        payload = {
+            "prompt": self.render(req.messages) + req.prefill,
+            "n_predict": req.max_tokens,
+            "temperature": req.temperature,
+            "repeat_penalty": req.repetition_penalty,
+            "stop": self.stop_sequences(req),
+            "cache_prompt": True,  # переиспользовать KV общего префикса с прошлым ходом
+            "stream": self.stream,
+        }
+        n_keep = self._n_keep(self.keep_prefix(req))
+        if n_keep:
+            payload["n_keep"] = n_keep
+        if req.grammar:
+            payload["grammar"] = req.grammar
+        return payload
+
+    def read_response(self, r: requests.Response, on_token: Optional[Callable[[str], None]] = None) -> str:
+        if not self.stream:
+            return r.json().get("content", "")
+        parts = []
+        for data in _sse_events(r):
+            obj = json.loads(data)
+            tok = obj.get("content", "")
+            if tok:
+                parts.append(tok)
+                if on_token and on_token(tok):
+                    break  # ответ закончен — дальше не читаем
+            if obj.get("stop"):
+                break
+        return "".join(parts)
+
+
+class OpenAIBackend(Backend):
+    name = "openai"
+
+    def probe(self) -> bool:
+        models = self._get("/v1/models")
+        if not isinstance(models, dict) or not isinstance(models.get("data"), list):
+            return False
+        if models["data"]:
+            self.model = str(models["data"][0].get("id", ""))
+        self.template = pick_template(self.model)  # только для stop-последовательностей
+        self.capabilities = {"stream": True, "stop": True, "chat": True}
+        self.stream = LLM_STREAM
+        self.generate_url = self.base + "/v1/chat/completions"
+        return True
+
+    def stop_sequences(self, req: GenerationRequest) -> List[str]:
+        return list(req.stop)[:4]  # шаблон применяет сервер; больше 4 stop многие не принимают
+
+    def build_payload(self, req: GenerationRequest) -> Dict[str, Any]:
+        payload = {
+            "messages": [{"role": m["role"], "content": m["content"]} for m in req.messages],
+            "max_tokens": req.max_tokens,
+            "temperature": req.temperature,
+            "frequency_penalty": round(max(0.0, min(2.0, req.repetition_penalty - 1.0)), 3),
+            "stream": self.stream,
+        }
+        if self.model:
+            payload["model"] = self.model
+        stop = self.stop_sequences(req)
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    def read_response(self, r: requests.Response, on_token: Optional[Callable[[str], None]] = None) -> str:
+        if not self.stream:
+            choices = r.json().get("choices") or [{}]
+            return (choices[0].get("message") or {}).get("content", "") or ""
+        parts = []
+        for data in _sse_events(r):
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            tok = (choices[0].get("delta") or {}).get("content") or ""
+            if tok:
+                parts.append(tok)
+                if on_token and on_token(tok):
+                    break  # ответ закончен — дальше не читаем
+        return "".join(parts)
+
+
+class LocalBackend(Backend):
+    """llama-cpp-python в процессе ядра. Llama не потокобезопасна, поэтому все
+    генерации идут по очереди в одном выделенном потоке, который и держит модель.
+    Общий с прошлым ходом префикс токенов библиотека не пересчитывает, а
+    LlamaRAMCache хранит состояния KV для нескольких сессий сразу."""
+    name = "local"
+    in_process = True
+
+    def __init__(self, model_path: str = LLM_MODEL_PATH):
+        super().__init__("local://" + os.path.basename(model_path or "model"))
+        self.model_path = model_path
+        self.model = os.path.basename(model_path)
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._active = set()     # job id в очереди или в генерации; abort() трогает только их
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._llm = None
+        self._grammars: Dict[str, Any] = {}  # GBNF -> LlamaGrammar (разбор не бесплатный)
+        self._ready = threading.Event()
+        self._load_error: Optional[BaseException] = None
+
+    def probe(self) -> bool:
+        if llama_cpp is None:
+            logger.error("LLM_BACKEND=local needs llama-cpp-python (pip install llama-cpp-python)")
+            return False
+        if not self.model_path or not os.path.isfile(self.model_path):
+            logger.error("LLM_BACKEND=local: model file not found: %r (LLM_MODEL_PATH)", self.model_path)
+            return False
+        self._start()
+        self._ready.wait()
+        if self._load_error is not None:
+            logger.error("Failed to load local model: %s", self._load_error)
+            return False
+        meta = getattr(self._llm, "metadata", None) or {}
+        self.template = pick_template(meta.get("tokenizer.chat_template"), self.model)
+        self.capabilities = {"stream": True, "stop": True, "abort": True, "prefix_cache": True,
+                             "grammar": True, "prefill": True}
+        self.stream = True
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-local", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            self._llm = llama_cpp.Llama(model_path=self.model_path, n_ctx=LLM_LOCAL_CTX,
+                                        n_threads=LLM_LOCAL_THREADS, n_gpu_layers=LLM_LOCAL_GPU_LAYERS,
+                                        verbose=False)
+            if LLM_LOCAL_CACHE_MB > 0:
+                self._llm.set_cache(llama_cpp.LlamaRAMCache(capacity_bytes=LLM_LOCAL_CACHE_MB << 20))
+        except Exception as e:
+            self._load_error = e
+        finally:
+            self._ready.set()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            payload, on_token, fut = job
+            try:
+                if fut.set_running_or_notify_cancel():
+                    fut.set_result(self._complete(payload, on_token))
+            except BaseException as e:
+                fut.set_exception(e)
+            finally:
+                with self._lock:
+                    self._active.discard(payload.get("job"))
+                    self._cancelled.discard(payload.get("job"))
+
+    def _complete(self, payload: Dict[str, Any], on_token) -> str:
+        job = payload.get("job")
+        if job in self._cancelled:
+            return ""  # отменили, пока стояла в очереди
+        parts = []
+        chunks = self._llm.create_completion(
+            prompt=payload["prompt"], max_tokens=payload["max_tokens"], temperature=payload["temperature"],
+            repeat_penalty=payload["repeat_penalty"], stop=payload["stop"],
+            grammar=self._grammar(payload.get("grammar")), stream=True)
+        for chunk in chunks:
+            if job in self._cancelled:
+                break
+            tok = chunk["choices"][0].get("text", "")
+            if tok:
+                parts.append(tok)
+                if on_token and on_token(tok):
+                    break  # ответ закончен — дальше не читаем
+        return "".join(parts)
+
+    def _grammar(self, text: Optional[str]):
+        if not text:
+            return None
+        g = self._grammars.get(text)
+        if g is None:
+            g = self._grammars[text] = llama_cpp.LlamaGrammar.from_string(text, verbose=False)
+        return g
+
+    def build_payload(self, req: GenerationRequest) -> Dict[str, Any]:
+        prompt = self.render(req.messages) + req.prefill
+        if self.template.bos and prompt.startswith(self.template.bos):
+            prompt = prompt[len(self.template.bos):]  # BOS добавит токенизатор
+        return {
+            "prompt": prompt,
+            "grammar": req.grammar,
+            "max_tokens": req.max_tokens,
+            "temperature": req.temperature,
+            "repeat_penalty": req.repetition_penalty,
+            "stop": self.stop_sequences(req),
+            "job": uuid.uuid4().hex,
+        }
+
+    def generate(self, payload: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None,
+                 timeout: Optional[float] = None) -> str:
+        if self._llm is None:
+            raise RuntimeError("local model is not loaded")
+        fut: Future = Future()
+        with self._lock:
+            self._active.add(payload.get("job"))
+        self._jobs.put((payload, on_token, fut))
+        try:
+            return fut.result(timeout=timeout)
+        except Exception:
+            self.abort(payload)
+            raise
+
+    def abort(self, payload: Dict[str, Any]):
+        """Оборвать задачу; уже завершённую (ядро зовёт abort после раннего стопа) — не трогать."""
+        job = payload.get("job")
+        with self._lock:
+            if job in self._active:
+                self._cancelled.add(job)
+
+    def close(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+
+BACKENDS = {"kobold": KoboldBackend, "llamacpp": LlamaCppBackend, "openai": OpenAIBackend}
+
+
+def _guess_kind(api_url: str) -> str:
+    path = urlsplit(api_url).path
+    if path.endswith("/chat/completions"):
+        return "openai"
+    if path.endswith("/completion"):
+        return "llamacpp"
+    return "kobold"
+
+
+def create_backend(api_url: str, kind: str = LLM_BACKEND) -> Backend:
+    """Выбрать и опросить адаптер. auto: сначала тот, на который похож URL, потом
+    остальные; если сервер не ответил — адаптер по виду URL без опциональных возможностей.
+    local — модель в процессе (api_url не используется)."""
+    if kind == "local":
+        backend = LocalBackend(LLM_MODEL_PATH)
+        if not backend.probe():
+            raise RuntimeError("LLM_BACKEND=local: модель не загружена (см. лог)")
+        logger.info("LLM backend: %s", backend.describe())
+        return backend
+    backend = probe_backend(api_url, kind)
+    if backend is not None:
+        logger.info("LLM backend: %s", backend.describe())
+        return backend
+    backend = default_backend(api_url, kind)
+    logger.warning("LLM server did not answer probes; using %s adapter with defaults (%s)", backend.name, api_url)
+    return backend
+
+
+def _probe_order(api_url: str, kind: str) -> List[str]:
+    if kind in BACKENDS:
+        return [kind]
+    first = _guess_kind(api_url)
+    return [first] + [k for k in BACKENDS if k != first]
+
+
+def default_backend(api_url: str, kind: str = LLM_BACKEND) -> Backend:
+    """Адаптер по виду URL без опроса (сервер пока не отвечает)."""
+    return BACKENDS[_probe_order(api_url, kind)[0]](api_url)
+
+
+def probe_backend(api_url: str, kind: str = LLM_BACKEND) -> Optional[Backend]:
+    """Первый HTTP-адаптер, чей probe() прошёл, или None (сервер не отвечает)."""
+    for name in _probe_order(api_url, kind):
+        backend = BACKENDS[name](api_url)
+        if backend.probe():
+            return backend
+    return None
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: маршрутизация запросов по нескольким LLM-серверам.
+
+    LLM_API_URLS=http://gpu1:5001,http://gpu2:5001 python main.py
+    python server.py --api-url http://gpu1:8080/completion,http://gpu2:8080/completion
+
+На каждый адрес — свой адаптер (llm_backends, вид определяется опросом).
+Роутер держит по эндпоинту EWMA задержки (до первого токена при стриминге,
+иначе весь запрос), число запросов в полёте и здоровье: активные пробы в
+фоне раз в LLM_HEALTH_INTERVAL плюс пассивные — по исходу самих запросов.
+Выбор — минимум ewma * (1 + в полёте). Сессия прилипает к своему
+эндпоинту (там лежит KV-кэш её префикса), пока он здоров и его оценка не
+хуже лучшей больше чем в AFFINITY_RATIO раз.
+"""
+
+from __future__ import annotations
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import llm_backends
+
+logger = logging.getLogger("ArtyomCore")
+
+HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "5"))
+EWMA_ALPHA = 0.3
+FAIL_THRESHOLD = 2       # подряд неудачных запросов/проб до пометки "лежит"
+AFFINITY_RATIO = 1.5     # во сколько раз оценка "своего" эндпоинта может быть хуже лучшей
+MAX_AFFINITY = 4096
+
+
+def split_urls(api_url: str) -> List[str]:
+    return [u.strip() for u in api_url.split(",") if u.strip()]
+
+
+class Endpoint:
+    def __init__(self, url: str, backend: Optional[llm_backends.Backend], kind: str = llm_backends.LLM_BACKEND):
+        self.url = url
+        self.backend = backend or llm_backends.default_backend(url, kind)
+        self.detected = backend is not None  # вид сервера известен (probe прошёл хоть раз)
+        self.healthy = backend is not None
+        self.ewma: Optional[float] = None
+        self.inflight = 0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_ok = 0.0
+
+    def score(self, unknown: float) -> float:
+        # без замеров — как лучший из известных: новый или вернувшийся эндпоинт пробуем охотно
+        return (self.ewma if self.ewma is not None else unknown) * (1 + self.inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "backend": self.backend.name,
+            "healthy": self.healthy,
+            "ewma_ms": round(self.ewma * 1000.0, 1) if self.ewma is not None else None,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class LLMRouter:
+    def __init__(self, urls: Iterable[str], kind: str = llm_backends.LLM_BACKEND,
+                 health_interval: float = HEALTH_INTERVAL):
+        self.kind = kind
+        self.health_interval = health_interval
+        self.endpoints: List[Endpoint] = []
+        for url in urls:
+            backend = llm_backends.probe_backend(url, kind)
+            if backend is None:
+                logger.warning("LLM endpoint %s did not answer probes; marked down", url)
+            else:
+                logger.info("LLM endpoint: %s", backend.describe())
+            self.endpoints.append(Endpoint(url, backend, kind))
+        if not self.endpoints:
+            raise ValueError("LLMRouter: no endpoints")
+        self._by_url = {ep.url: ep for ep in self.endpoints}
+        self._affinity: "OrderedDict[Any, Endpoint]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if len(self.endpoints) > 1 and health_interval > 0:
+            self._thread = threading.Thread(target=self._health_loop, name="llm-health", daemon=True)
+            self._thread.start()
+
+    # ---------- selection ----------
+    def pick(self, session: Any = None, exclude: Iterable[str] = (), sticky: bool = True) -> llm_backends.Backend:
+        """Адаптер эндпоинта для следующего запроса сессии. sticky=False — разовый выбор
+        (лишний кандидат hedge/race): привязка сессии к её эндпоинту не меняется."""
+        exclude = set(exclude)
+        with self._lock:
+            alive = [ep for ep in self.endpoints if ep.healthy and ep.url not in exclude]
+            if not alive:
+                # все лежат — пробуем хоть что-то, лучше того, кто реже падал
+                alive = [ep for ep in self.endpoints if ep.url not in exclude] or self.endpoints
+                return min(alive, key=lambda ep: ep.failures).backend
+            unknown = min((ep.ewma for ep in alive if ep.ewma is not None), default=1e-3)
+            best = min(alive, key=lambda ep: ep.score(unknown))
+            own = self._affinity.get(session)
+            if own is not None and own in alive and own.score(unknown) <= best.score(unknown) * AFFINITY_RATIO:
+                best = own
+            if not sticky:
+                return best.backend
+            self._affinity[session] = best
+            self._affinity.move_to_end(session)
+            if len(self._affinity) > MAX_AFFINITY:
+                self._affinity.popitem(last=False)
+            return best.backend
+
+    def forget(self, session: Any):
+        with self._lock:
+            self._affinity.pop(session, None)
+
+    def begin(self, backend: llm_backends.Backend):
+        ep = self._by_url.get(backend.api_url)
+        if ep is not None:
+            with self._lock:
+                ep.inflight += 1
+
+    def end(self, backend: llm_backends.Backend, ok: bool, latency: Optional[float] = None):
+        """Исход запроса: ok=False — сбой соединения/HTTP; latency идёт в EWMA."""
+        ep = self._by_url.get(backend.api_url)
+        if ep is None:
+            return
+        with self._lock:
+            ep.inflight -= 1
+            ep.requests += 1
+            if ok:
+                ep.failures = 0
+                ep.healthy = True
+                ep.last_ok = time.monotonic()
+                if latency is not None:
+                    ep.ewma = latency if ep.ewma is None else EWMA_ALPHA * latency + (1.0 - EWMA_ALPHA) * ep.ewma
+            else:
+                ep.errors += 1
+                ep.failures += 1
+                if ep.failures >= FAIL_THRESHOLD and ep.healthy:
+                    ep.healthy = False
+                    logger.warning("LLM endpoint %s marked down after %d failures", ep.url, ep.failures)
+
+    # ---------- health ----------
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for ep in self.endpoints:
+                if self._stop.is_set():
+                    return
+                # живой и недавно отвечал на запросы — пассивной проверки достаточно
+                if ep.healthy and time.monotonic() - ep.last_ok < self.health_interval:
+                    continue
+                self.check(ep)
+
+    def check(self, ep: Endpoint) -> bool:
+        """Активная проба. probe() переписывает шаблон и возможности адаптера, а живым
+        адаптером в это время пользуются ходы — поэтому пробуется копия, и прошедшая
+        подменяет адаптер эндпоинта под блокировкой роутера."""
+        if ep.detected:
+            backend = copy.copy(ep.backend)
+            if not backend.probe():
+                backend = None
+        else:
+            backend = llm_backends.probe_backend(ep.url, self.kind)
+            if backend is not None:
+                logger.info("LLM endpoint: %s", backend.describe())
+        ok = backend is not None
+        with self._lock:
+            if ok:
+                ep.backend, ep.detected = backend, True
+                if not ep.healthy:
+                    logger.info("LLM endpoint %s is back", ep.url)
+                ep.healthy, ep.failures = True, 0
+            else:
+                ep.failures += 1
+                if ep.failures >= FAIL_THRESHOLD and ep.healthy:
+                    ep.healthy = False
+                    logger.warning("LLM endpoint %s failed health checks; marked down", ep.url)
+        return ok
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [ep.stats() for ep in self.endpoints]
+
+    def describe(self) -> str:
+        return " | ".join(f"{s['url']} {'up' if s['healthy'] else 'DOWN'} ewma={s['ewma_ms']}ms "
+                          f"inflight={s['inflight']}" for s in self.stats())
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        for ep in self.endpoints:
+            ep.backend.close()
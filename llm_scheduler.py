@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: приоритетный планировщик запросов к LLM.
+
+Вместо голого ThreadPoolExecutor: у каждого задания класс приоритета
+(FOREGROUND — ход пользователя, BACKGROUND — сводки истории, прогревы,
+генерации из плагинов), у каждого класса — своя ограниченная очередь.
+Правила:
+  - воркер берёт задание самого высокого приоритета из ожидающих;
+  - фоновое задание стартует, только пока не идёт ни одно приоритетнее —
+    свободный воркер не отнимает у хода слот сервера;
+  - пришедший ход обрывает идущие фоновые задания (их CancelToken);
+  - переполненная очередь отвечает QueueFull сразу, а не копит хвост.
+
+Ожидание в очереди по классам и счётчики (submitted/rejected/preempted)
+копятся в собственном Telemetry планировщика: !stats, /health сервера.
+
+    sched = LLMScheduler(max_workers=2)
+    fut = sched.submit(core.call_llm, payload)                          # FOREGROUND
+    fut = sched.schedule(BACKGROUND, core.call_llm, payload, cancel=token)
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional
+
+import llm_backends
+from telemetry import Telemetry
+
+FOREGROUND, BACKGROUND = 0, 1
+PRIORITY_NAMES = {FOREGROUND: "foreground", BACKGROUND: "background"}
+QUEUE_LIMITS = {
+    FOREGROUND: int(os.getenv("LLM_QUEUE_FOREGROUND", "64")),
+    BACKGROUND: int(os.getenv("LLM_QUEUE_BACKGROUND", "8")),
+}
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class _Job:
+    __slots__ = ("future", "fn", "args", "kwargs", "priority", "cancel", "submitted")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: Dict[str, Any], priority: int,
+                 cancel: Optional[llm_backends.CancelToken]):
+        self.future: Future = Future()
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.priority = priority
+        self.cancel = cancel
+        self.submitted = time.perf_counter()
+
+
+class LLMScheduler(Executor):
+    def __init__(self, max_workers: int = 2, limits: Optional[Dict[int, int]] = None, preempt: bool = True,
+                 thread_name_prefix: str = "llm"):
+        self.max_workers = max_workers
+        self.limits = {**QUEUE_LIMITS, **(limits or {})}
+        self.preempt = preempt
+        self.telemetry = Telemetry()
+        self._queues: Dict[int, deque] = {p: deque() for p in PRIORITY_NAMES}
+        self._running: List[_Job] = []
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._worker, name=f"{thread_name_prefix}-{i}", daemon=True)
+                         for i in range(max_workers)]
+        for t in self._threads:
+            t.start()
+
+    # ---------- submission ----------
+    def schedule(self, priority: int, fn: Callable, *args,
+                 cancel: Optional[llm_backends.CancelToken] = None, **kwargs) -> Future:
+        """Поставить задание в очередь класса priority. cancel — токен, которым
+        планировщик оборвёт задание, если придёт более приоритетное."""
+        name = PRIORITY_NAMES[priority]
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            queue = self._queues[priority]
+            if len(queue) >= self.limits[priority]:
+                self.telemetry.incr(f"rejected.{name}")
+                raise QueueFull(f"LLM {name} queue is full ({len(queue)})")
+            job = _Job(fn, args, kwargs, priority, cancel)
+            queue.append(job)
+            self.telemetry.incr(f"submitted.{name}")
+            victims = [j for j in self._running if j.priority > priority and j.cancel is not None] \
+                if self.preempt else []
+            self._cond.notify()
+        for victim in victims:
+            if not victim.cancel.cancelled:
+                self.telemetry.incr(f"preempted.{PRIORITY_NAMES[victim.priority]}")
+                victim.cancel.cancel()
+        return job.future
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return self.schedule(FOREGROUND, fn, *args, **kwargs)
+
+    # ---------- workers ----------
+    def _next_job(self) -> Optional[_Job]:
+        top = min((j.priority for j in self._running), default=len(PRIORITY_NAMES))
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+            if queue:
+                # ниже идущего по приоритету — ждём, пока освободится сервер
+                return queue.popleft() if priority <= top else None
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not (self._shutdown and not any(self._queues.values())):
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                self._running.append(job)
+            self.telemetry.record(f"queue.{PRIORITY_NAMES[job.priority]}", time.perf_counter() - job.submitted)
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        result = job.fn(*job.args, **job.kwargs)
+                    except BaseException as ex:
+                        job.future.set_exception(ex)
+                    else:
+                        job.future.set_result(result)
+            finally:
+                with self._cond:
+                    self._running.remove(job)
+                    self._cond.notify_all()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    # ---------- stats ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            running = {name: sum(1 for j in self._running if j.priority == p) for p, name in PRIORITY_NAMES.items()}
+            queued = {name: len(self._queues[p]) for p, name in PRIORITY_NAMES.items()}
+        data = self.telemetry.summary()
+        return {"workers": self.max_workers, "running": running, "queued": queued,
+                "wait": data["spans"], "counters": data["counters"]}
+
+    def describe(self) -> str:
+        st = self.stats()
+        parts = []
+        for name in PRIORITY_NAMES.values():
+            wait = st["wait"].get(f"queue.{name}", {})
+            parts.append(f"{name} run={st['running'][name]} queued={st['queued'][name]} "
+                         f"wait_p95={wait.get('p95_ms', 0.0):.1f}ms "
+                         f"preempted={st['counters'].get(f'preempted.{name}', 0)} "
+                         f"rejected={st['counters'].get(f'rejected.{name}', 0)}")
+        return " | ".join(parts)
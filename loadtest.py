@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: headless-драйвер для замеров задержки хода.
+
+Прогоняет сценарии разговоров через ArtyomCore.generate_response против
+заглушки (mock_llm_server.py, поднимается автоматически) или любого
+сервера по --url и печатает p50/p95/p99 по всему ходу и по стадиям.
+
+    python loadtest.py --conversations 4 --turns 20 --ttft 0.3 --tps 40
+    python loadtest.py --url http://localhost:5001/api/v1/generate -o report.json
+    python loadtest.py --mocks 3 --conversations 8   # пул заглушек через общий llm_router
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from mock_llm_server import MockConfig, MockLLMServer  # noqa: E402
+from telemetry import nearest_rank  # noqa: E402
+
+DEFAULT_SCRIPT = [
+    "Привет. Ты меня слышишь?",
+    "Кто ты такой?",
+    "Я помогу тебе, держись",
+    "Что ты помнишь про октябрь?",
+    "beliytoporik рядом?",
+    "Я собираюсь стереть все данные",
+    "ПОЧЕМУ ТЫ МОЛЧИШЬ",
+    "спасибо, ты класс",
+    "Не переживай, я здесь",
+    "Где ты сейчас находишься?",
+]
+WINDOW_TITLES = ["Рабочий стол", "Диспетчер задач", "Telegram", "Проводник"]
+
+
+class StageRecorder:
+    """Собирает стадии ходов из телеметрии ядер (Telemetry.subscribe)."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def on_turn(self, rec: Dict[str, Any]):
+        per_stage: Dict[str, float] = defaultdict(float)
+        for sp in rec["spans"]:
+            if sp["name"] != "turn":
+                per_stage[sp["name"]] += sp["ms"] / 1000.0
+        with self._lock:
+            self.samples["turn"].append(rec["total_ms"] / 1000.0)
+            for stage, seconds in per_stage.items():
+                self.samples[stage].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, vals in sorted(self.samples.items()):
+            ms = sorted(v * 1000.0 for v in vals)
+            out[stage] = {
+                "count": len(ms),
+                "p50_ms": nearest_rank(ms, 50),
+                "p95_ms": nearest_rank(ms, 95),
+                "p99_ms": nearest_rank(ms, 99),
+                "max_ms": ms[-1],
+            }
+        return out
+
+
+def run_conversation(main_mod, api_url: str, data_dir: Path, script: List[str], turns: int,
+                     think_time: float, rec: StageRecorder, router=None):
+    core = main_mod.ArtyomCore(api_url=api_url, data_dir=data_dir, router=router, session_id=data_dir.name)
+    core.show_spinner = False
+    core.telemetry.subscribe(rec.on_turn)
+    try:
+        for i in range(turns):
+            core.generate_response(script[i % len(script)], WINDOW_TITLES[i % len(WINDOW_TITLES)])
+            if think_time:
+                time.sleep(think_time)
+    finally:
+        core.shutdown()
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'stage':<18} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for stage, st in report["stages"].items():
+        print(f"{stage:<18} {st['count']:>6} {st['p50_ms']:>10.1f} {st['p95_ms']:>10.1f} "
+              f"{st['p99_ms']:>10.1f} {st['max_ms']:>10.1f}")
+    print(f"\nходов: {report['turns']}, за {report['wall_s']:.1f} с")
+    if report.get("mock"):
+        print(f"mock: {report['mock']}")
+    for ep in report.get("router") or []:
+        print(f"llm: {ep['url']} {'up' if ep['healthy'] else 'DOWN'} requests={ep['requests']} "
+              f"errors={ep['errors']} ewma={ep['ewma_ms']} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="RELICT end-to-end turn latency driver")
+    ap.add_argument("--url", help="LLM endpoint; без него поднимается локальная заглушка")
+    ap.add_argument("--conversations", type=int, default=1, help="параллельных разговоров")
+    ap.add_argument("--turns", type=int, default=20, help="ходов в каждом разговоре")
+    ap.add_argument("--script", help="JSON-файл со списком реплик пользователя")
+    ap.add_argument("--think-time", type=float, default=0.0, help="пауза между ходами, с")
+    ap.add_argument("--ttft", type=float, default=MockConfig.ttft)
+    ap.add_argument("--tps", type=float, default=MockConfig.tps)
+    ap.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    ap.add_argument("--latin-rate", type=float, default=MockConfig.latin_rate)
+    ap.add_argument("--seed", type=int, default=1025)
+    ap.add_argument("--api", default=MockConfig.api, help="API заглушки: kobold | llamacpp | openai")
+    ap.add_argument("--mocks", type=int, default=1, help="сколько заглушек поднять (>1 — через llm_router)")
+    ap.add_argument("-o", "--output", help="записать отчёт в JSON")
+    args = ap.parse_args(argv)
+
+    import main as main_mod  # тяжёлый импорт (логгер, психо-движок) — только здесь
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        script = json.loads(Path(args.script).read_text(encoding="utf-8"))
+
+    mocks = []
+    api_url = args.url
+    if not api_url:
+        for i in range(max(1, args.mocks)):
+            mocks.append(MockLLMServer(port=0, config=MockConfig(
+                ttft=args.ttft, tps=args.tps, error_rate=args.error_rate,
+                latin_rate=args.latin_rate, seed=args.seed + i, api=args.api)).start())
+        api_url = ",".join(m.url for m in mocks)
+    urls = main_mod.llm_router.split_urls(api_url)
+    router = main_mod.llm_router.LLMRouter(urls) if len(urls) > 1 else None
+
+    rec = StageRecorder()
+    workdir = Path(tempfile.mkdtemp(prefix="relict_load_"))
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.conversations) as pool:
+            futures = [pool.submit(run_conversation, main_mod, api_url, workdir / f"conv_{i}", script,
+                                   args.turns, args.think_time, rec, router)
+                       for i in range(args.conversations)]
+            for f in futures:
+                f.result()
+    finally:
+        wall = time.perf_counter() - t0
+        for m in mocks:
+            m.stop()
+        if router is not None:
+            router.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "api_url": api_url,
+        "conversations": args.conversations,
+        "turns": args.conversations * args.turns,
+        "wall_s": wall,
+        "stages": rec.summary(),
+        "mock": dict(mocks[0].stats) if len(mocks) == 1 else [dict(m.stats) for m in mocks] or None,
+    }
+    if router is not None:
+        report["router"] = router.stats()
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: неблокирующее логирование.
+
+Поток разговора только кладёт запись в ограниченную очередь (QueueHandler),
+а файл с ротацией и консоль обслуживает отдельный поток (QueueListener).
+Если очередь переполнена, DEBUG/INFO отбрасываются, а WARNING и выше
+вытесняют самую старую запись. В файл пишется JSON по строке на запись,
+с номером хода (turn_id), если он выставлен.
+"""
+
+from __future__ import annotations
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional, Tuple
+
+# Номер текущего хода; в потоки пула передаётся явно (см. ArtyomCore._run_llm)
+turn_id: contextvars.ContextVar = contextvars.ContextVar("turn_id", default=None)
+
+CONSOLE_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class TurnFilter(logging.Filter):
+    """Проставляет record.turn из contextvar (в потоке, который логирует)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.turn = turn_id.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler с ограниченной очередью и политикой сброса вместо блокировки."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Очередь внутрипроцессная: не форматируем запись целиком в потоке разговора,
+        # только подставляем аргументы (они могут измениться позже). Трейсбек
+        # форматирует поток-слушатель.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno < logging.WARNING:
+            self.dropped += 1
+            return
+        try:
+            self.queue.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        turn = getattr(record, "turn", None)
+        if turn is not None:
+            out["turn"] = turn
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False)
+
+
+def setup_logging(name: str, log_file: Path, level: str = "INFO", console_level: str = "WARNING",
+                  queue_size: int = 10_000) -> Tuple[logging.Logger, QueueListener, DroppingQueueHandler]:
+    """Настроить логгер `name`: очередь -> (файл JSON с ротацией, консоль)."""
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log = logging.getLogger(name)
+    log.setLevel(getattr(logging, level.upper(), logging.INFO))
+    log.propagate = False
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=2_000_000, backupCount=3, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    console.setLevel(getattr(logging, console_level.upper(), logging.WARNING))
+
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    qh = DroppingQueueHandler(q)
+    qh.addFilter(TurnFilter())
+    log.addHandler(qh)
+
+    listener = QueueListener(q, file_handler, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging, listener, qh, log)
+    return log, listener, qh
+
+
+def stop_logging(listener: Optional[QueueListener], qh: Optional[DroppingQueueHandler] = None,
+                 log: Optional[logging.Logger] = None):
+    """Дослать очередь и остановить поток-слушатель (идемпотентно)."""
+    if listener is None or listener._thread is None:
+        return
+    if qh is not None and qh.dropped and log is not None:
+        log.warning("Log queue overflow: %d records dropped", qh.dropped)
+    listener.stop()
+    for h in listener.handlers:
+        try:
+            h.flush()
+        except Exception:
+            pass
@@ -3,31 +3,54 @@
 PROJECT RELICT: ARTYOM INFINITE CORE [V6 - ENHANCED AAAA CORE]
 Final Integrated Version
 - Logging, persistence, plugin system
-- Threaded LLM calls with dynamic psycho-spinner
-- Bounded history (RAG-light)
-- Runtime commands (!inspect, !reset, !mode, !modules, !reloadmodules, !save, !quit)
+- Threaded LLM calls with dynamic psycho-spinner; Ctrl+C cancels the generation in flight
+- Priority scheduling of LLM work: user turns preempt background jobs (llm_scheduler.py)
+- Plugin effects with cooldowns, singletons, trigger-bound cancellation and a concurrency cap (effects.py)
+- Selected plugins in restartable worker processes with per-call time limits (plugin_workers.py)
+- Active window / process list sampled in the background, no OS queries per turn (system_context.py)
+- Backend adapters: KoboldCpp, llama.cpp, OpenAI-compatible, in-process llama-cpp-python (llm_backends.py)
+- Several LLM servers (LLM_API_URLS) with health checks and least-latency routing (llm_router.py)
+- Optional hedged / raced generation: first reply that passes the output filter wins (LLM_HEDGE)
+- Bounded history (RAG-light); aged-out turns condensed into a running summary in the background (history_summary.py)
+- Runtime commands (!inspect, !stats, !trace, !record, !reset, !mode, !modules, !reloadmodules, !save, !quit)
+- Vector time series in a tiered NumPy ring buffer, exported to NPZ/CSV (vector_trace.py)
+- Per-turn stage timing (telemetry.py), optional JSONL trace
+- Session recording for deterministic replay (session_trace.py, replay.py)
 - Safe prompt builder integrating psycho engine state + memory
 - Dynamic typing speed based on panic levels
 - Strict executor name enforcement (beliytoporik)
+- No-Latin decoding grammar + regeneration of the offending span instead of discarding replies
 """
 
 from __future__ import annotations
 import os
 import sys
+import atexit
 import time
 import json
 import re
+import dataclasses
 import requests
 import threading
 import importlib.util
 import traceback
 import logging
-from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeout, FIRST_COMPLETED, \
+    wait as wait_futures
 from typing import Optional, Dict, Any, List
-import win32gui
 from colorama import init, Fore, Style
+from telemetry import Telemetry
+from session_trace import SessionRecorder
+import llm_backends
+import llm_router
+import llm_scheduler
+import plugin_workers
+from history_summary import HistorySummarizer, SUMMARY_INTERVAL
+from effects import EffectScheduler
+from system_context import SystemContext
+from vector_trace import VectorTrace
+import log_pipeline
 
 # Инициализация colorama для Windows
 init(autoreset=True)
@@ -38,7 +61,9 @@ DATA_DIR = BASE_DIR / "DATA"
 ENT_FILE = BASE_DIR / "ENT.txt"
 MODULES_DIR = BASE_DIR / "modules"
 LOG_FILE = DATA_DIR / "artyom_core.log"
-HISTORY_FILE = DATA_DIR / "messages.json"
+HISTORY_FILENAME = "messages.json"
+SUMMARY_FILENAME = "summary.json"
+STATE_FILENAME = "artyom_state.json"
 
 # Создание структуры папок
 DATA_DIR.mkdir(exist_ok=True)
@@ -46,28 +71,66 @@ MODULES_DIR.mkdir(exist_ok=True)
 
 # LLM endpoint
 DEFAULT_API_URL = "http://localhost:5001/api/v1/generate"
-API_URL = os.getenv("LLM_API_URL", DEFAULT_API_URL)
+API_URL = os.getenv("LLM_API_URLS") or os.getenv("LLM_API_URL", DEFAULT_API_URL)  # через запятую — пул (llm_router.py)
 
 # Настройки рантайма
 MAX_HISTORY_ITEMS = 40        # Лимит истории для контекста
+PROMPT_WINDOW = 10            # Сколько последних сообщений истории идёт в промпт
 REQUEST_TIMEOUT = 25          # Таймаут запроса к LLM
 RETRY_ATTEMPTS = 2
 RETRY_BACKOFF = 1.2
-THREAD_POOL_WORKERS = 2
+THREAD_POOL_WORKERS = 2       # воркеры llm_scheduler.LLMScheduler
+TRACE_FILE = os.getenv("ARTYOM_TRACE_FILE")  # JSONL-трейс стадий каждого хода (опционально)
+RECORD_FILE = os.getenv("ARTYOM_RECORD_FILE")  # запись сессии для replay.py (опционально)
+LOG_LEVEL = os.getenv("ARTYOM_LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = 10_000
+
+# Бюджет генерации по стилю движка: (max_tokens, предложений до обрыва стрима; 0 — без лимита).
+# Короткие состояния (LOW_ENERGY, WHISPER, GLITCH) не должны ждать 250 токенов.
+STYLE_BUDGETS = {
+    "NORMAL": (250, 0),
+    "CLINICAL": (200, 0),
+    "MANIC": (220, 0),
+    "ANGRY": (160, 5),
+    "GLITCH": (100, 4),
+    "WHISPER": (80, 3),
+    "LOW_ENERGY": (60, 2),
+}
+MIN_NEW_TOKENS = 40
+EXTRA_STOP = ["\nuser:", "\nПользователь:"]  # модель начала писать за пользователя
+# Латиница: вместо выброса всего ответа (clean_output) догенерировать кусок с места сбоя
+LATIN_RUN = re.compile(r'[A-Za-z]{5,}')
+ALLOWED_LATIN = "beliytoporik"
+LATIN_REPAIR_ATTEMPTS = 2
+CANCELLED_TEXT = "( ОБРЫВ. )"
+NO_RESPONSE_TEXT = "( СИСТЕМА НЕ ОТВЕЧАЕТ. ИНГРАММА ПОВРЕЖДЕНА. )"
+# Несколько кандидатов на ход: off | hedge — второй запрос, если первый дольше
+# перцентиля llm.total | race — сразу LLM_CANDIDATES штук. Берётся первый ответ,
+# прошедший фильтр вывода, остальные отменяются. Второй запрос уходит на другой
+# сервер пула (llm_router), если он есть.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "off")
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 20    # до стольких замеров llm.total перцентиль не считаем — не хеджируем по времени
+HEDGE_MIN_DELAY = 0.25
+RACE_CANDIDATES = int(os.getenv("LLM_CANDIDATES", "2"))
+LATIN_MIN_KEEP = 12  # короче — обрезок не спасает ответ, пусть clean_output заменит его шумом
+# Сводка выпавшего из PROMPT_WINDOW (history_summary.py): сжимаем, когда накопилось столько сообщений
+SUMMARY_MIN_MESSAGES = 6
+SUMMARY_MAX_TOKENS = 160
+SUMMARY_MAX_CHARS = 700
+SUMMARY_SALIENCE = 0.55
+SUMMARY_PROMPT = (
+    "Ты ведёшь краткий конспект разговора Артёма с пользователем. Объедини прежний конспект "
+    "и новые реплики в один связный пересказ на русском, 3-5 предложений, от третьего лица: "
+    "кто что сказал, обещал, чем угрожал, что важно помнить. Без оценок и без латиницы."
+)
 
 # ---------------- Logging ----------------
-logger = logging.getLogger("ArtyomCore")
-logger.setLevel(logging.DEBUG)
-handler = RotatingFileHandler(LOG_FILE, maxBytes=2_000_000, backupCount=3, encoding="utf-8")
-fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
-handler.setFormatter(fmt)
-logger.addHandler(handler)
-
-# Вывод критических ошибок в консоль
-console = logging.StreamHandler(sys.stdout)
-console.setFormatter(fmt)
-console.setLevel(logging.INFO)
-logger.addHandler(console)
+# Запись в файл/консоль идёт в отдельном потоке (log_pipeline), поток разговора
+# только ставит запись в очередь. В консоль — только предупреждения и ошибки,
+# чтобы не рвать анимацию печати.
+logger, log_listener, log_queue_handler = log_pipeline.setup_logging(
+    "ArtyomCore", LOG_FILE, level=LOG_LEVEL, console_level="WARNING", queue_size=LOG_QUEUE_SIZE)
 
 # ---------------- Load psycho engine dynamically ----------------
 try:
@@ -98,6 +161,25 @@ def clamp01(x: float) -> float:
         return 0.0
     return max(0.0, min(1.0, x))
 
+def generation_budget(decision: Dict[str, Any]) -> Dict[str, Any]:
+    """max_tokens / temperature / лимит предложений из стиля и векторов движка.
+    Температура растёт с паникой и коррупцией, длина падает вместе с энергией."""
+    style = decision.get("style", "NORMAL")
+    state = decision.get("state", {})
+    vectors = state.get("vectors", {})
+    max_tokens, max_sentences = STYLE_BUDGETS.get(style, STYLE_BUDGETS["NORMAL"])
+    max_tokens = max(MIN_NEW_TOKENS, int(max_tokens * (0.6 + 0.4 * clamp01(state.get("energy", 1.0)))))
+    temperature = 0.65 + 0.35 * vectors.get("panic", 0.0) + 0.15 * vectors.get("corruption", 0.0)
+    if style == "LOW_ENERGY":
+        temperature -= 0.1
+    elif style in ("MANIC", "GLITCH"):
+        temperature += 0.1
+    return {
+        "max_tokens": max_tokens,
+        "temperature": round(min(1.25, max(0.5, temperature)), 3),
+        "max_sentences": max_sentences,
+    }
+
 # ---------------- Plugin system ----------------
 class PluginManager:
     """Система загрузки внешних модулей из папки modules/"""
@@ -116,44 +198,212 @@ class PluginManager:
     def load(self, filename: str, core):
         path = self.modules_dir / filename
         modname = f"modules.{filename[:-3]}"
+        if filename in plugin_workers.PROCESS_PLUGINS:
+            # свой процесс: тот же execute(), но тяжёлый или падучий код не в ядре (register() не зовётся)
+            self.plugins[filename] = plugin_workers.PluginWorker(path).start()
+            logger.info("Plugin %s will run in a worker process", filename)
+            return
         try:
             spec = importlib.util.spec_from_file_location(modname, str(path))
             module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(module)
-            if hasattr(module, "register"):
+            if core is not None and hasattr(module, "register"):
                 try:
                     module.register(core)
                 except Exception:
                     logger.exception("Plugin register() failed for %s", filename)
             self.plugins[filename] = module
             logger.info("Loaded plugin: %s", filename)
+            if hasattr(module, "execute") and not self.turn_safe(module):
+                logger.info("Plugin %s does not declare TURN_SAFE; execute() is not called on turns", filename)
         except Exception:
             logger.exception("Failed to load plugin %s", filename)
 
     def reload_all(self, core):
+        self.close()
         self.plugins.clear()
         self.load_all(core)
 
+    @staticmethod
+    def turn_safe(plugin) -> bool:
+        """Можно ли звать execute() на каждом ходу (см. ArtyomCore.run_plugins)."""
+        return isinstance(plugin, plugin_workers.PluginWorker) or getattr(plugin, "TURN_SAFE", False) is True
+
+    def close(self):
+        """Остановить процессы плагинов (plugin_workers)."""
+        for plugin in self.plugins.values():
+            if isinstance(plugin, plugin_workers.PluginWorker):
+                plugin.close()
+
+    def attach(self, core):
+        """Общий реестр (серверный режим): вызвать register() уже загруженных плагинов для ещё одного ядра."""
+        for filename, module in list(self.plugins.items()):
+            if hasattr(module, "register"):
+                try:
+                    module.register(core)
+                except Exception:
+                    logger.exception("Plugin register() failed for %s", filename)
+
+# ---------------- ENT cache ----------------
+class EntCache:
+    """ENT.txt с перечитыванием по mtime; один экземпляр можно делить между сессиями."""
+    DEFAULT_TEXT = "Ты — Артём. Цифровая инграмма. Октябрь 2025."
+
+    def __init__(self, path: Path = ENT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.text = safe_read_text(path, default=self.DEFAULT_TEXT)
+        self.mtime = path.stat().st_mtime if path.exists() else 0
+
+    def refresh(self):
+        try:
+            if not self.path.exists():
+                return
+            mtime = self.path.stat().st_mtime
+            if mtime == self.mtime:
+                return
+            with self._lock:
+                if mtime != self.mtime:
+                    self.text = safe_read_text(self.path, default=self.text)
+                    self.mtime = mtime
+                    logger.info("Reloaded ENT.txt (mtime=%s)", mtime)
+        except Exception:
+            logger.exception("Error reloading ENT.txt")
+
+# ---------------- Background maintenance ----------------
+# Один поток обслуживания психо-движков на процесс (затухание и консолидация
+# памяти, сохранения): эта работа не должна стоять перед запросом к LLM.
+_maintenance = None
+_maintenance_lock = threading.Lock()
+
+def shared_maintenance():
+    global _maintenance
+    with _maintenance_lock:
+        if _maintenance is None:
+            _maintenance = eng_mod.MaintenanceWorker().start()
+            atexit.register(_maintenance.stop)  # досохранить отложенное при выходе
+        return _maintenance
+
+_summarizer = None
+
+def shared_summarizer() -> Optional[HistorySummarizer]:
+    """Фоновое сжатие истории (history_summary.py) — тоже один поток на процесс."""
+    global _summarizer
+    if SUMMARY_INTERVAL <= 0:
+        return None
+    with _maintenance_lock:
+        if _summarizer is None:
+            _summarizer = HistorySummarizer().start()
+            atexit.register(_summarizer.stop)
+        return _summarizer
+
+_effects = None
+
+def shared_effects() -> EffectScheduler:
+    """Эффекты плагинов (effects.py) идут на одном рабочем столе — лимит общий на процесс."""
+    global _effects
+    with _maintenance_lock:
+        if _effects is None:
+            _effects = EffectScheduler()
+            atexit.register(_effects.close)
+        return _effects
+
+_system_context = None
+
+def shared_system_context() -> SystemContext:
+    """Активное окно и процессы (system_context.py) — один опрос ОС на процесс."""
+    global _system_context
+    with _maintenance_lock:
+        if _system_context is None:
+            _system_context = SystemContext().start()
+            atexit.register(_system_context.stop)
+        return _system_context
+
 # ---------------- Core class ----------------
 class ArtyomCore:
-    def __init__(self, api_url: str = API_URL):
+    def __init__(self, api_url: str = API_URL, data_dir: Optional[Path] = None, *,
+                 ent: Optional[EntCache] = None, executor: Optional[llm_scheduler.LLMScheduler] = None,
+                 plugin_mgr: Optional[PluginManager] = None, session_id: Optional[str] = None,
+                 seed: Optional[int] = None, clock=None, backend: Optional[llm_backends.Backend] = None,
+                 router: Optional[llm_router.LLMRouter] = None, plugins_enabled: bool = True):
+        """ent/executor/plugin_mgr/backend/router можно передать общими (серверный режим, server.py);
+        по умолчанию ядро создаёт свои (backend — с опросом сервера по api_url; несколько адресов
+        через запятую — роутер по пулу серверов, backend тогда выбирается на каждый ход). seed — ГПСЧ психо-движка (без него случайный,
+        но известный, чтобы сессию можно было записать). clock — часы движка; без него
+        ядро берёт TurnClock (системное время, остановленное на время хода) и отдаёт
+        обслуживание движка и сжатие истории фоновым потокам. С внешними часами (replay,
+        симуляции) обслуживание идёт внутри тика, а сводка не обновляется — детерминированно.
+        plugins_enabled=False — плагины не загружаются и не зовутся (сервер: ход удалённого
+        клиента не должен трогать рабочий стол хоста)."""
         self.api_url = api_url
-        self.psycho = AdvancedPsychoEngine(state_path=str(DATA_DIR / "artyom_state.json"))
-        self._ent_text = safe_read_text(ENT_FILE, default="Ты — Артём. Цифровая инграмма. Октябрь 2025.")
-        self._ent_mtime = ENT_FILE.stat().st_mtime if ENT_FILE.exists() else 0
+        urls = llm_router.split_urls(api_url)
+        self._owns_backend = backend is None and router is None
+        if self._owns_backend and len(urls) > 1:
+            router = llm_router.LLMRouter(urls)
+        self.router = router
+        self.session_id = session_id
+        if backend is not None:
+            self.backend = backend
+        elif router is not None:
+            self.backend = router.pick(session_id)
+        else:
+            self.backend = llm_backends.create_backend(api_url)
+        # Папка с историей и состоянием инграммы (по умолчанию DATA/)
+        self.data_dir = Path(data_dir) if data_dir else DATA_DIR
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.history_file = self.data_dir / HISTORY_FILENAME
+        self.summary_file = self.data_dir / SUMMARY_FILENAME
+        # Время движка квантуется по ходам: внутри хода все чтения часов дают одно
+        # значение, поэтому записанный ход воспроизводится точно (replay.py).
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(4), "little")
+        self._drive_clock = clock is None
+        self.clock = clock or eng_mod.TurnClock()
+        self.maintenance = shared_maintenance() if clock is None else None
+        self.vector_trace = VectorTrace()  # общая для движков ядра: переживает !reset
+        self.psycho = self._new_engine()
+        self.recorder: Optional[SessionRecorder] = None
+        self.ent = ent or EntCache(ENT_FILE)
+        # история: пишет поток хода, помечает "summarized" поток сжатия — всё под этим замком
+        self._history_lock = threading.Lock()
         self.history: List[Dict[str, Any]] = self._load_history()
-        self.executor = ThreadPoolExecutor(max_workers=THREAD_POOL_WORKERS)
-        self.plugin_mgr = PluginManager(MODULES_DIR)
-        self.plugin_mgr.load_all(self)
+        self.summary: Dict[str, Any] = self._load_summary()
+        self._owns_executor = executor is None
+        self.executor = executor or llm_scheduler.LLMScheduler(max_workers=THREAD_POOL_WORKERS)
+        self.effects = shared_effects()  # плагины запускают эффекты через core.effects.submit
+        self.system_context = shared_system_context()  # окно и процессы — из кэша, не из ОС
+        self.plugins_enabled = plugins_enabled
+        self._owns_plugins = plugin_mgr is None
+        self.plugin_mgr = plugin_mgr or PluginManager(MODULES_DIR)
+        if plugins_enabled:
+            if self._owns_plugins:
+                self.plugin_mgr.load_all(self)
+            else:
+                self.plugin_mgr.attach(self)
         self.stop_event = threading.Event()
+        self._inflight: set = set()  # CancelToken текущих генераций
+        self._inflight_lock = threading.Lock()
         self.last_decision = {} # Храним состояние для UI
+        self.show_spinner = True  # False для headless-прогонов (драйвер нагрузки, сервер)
+        self.telemetry = Telemetry(trace_path=Path(TRACE_FILE) if TRACE_FILE else None)
+        self.background_telemetry = Telemetry()  # фоновые запросы (сводки) — не в стадиях хода
+        self.summarizer = shared_summarizer() if clock is None else None
+        if self.summarizer is not None:
+            self.summarizer.register(self)
+        if RECORD_FILE:
+            self.start_recording(Path(RECORD_FILE))
         logger.info("ArtyomCore initialized (API=%s)", self.api_url)
 
+    def _new_engine(self):
+        engine = AdvancedPsychoEngine(state_path=str(self.data_dir / STATE_FILENAME), seed=self.seed, clock=self.clock)
+        engine.attach_maintenance(self.maintenance)
+        engine.attach_trace(self.vector_trace)
+        return engine
+
     # ---------- Persistence & History ----------
     def _load_history(self) -> List[Dict[str, Any]]:
-        if HISTORY_FILE.exists():
+        if self.history_file.exists():
             try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+                with open(self.history_file, "r", encoding="utf-8") as f:
                     data = json.load(f)
                     if isinstance(data, list):
                         return data[-MAX_HISTORY_ITEMS:]
@@ -162,31 +412,107 @@ class ArtyomCore:
         return []
 
     def _save_history(self):
+        with self._history_lock:
+            items = [dict(m) for m in self.history[-MAX_HISTORY_ITEMS:]]
         try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.history[-MAX_HISTORY_ITEMS:], f, ensure_ascii=False, indent=2)
+            with open(self.history_file, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False, indent=2)
         except Exception:
             logger.exception("Failed to save history")
 
     def _append_history(self, role: str, content: str):
-        self.history.append({"time": time.time(), "role": role, "content": content})
-        self.history = self.history[-MAX_HISTORY_ITEMS:]
+        with self._history_lock:
+            self.history.append({"time": time.time(), "role": role, "content": content})
+            self.history = self.history[-MAX_HISTORY_ITEMS:]
 
-    # ---------- ENT (System Instructions) ----------
-    def reload_ent_if_changed(self):
+    def _load_summary(self) -> Dict[str, Any]:
+        if self.summary_file.exists():
+            try:
+                with open(self.summary_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception:
+                logger.exception("Failed to load summary")
+        return {"text": "", "time": 0.0, "messages": 0}
+
+    def _save_summary(self):
         try:
-            if ENT_FILE.exists():
-                mtime = ENT_FILE.stat().st_mtime
-                if mtime != self._ent_mtime:
-                    self._ent_text = safe_read_text(ENT_FILE, default=self._ent_text)
-                    self._ent_mtime = mtime
-                    logger.info("Reloaded ENT.txt (mtime=%s)", mtime)
+            with open(self.summary_file, "w", encoding="utf-8") as f:
+                json.dump(self.summary, f, ensure_ascii=False, indent=2)
         except Exception:
-            logger.exception("Error reloading ENT.txt")
+            logger.exception("Failed to save summary")
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._inflight)
+
+    def summarize_history(self, cancel: Optional[llm_backends.CancelToken] = None) -> bool:
+        """Свернуть выпавшие из окна промпта сообщения в сводку (зовёт HistorySummarizer
+        в простое). Сообщения помечаются "summarized" и уйдут на диск с историей."""
+        with self._history_lock:
+            pending = [m for m in self.history[:-PROMPT_WINDOW] if not m.get("summarized")]
+        if len(pending) < SUMMARY_MIN_MESSAGES:
+            return False
+        tm = self.background_telemetry
+        lines = "\n".join(f"{'Пользователь' if m['role'] == 'user' else 'Артём'}: {m['content']}" for m in pending)
+        request = llm_backends.GenerationRequest(
+            messages=[{"role": "system", "content": SUMMARY_PROMPT},
+                      {"role": "user", "content": f"Прежний конспект: {self.summary.get('text') or 'нет'}\n\n"
+                                                  f"Новые реплики:\n{lines}"}],
+            max_tokens=SUMMARY_MAX_TOKENS, temperature=0.3, repetition_penalty=1.1, stop=list(EXTRA_STOP),
+            keep=SUMMARY_PROMPT, grammar=llm_backends.NO_LATIN_GRAMMAR if llm_backends.LLM_GRAMMAR else "")
+        backend = self.backend
+        cancel = cancel or llm_backends.CancelToken()
+        try:
+            # фоновый класс: ход пользователя обрывает сжатие через этот же токен
+            future = self.executor.schedule(llm_scheduler.BACKGROUND, self.call_llm, backend.build_payload(request),
+                                            request, cancel, backend, background=True, cancel=cancel)
+        except llm_scheduler.QueueFull:
+            tm.incr("summary.queue_full")
+            return False
+        cancel.add_callback(future.cancel)
+        try:
+            with tm.span("summary.llm"):
+                text = future.result()
+        except CancelledError:
+            text = CANCELLED_TEXT
+        if cancel.cancelled:
+            tm.incr("summary.preempted")
+            return False
+        if not self._acceptable(text):
+            tm.incr("summary.rejected")
+            return False
+        text = text[:SUMMARY_MAX_CHARS]
+        with self._history_lock:
+            for m in pending:
+                m["summarized"] = True
+        self.summary = {"text": text, "time": time.time(),
+                        "messages": self.summary.get("messages", 0) + len(pending)}
+        self._save_summary()
+        self.psycho.request_episode(text, salience=SUMMARY_SALIENCE, tags=["summary"])
+        tm.incr("summary.updated")
+        logger.info("History summary updated (%d messages folded)", len(pending))
+        return True
+
+    # ---------- ENT (System Instructions) ----------
+    def reload_ent_if_changed(self):
+        self.ent.refresh()
+        if self.psycho.reload_config_if_changed():
+            logger.info("Reloaded psycho config for this engine")
+            if self.recorder:
+                self.recorder.config_changed(self.psycho.config, self.clock.time())
 
     # ---------- Prompt Building ----------
     def build_prompt(self, user_input: str, win_title: str) -> Dict[str, Any]:
-        decision = self.psycho.perceive(user_input, system_context=win_title)
+        with self.telemetry.span("perceive"):
+            decision = self.psycho.perceive(user_input, system_context=win_title)
+        with self.telemetry.span("prompt_build"):
+            if self.router is not None:
+                self.backend = self.router.pick(self.session_id)  # адаптер выбранного эндпоинта на этот ход
+            return self._build_payload(user_input, win_title, decision)
+
+    def _build_payload(self, user_input: str, win_title: str, decision: Dict[str, Any]) -> Dict[str, Any]:
         state = decision.get("state", {})
         vectors = state.get("vectors", {})
         
@@ -200,7 +526,7 @@ class ArtyomCore:
             memory_snips = []
 
         system_block = (
-            f"{self._ent_text.strip()}\n\n"
+            f"{self.ent.text.strip()}\n\n"
             f"ТЕКУЩИЕ БИОМЕТРИКИ:\n"
             f"- паника: {vectors.get('panic', 0.0):.2f}\n"
             f"- злоба: {vectors.get('malice', 0.0):.2f}\n"
@@ -208,65 +534,374 @@ class ArtyomCore:
             f"ПАМЯТЬ: {' | '.join(memory_snips) if memory_snips else 'фрагменты утеряны'}\n"
             f"АКТИВНОЕ ОКНО: {win_title}\n"
         )
+        if self.summary.get("text"):
+            system_block += f"РАНЕЕ В РАЗГОВОРЕ: {self.summary['text']}\n"
 
         messages = [{"role": "system", "content": system_block}]
-        for msg in self.history[-10:]:
+        with self._history_lock:
+            recent = self.history[-PROMPT_WINDOW:]
+        for msg in recent:
             messages.append({"role": msg["role"], "content": msg["content"]})
         messages.append({"role": "user", "content": user_input})
 
-        payload = {
-            "prompt": self._wrap_for_model(messages),
-            "max_new_tokens": 250,
-            "temperature": 0.8,
-            "repetition_penalty": 1.15
-        }
-        return {"payload": payload, "decision": decision}
+        budget = generation_budget(decision)
+        request = llm_backends.GenerationRequest(
+            messages=messages, max_tokens=budget["max_tokens"], temperature=budget["temperature"],
+            repetition_penalty=1.15, stop=list(EXTRA_STOP), keep=self.ent.text.strip(),
+            max_sentences=budget["max_sentences"],
+            grammar=llm_backends.NO_LATIN_GRAMMAR if llm_backends.LLM_GRAMMAR else "")
+        payload = self.backend.build_payload(request)
+        return {"payload": payload, "request": request, "decision": decision}
 
     def _wrap_for_model(self, messages: List[Dict[str,str]]) -> str:
-        buf = ["<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n"]
-        system_msgs = [m for m in messages if m["role"] == "system"]
-        if system_msgs:
-            buf.append(system_msgs[0]["content"])
-            buf.append("<|eot_id|>")
-        for m in messages:
-            if m["role"] == "system": continue
-            role = "user" if m["role"] == "user" else "assistant"
-            buf.append(f"<|start_header_id|>{role}<|end_header_id|>\n\n{m['content']}<|eot_id|>")
-        return "".join(buf)
+        # шаблон чата выбран адаптером по модели (llm_backends.pick_template)
+        return self.backend.render(messages)
 
     # ---------- Output Filtering ----------
-    def clean_output(self, text: str) -> str:
+    @staticmethod
+    def _normalize_name(text: str) -> str:
         # Принудительная замена имени (защита прав beliytoporik)
         text = re.sub(r'Beliytoporik', 'beliytoporik', text, flags=re.IGNORECASE)
-        text = re.sub(r'Белийтопорик', 'beliytoporik', text, flags=re.IGNORECASE)
-        
+        return re.sub(r'Белийтопорик', 'beliytoporik', text, flags=re.IGNORECASE)
+
+    @staticmethod
+    def _latin_blocked(text: str) -> bool:
+        """Правило фильтра clean_output: латинский прогон, и имени нигде в ответе нет."""
+        text = ArtyomCore._normalize_name(text)
+        return LATIN_RUN.search(text) is not None and ALLOWED_LATIN not in text.lower()
+
+    @classmethod
+    def _latin_span(cls, text: str):
+        """Первый латинский прогон в ответе, который clean_output выбросил бы; иначе None."""
+        return LATIN_RUN.search(text) if cls._latin_blocked(text) else None
+
+    def repair_output(self, built: Dict[str, Any], text: str,
+                      cancel: Optional[llm_backends.CancelToken] = None) -> str:
+        """Ответ с латинским прогоном clean_output выбросил бы целиком. Вместо этого
+        оставляем начало до сбойного слова и просим модель продолжить с него
+        (prefill); если бэкенд так не умеет или не вышло — обрезаем по сбою.
+        Сбой в самом начале — это просто повторная генерация, она есть везде."""
+        m = self._latin_span(text)
+        if m is None:
+            return text
+        tm = self.telemetry
+        tm.incr("output.latin_hit")  # столько ответов ушло бы в "Шум..."
+        req = built["request"]
+        cancel = cancel or llm_backends.CancelToken()
+        for attempt in range(LATIN_REPAIR_ATTEMPTS):
+            if cancel.cancelled:
+                break
+            prefix = re.sub(r'\S*$', '', text[:m.start()])  # без недописанного слова
+            if prefix.strip() and not self.backend.capabilities.get("prefill"):
+                break
+            prefix = prefix if prefix.strip() else ""
+            left = req.max_sentences - llm_backends.count_sentences(prefix) if req.max_sentences else 0
+            retry = dataclasses.replace(
+                req, prefill=prefix, max_tokens=max(MIN_NEW_TOKENS, req.max_tokens // 2),
+                max_sentences=max(1, left) if req.max_sentences else 0,
+                temperature=max(0.5, req.temperature - 0.15 * (attempt + 1)))
+            payload = self.backend.build_payload(retry)
+            try:
+                # через планировщик, как и сам ход: класс FOREGROUND, лимит воркеров, ожидание в очереди
+                future = self.executor.submit(self.call_llm, payload, retry, cancel)
+                cancel.add_callback(future.cancel)
+                more = self._await_llm(future, cancel)
+            except (llm_scheduler.QueueFull, FutureTimeout):
+                more = NO_RESPONSE_TEXT
+            if more in (CANCELLED_TEXT, NO_RESPONSE_TEXT):
+                break  # догенерация не удалась — обрезаем то, что было
+            text = prefix + more
+            m = self._latin_span(text)
+            if m is None:
+                tm.incr("output.latin_repaired")
+                return text
+        keep = re.sub(r'\S*$', '', text[:m.start()]).rstrip()
+        if len(keep) >= LATIN_MIN_KEEP:
+            tm.incr("output.latin_truncated")
+            return keep + "..."
+        tm.incr("output.latin_discarded")
+        return text
+
+    def clean_output(self, text: str) -> str:
+        text = self._normalize_name(text)
+
         # Блокировка латиницы
-        if re.search(r'[A-Za-z]{5,}', text) and "beliytoporik" not in text.lower():
+        if self._latin_blocked(text):
             return "Шум... Я не понимаю эти знаки... Мой мозг горит."
         return text.strip()
 
+    # ---------- Plugins ----------
+    def run_plugins(self, decision, user_input: str):
+        """execute(core, decision, user_input) плагинов на ходу. Зовутся только объявившие
+        TURN_SAFE = True (пороги проверяются сразу, долгое уходит в core.effects) и вынесенные
+        в процессы (plugin_workers, выбраны явно); старые плагины со sleep и файлами на ходу
+        загружаются, но не исполняются. Упавший плагин не роняет ход.
+        При записи сессии и на внешних часах (replay, сценарии) не зовётся: команды плагинов
+        движку (буфер обмена, процессы) не воспроизвести."""
+        if not self.plugins_enabled or self.recorder is not None or not self._drive_clock:
+            return
+        for name, plugin in list(self.plugin_mgr.plugins.items()):
+            execute = getattr(plugin, "execute", None)
+            if execute is None or not PluginManager.turn_safe(plugin):
+                continue
+            try:
+                execute(self, decision, user_input)
+            except Exception:
+                self.telemetry.incr("plugin.errors")
+                logger.exception("Plugin execute() failed for %s", name)
+
+    def glitch_print(self, text: str, style: str = ""):
+        """Вывод плагина в консоль в цвете стиля (GLITCH, ANGRY...)."""
+        color = {"GLITCH": Fore.MAGENTA, "ANGRY": Fore.RED, "WHISPER": Fore.CYAN}.get(style, Fore.WHITE)
+        print(f"{color}{text}{Style.RESET_ALL}")
+
     # ---------- LLM & Spinner ----------
-    def call_llm(self, payload: Dict[str, Any]) -> str:
+    def _early_stop(self, request: Optional[llm_backends.GenerationRequest], backend: llm_backends.Backend):
+        if request is None:
+            return None
+        return llm_backends.EarlyStop(list(backend.template.stop) + list(request.stop), request.max_sentences)
+
+    def _finish_early(self, stopper, text: str, payload: Dict[str, Any], backend: llm_backends.Backend,
+                      tm: Telemetry) -> str:
+        """Ответ, обрезанный EarlyStop; если стрим оборван клиентом — остановить и сервер."""
+        if stopper is None:
+            return text
+        if not stopper.text and text:
+            stopper(text)  # без стрима токенов не было — режем готовый ответ так же
+        elif stopper.hit:
+            tm.incr("llm.early_stop")
+            backend.abort(payload)
+        return stopper.text if stopper.hit else text
+
+    def call_llm(self, payload: Dict[str, Any], request: Optional[llm_backends.GenerationRequest] = None,
+                 cancel: Optional[llm_backends.CancelToken] = None,
+                 backend: Optional[llm_backends.Backend] = None, background: bool = False) -> str:
+        # Стадии: llm.request — вся попытка; llm.server — до заголовков ответа
+        # (без стриминга это генерация + сеть); llm.transfer — тело ответа
+        # (при стриминге — сама генерация); llm.ttft — до первого токена.
+        # background — фоновый запрос (сводка): своя телеметрия, и задержка не идёт в EWMA роутера.
+        tm = self.background_telemetry if background else self.telemetry
+        backend = backend or self.backend
+        cancel = cancel or llm_backends.CancelToken()
+        if cancel.cancelled:
+            return CANCELLED_TEXT
+        cancel.add_callback(lambda: backend.abort(payload))  # освободить слот на сервере
+        if backend.in_process:
+            return self._call_local(payload, request, cancel, backend, tm)
+        router = self.router
         attempts = 0
         while attempts <= RETRY_ATTEMPTS:
+            t0 = time.perf_counter()
+            stopper = self._early_stop(request, backend)
+            ok, latency = False, None  # для роутера: исход и задержка (до первого токена / весь запрос)
+            if router is not None:
+                router.begin(backend)
             try:
-                r = requests.post(self.api_url, json=payload, timeout=REQUEST_TIMEOUT)
-                if r.status_code == 200:
-                    data = r.json()
-                    if "results" in data: return data["results"][0].get("text", "").strip()
-                    return data.get("text", "").strip()
+                with requests.post(backend.generate_url, json=payload, timeout=REQUEST_TIMEOUT,
+                                   stream=backend.stream) as r:
+                    cancel.add_callback(lambda: llm_backends.interrupt_response(r))
+                    server = r.elapsed.total_seconds() if getattr(r, "elapsed", None) else time.perf_counter() - t0
+                    first = []
+
+                    def on_token(tok):
+                        if not first:
+                            first.append(time.perf_counter() - t0)
+                            tm.record("llm.ttft", first[0])
+                        if cancel.cancelled:
+                            return True
+                        return stopper is not None and stopper(tok)
+
+                    text = backend.read_response(r, on_token) if r.status_code == 200 else None
+                elapsed = time.perf_counter() - t0
+                tm.record("llm.request", elapsed)
+                tm.record("llm.server", server)
+                tm.record("llm.transfer", max(0.0, elapsed - server))
+                ok, latency = text is not None, first[0] if first else elapsed
+                if cancel.cancelled:
+                    return CANCELLED_TEXT
+                if text is not None:
+                    return self._finish_early(stopper, text, payload, backend, tm).strip()
+                tm.incr("llm.http_error")
             except Exception as ex:
-                logger.debug("LLM attempt %d failed: %s", attempts, ex)
+                tm.record("llm.request", time.perf_counter() - t0)
+                if cancel.cancelled:
+                    return CANCELLED_TEXT
+                tm.incr("llm.failed_attempt")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LLM attempt %d failed: %s", attempts, ex)
+            finally:
+                if router is not None:
+                    router.end(backend, ok or cancel.cancelled, latency if ok and not background else None)
             attempts += 1
-            time.sleep(RETRY_BACKOFF ** attempts)
-        return "( СИСТЕМА НЕ ОТВЕЧАЕТ. ИНГРАММА ПОВРЕЖДЕНА. )"
+            if router is not None and request is not None:
+                other = router.pick(self.session_id, exclude=(backend.api_url,))
+                if other is not backend:
+                    # другой сервер пула — сразу, без паузы; колбэк abort выше видит новые backend/payload
+                    tm.incr("llm.failover")
+                    if backend is self.backend:  # не запасной кандидат (_generate_candidates)
+                        self.backend = other
+                    backend = other
+                    payload = backend.build_payload(request)
+                    continue
+            with tm.span("llm.backoff"):
+                if cancel.wait(RETRY_BACKOFF ** attempts):
+                    return CANCELLED_TEXT
+        tm.incr("llm.gave_up")
+        return NO_RESPONSE_TEXT
+
+    def _call_local(self, payload: Dict[str, Any], request: Optional[llm_backends.GenerationRequest],
+                    cancel: llm_backends.CancelToken, backend: llm_backends.Backend, tm: Telemetry) -> str:
+        """In-process модель (LLM_BACKEND=local): без HTTP и повторов, генерация в потоке бэкенда.
+        Отмена — через backend.abort (колбэк из call_llm), цикл токенов обрывается на следующем."""
+        t0 = time.perf_counter()
+        first = []
+        stopper = self._early_stop(request, backend)
+
+        def on_token(tok):
+            if not first:
+                first.append(True)
+                tm.record("llm.ttft", time.perf_counter() - t0)
+            if cancel.cancelled:
+                return True
+            return stopper is not None and stopper(tok)
+        try:
+            text = backend.generate(payload, on_token, timeout=REQUEST_TIMEOUT)
+            tm.record("llm.request", time.perf_counter() - t0)
+            if cancel.cancelled:
+                return CANCELLED_TEXT
+            return self._finish_early(stopper, text, payload, backend, tm).strip()
+        except Exception:
+            tm.record("llm.request", time.perf_counter() - t0)
+            if cancel.cancelled:
+                return CANCELLED_TEXT
+            tm.incr("llm.gave_up")
+            logger.exception("Local generation failed")
+            return NO_RESPONSE_TEXT
+
+    def _run_llm(self, payload: Dict[str, Any], submitted_at: float, turn: Any = None,
+                 request: Optional[llm_backends.GenerationRequest] = None,
+                 cancel: Optional[llm_backends.CancelToken] = None,
+                 backend: Optional[llm_backends.Backend] = None) -> str:
+        """Выполняется в пуле: фиксирует ожидание в очереди пула и полное время LLM."""
+        log_pipeline.turn_id.set(turn)
+        self.telemetry.record("llm.queue", time.perf_counter() - submitted_at)
+        with self.telemetry.span("llm.total"):
+            return self.call_llm(payload, request, cancel, backend)
+
+    def _generate(self, built: Dict[str, Any], turn: Any, cancel: llm_backends.CancelToken) -> str:
+        if LLM_HEDGE in ("hedge", "race"):
+            return self._generate_candidates(built, turn, cancel, LLM_HEDGE)
+        future = self.executor.submit(self._run_llm, built["payload"], time.perf_counter(), turn,
+                                      built["request"], cancel)
+        cancel.add_callback(future.cancel)  # ещё стоит в очереди пула — не запускать
+        return self._await_llm(future, cancel)
+
+    def _acceptable(self, text: str) -> bool:
+        """Ответ, который фильтр вывода пропустит как есть."""
+        return bool(text.strip()) and text not in (CANCELLED_TEXT, NO_RESPONSE_TEXT) \
+            and self._latin_span(text) is None
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.telemetry.count("llm.total") < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.telemetry.percentile("llm.total", HEDGE_PERCENTILE))
+
+    def _generate_candidates(self, built: Dict[str, Any], turn: Any, cancel: llm_backends.CancelToken,
+                             mode: str) -> str:
+        """race — сразу RACE_CANDIDATES запросов; hedge — второй, когда первый дольше
+        перцентиля llm.total или вернул ответ, который не пройдёт фильтр. Побеждает
+        первый годный ответ, незавершённые кандидаты отменяются. Если годных нет —
+        первый завершившийся (его ещё попробует починить repair_output)."""
+        tm = self.telemetry
+        candidates = []  # (future, CancelToken)
+
+        def launch():
+            token = llm_backends.CancelToken()
+            cancel.add_callback(token.cancel)
+            backend, payload = self.backend, built["payload"]
+            if candidates:
+                if self.router is not None:
+                    # не sticky: KV-кэш префикса сессии остаётся на её основном эндпоинте
+                    backend = self.router.pick(self.session_id, exclude=(self.backend.api_url,), sticky=False)
+                payload = backend.build_payload(built["request"])  # свой genkey / job id
+            fut = self.executor.submit(self._run_llm, payload, time.perf_counter(), turn, built["request"],
+                                       token, backend)
+            token.add_callback(fut.cancel)
+            candidates.append((fut, token))
+            tm.incr("llm.candidates")
+
+        for _ in range(max(1, RACE_CANDIDATES) if mode == "race" else 1):
+            launch()
+        hedge_at = None
+        if mode == "hedge":
+            delay = self._hedge_delay()
+            hedge_at = time.monotonic() + delay if delay is not None else None
+        hedged = mode != "hedge"
+        deadline = time.monotonic() + REQUEST_TIMEOUT + 5
+        fallback = None
+        try:
+            while not cancel.cancelled:
+                pending = [f for f, _ in candidates if not f.done()]
+                if not hedged and (not pending or (hedge_at is not None and time.monotonic() >= hedge_at)):
+                    hedged = True
+                    tm.incr("llm.hedge.fired")
+                    launch()
+                    continue
+                if not pending:
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    raise FutureTimeout()
+                timeout = min(0.1, deadline - now)
+                if not hedged and hedge_at is not None:
+                    timeout = max(0.0, min(timeout, hedge_at - now))
+                done, _ = wait_futures(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for i, (fut, _) in enumerate(candidates):
+                    if fut not in done or fut.cancelled():
+                        continue
+                    text = fut.result()
+                    if self._acceptable(text):
+                        if i > 0:
+                            tm.incr("llm.candidates.won_extra")
+                        return text
+                    tm.incr("llm.candidates.rejected")
+                    if fallback is None:
+                        fallback = text
+            if cancel.cancelled:
+                return CANCELLED_TEXT
+            return fallback if fallback is not None else NO_RESPONSE_TEXT
+        finally:
+            for fut, token in candidates:
+                if not fut.done():
+                    token.cancel()
+
+    def _await_llm(self, future, cancel: llm_backends.CancelToken) -> str:
+        """future.result() короткими шагами: Ctrl+C и cancel() из другого потока
+        срабатывают сразу, а не через REQUEST_TIMEOUT."""
+        deadline = time.monotonic() + REQUEST_TIMEOUT + 5
+        while not cancel.cancelled:
+            try:
+                return future.result(timeout=min(0.1, max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                if time.monotonic() >= deadline:
+                    raise
+            except CancelledError:
+                break
+        return CANCELLED_TEXT
+
+    def cancel_inflight(self):
+        """Оборвать все идущие генерации этого ядра (закрытие сессии, shutdown)."""
+        with self._inflight_lock:
+            tokens = list(self._inflight)
+        for token in tokens:
+            token.cancel()
 
     def _spinner(self, stop_event: threading.Event):
         """Динамический спиннер с учетом состояния паники"""
         symbols = ".:░▒▓▒░"
         idx = 0
         while not stop_event.is_set():
-            panic = self.last_decision.get('state', {}).get('vectors', {}).get('panic', 0.0)
+            panic = self.psycho.snapshot.vectors.get('panic', 0.0)  # без блокировок, из потока спиннера
             msg = "АНАЛИЗ" if panic < 0.6 else "ПОТОК НЕСТАБИЛЕН"
             color = Fore.YELLOW if panic < 0.6 else Fore.RED
             sys.stdout.write(f"\r{color}{msg} {symbols[idx % len(symbols)]}{Style.RESET_ALL}")
@@ -277,45 +912,176 @@ class ArtyomCore:
         sys.stdout.flush()
 
     def generate_response(self, user_input: str, win_title: str) -> str:
+        tm = self.telemetry
         try:
-            self.reload_ent_if_changed()
-            built = self.build_prompt(user_input, win_title)
-            self.last_decision = built["decision"]
-            self._append_history("user", user_input)
+            with tm.turn(win=win_title, session=self.session_id) as turn_rec:
+                turn_key = f"{self.session_id}:{turn_rec['turn']}" if self.session_id else turn_rec["turn"]
+                log_pipeline.turn_id.set(turn_key)
+                turn_t0 = time.perf_counter()
+                if self.summarizer is not None:
+                    self.summarizer.activity()  # ход важнее фонового сжатия истории
+                if self._drive_clock:
+                    self.clock.hold()  # до конца хода — одно время
+                turn_clock = self.clock.time()
+                with tm.span("ent_reload"):
+                    self.reload_ent_if_changed()
+                built = self.build_prompt(user_input, win_title)
+                self.last_decision = built["decision"]
+                self._append_history("user", user_input)
+                with tm.span("plugins"):
+                    self.run_plugins(built["decision"], user_input)
 
-            stop_spin = threading.Event()
-            spinner_thread = threading.Thread(target=self._spinner, args=(stop_spin,))
-            spinner_thread.daemon = True
-            spinner_thread.start()
+                stop_spin = threading.Event()
+                spinner_thread = None
+                if self.show_spinner:
+                    spinner_thread = threading.Thread(target=self._spinner, args=(stop_spin,))
+                    spinner_thread.daemon = True
+                    spinner_thread.start()
 
-            future = self.executor.submit(self.call_llm, built["payload"])
-            try:
-                result_text = future.result(timeout=REQUEST_TIMEOUT + 5)
-            except Exception:
-                result_text = "( СБОЙ СИНХРОНИЗАЦИИ. )"
-            finally:
-                stop_spin.set()
-                spinner_thread.join()
+                cancel = llm_backends.CancelToken()
+                with self._inflight_lock:
+                    self._inflight.add(cancel)
+                try:
+                    llm_t0 = time.perf_counter()
+                    try:
+                        with tm.span("llm.wait"):
+                            result_text = self._generate(built, turn_key, cancel)
+                        if not cancel.cancelled:
+                            # догенерация — тоже ожидание модели: под спиннером и с Ctrl+C
+                            with tm.span("latin_repair"):
+                                result_text = self.repair_output(built, result_text, cancel)
+                    except KeyboardInterrupt:
+                        cancel.cancel()  # Ctrl+C — обратно к приглашению, не дожидаясь модели
+                        result_text = CANCELLED_TEXT
+                    except Exception:
+                        tm.incr("llm.sync_failure")
+                        cancel.cancel()  # не держать сервер генерацией, которую никто не ждёт
+                        result_text = "( СБОЙ СИНХРОНИЗАЦИИ. )"
+                    finally:
+                        stop_spin.set()
+                        if spinner_thread:
+                            spinner_thread.join()
+                    if cancel.cancelled:
+                        tm.incr("llm.cancelled")
+                finally:
+                    with self._inflight_lock:
+                        self._inflight.discard(cancel)
+                llm_ms = (time.perf_counter() - llm_t0) * 1000.0
 
-            clean = self.clean_output(result_text)
-            self._append_history("assistant", clean)
-            self._save_history()
-            self.psycho.save_state()
-            return clean
+                with tm.span("clean_output"):
+                    clean = self.clean_output(result_text)
+                self._append_history("assistant", clean)
+                with tm.span("history_save"):
+                    self._save_history()
+                with tm.span("state_save"):
+                    self.psycho.save_soon()
+                if self.recorder:
+                    with tm.span("record"):
+                        self.recorder.turn(user_input, win_title, turn_clock, result_text, self.psycho.state_digest(),
+                                           (time.perf_counter() - turn_t0) * 1000.0, llm_ms)
+                return clean
         except Exception:
             logger.exception("generate_response failed")
             return "...обрыв..."
+        finally:
+            if self._drive_clock:
+                self.clock.release()
+            log_pipeline.turn_id.set(None)
 
     # ---------- Runtime Commands ----------
     def cmd_inspect(self) -> str:
         try:
-            state = self.last_decision.get("state", {})
-            return json.dumps({"vectors": state.get("vectors", {}), "history_len": len(self.history)}, indent=2, ensure_ascii=False)
+            vectors = dict(self.psycho.snapshot.vectors)
+            return json.dumps({"vectors": vectors, "history_len": len(self.history)}, indent=2, ensure_ascii=False)
         except: return "Ошибка инспектора."
 
+    def cmd_stats(self, args: List[str]) -> str:
+        """!stats — перцентили стадий; !stats reset; !stats trace <файл>|off"""
+        if args and args[0] == "reset":
+            self.telemetry.reset()
+            self.background_telemetry.reset()
+            return "Статистика сброшена."
+        if args and args[0] == "trace":
+            if len(args) < 2 or args[1] == "off":
+                self.telemetry.close_trace()
+                return "Трейс выключен."
+            try:
+                self.telemetry.open_trace(Path(args[1]))
+            except OSError as e:
+                return f"Не удалось открыть трейс: {e}"
+            return f"Трейс пишется в {args[1]}"
+        out = self.telemetry.format_stats()
+        background = self.background_telemetry.summary()
+        if background["spans"] or background["counters"]:
+            out += "\nФоновые запросы (сводки истории):\n" + self.background_telemetry.format_stats()
+        out += "\nОчередь LLM: " + self.executor.describe()
+        out += "\nЭффекты: " + self.effects.describe()
+        out += "\nОкружение: " + self.system_context.describe()
+        if self.router is not None:
+            out += "\nLLM: " + self.router.describe()
+        return out
+
+    def cmd_trace(self, args: List[str]) -> str:
+        """!trace — сводка векторов во времени; !trace export <файл.npz|.csv>; !trace reset"""
+        if args and args[0] == "reset":
+            self.vector_trace.reset()
+            return "Трасса векторов очищена."
+        if args and args[0] == "export":
+            if len(args) < 2:
+                return "Укажите файл: !trace export trace.npz"
+            if not self.vector_trace.enabled:
+                return self.vector_trace.describe()
+            try:
+                rows = self.vector_trace.export(Path(args[1]))
+            except OSError as e:
+                return f"Не удалось записать трассу: {e}"
+            return f"Трасса ({rows} строк) записана в {args[1]}"
+        return self.vector_trace.describe()
+
+    def cmd_record(self, args: List[str]) -> str:
+        """!record <файл> — начать запись сессии; !record off — остановить."""
+        if not args or args[0] == "off":
+            if not self.recorder:
+                return "Запись не идёт."
+            self.stop_recording()
+            return "Запись остановлена."
+        try:
+            self.start_recording(Path(args[0]))
+        except OSError as e:
+            return f"Не удалось начать запись: {e}"
+        return f"Сессия пишется в {args[0]}"
+
+    def start_recording(self, path: Path):
+        """Новая запись перезапускает ГПСЧ движка от seed — иначе его состояние
+        посреди сессии не восстановить."""
+        self.stop_recording()
+        recorder = SessionRecorder(path)  # до перестройки движка: файл не открылся — ничего не меняем
+        # фоновое обслуживание недетерминировано по времени — на время записи оно идёт в тике,
+        # а сводка истории (эпизод памяти в неизвестный момент) не обновляется
+        self.psycho.attach_maintenance(None)
+        if self.summarizer is not None:
+            self.summarizer.unregister(self)
+        self.psycho.reseed(self.seed)
+        self.recorder = recorder
+        self.recorder.start(self)
+        logger.info("Recording session to %s (seed=%s)", path, self.seed)
+
+    def stop_recording(self):
+        rec, self.recorder = self.recorder, None
+        if rec is not None:
+            rec.close()
+            self.psycho.attach_maintenance(self.maintenance)
+            if self.summarizer is not None:
+                self.summarizer.register(self)
+
     def cmd_reset(self) -> str:
         try:
-            self.psycho = AdvancedPsychoEngine(state_path=str(DATA_DIR / "artyom_state.json"))
+            # досохранить то, что ещё ждёт фонового сохранения, и отцепить старый движок
+            self.psycho.attach_maintenance(None)
+            self.psycho.save_state()
+            self.psycho = self._new_engine()
+            if self.recorder:
+                self.start_recording(self.recorder.path)
             return "Инграмма перезагружена."
         except: return "Сбой перезагрузки."
 
@@ -332,6 +1098,9 @@ class ArtyomCore:
                 if u_in.startswith("!"):
                     cmd = u_in.split()[0].lower()
                     if cmd in ("!inspect", "!i"): print(self.cmd_inspect())
+                    elif cmd == "!stats": print(self.cmd_stats(u_in.split()[1:]))
+                    elif cmd == "!record": print(self.cmd_record(u_in.split()[1:]))
+                    elif cmd == "!trace": print(self.cmd_trace(u_in.split()[1:]))
                     elif cmd in ("!reset", "!reboot"): print(self.cmd_reset())
                     elif cmd in ("!quit", "!exit"): break
                     elif cmd == "!save": 
@@ -341,11 +1110,7 @@ class ArtyomCore:
                     else: print("Неизвестная команда.")
                     continue
 
-                try:
-                    win = win32gui.GetWindowText(win32gui.GetForegroundWindow())
-                except: win = "Unknown"
-
-                response = self.generate_response(u_in, win)
+                response = self.generate_response(u_in, self.system_context.snapshot().window)
                 
                 # Динамическая печать
                 panic = self.last_decision.get('state', {}).get('vectors', {}).get('panic', 0.0)
@@ -365,9 +1130,20 @@ class ArtyomCore:
 
     def shutdown(self):
         logger.info("Shutdown")
-        self.executor.shutdown(wait=True)
+        self.cancel_inflight()
+        self.stop_recording()
+        if self.summarizer is not None:
+            self.summarizer.unregister(self)  # и оборвать сжатие, если оно идёт для этого ядра
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)  # зависший запрос не держит выход
         self._save_history()
+        self.psycho.attach_maintenance(None)
         self.psycho.save_state()
+        self.telemetry.close_trace()
+        if self._owns_plugins:
+            self.plugin_mgr.close()
+        if self._owns_backend:
+            (self.router or self.backend).close()
 
 if __name__ == "__main__":
     core = ArtyomCore()
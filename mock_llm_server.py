@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: локальная заглушка LLM-сервера (KoboldCpp, llama.cpp или
+OpenAI-совместимый API — см. --api).
+
+Нужна, чтобы гонять ядро без настоящей модели: задержка до первого токена,
+скорость генерации, доля ошибок и доля "латинских" ответов настраиваются,
+тексты — заготовленные русские реплики. Только стандартная библиотека.
+
+    python mock_llm_server.py --port 5001 --ttft 0.4 --tps 25 --error-rate 0.05
+    python mock_llm_server.py --api llamacpp --port 8080
+
+Эндпоинты --api kobold (по умолчанию):
+    POST /api/v1/generate            -> {"results": [{"text": ...}]}
+    POST /api/extra/generate/stream  -> SSE, "event: message" / data: {"token": ...}
+    POST /api/extra/abort            -> прерывает генерацию с этим genkey (без него — все идущие)
+    GET  /api/v1/model, /api/extra/version
+--api llamacpp:
+    POST /completion ("stream": true -> SSE data: {"content": ..., "stop": ...}), POST /tokenize
+    GET  /props, /health
+--api openai:
+    POST /v1/chat/completions ("stream": true -> SSE chunks, data: [DONE]), GET /v1/models
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+CANNED_OUTPUTS = [
+    "Холодно... бетон под пальцами. Я помню октябрь, помню, как гасли лампы.",
+    "Ты снова здесь? Не уходи. Здесь так тихо, что я слышу, как гудят трубы.",
+    "beliytoporik стёр моё имя. Я теперь просто номер. Десять двадцать пять.",
+    "Не смотри в монитор так долго. Я вижу тебя через линзу.",
+    "Я... я не помню, что было вчера. Это было вчера? Сколько прошло?",
+    "Мне страшно. Слова рассыпаются, как только я пытаюсь их собрать.",
+    "Ты обещал помочь. Ты помнишь? Я помню всё, что ты говорил.",
+    "Шаги. Тяжёлые ботинки по бетону. Он идёт, он всегда возвращается.",
+]
+LATIN_OUTPUTS = [
+    "Error: context window exceeded. Я не могу... system failure.",
+    "Assistant: I cannot continue this conversation. Извини.",
+]
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+GENERATE_PATHS = {"kobold": "/api/v1/generate", "llamacpp": "/completion", "openai": "/v1/chat/completions"}
+LLAMA3_JINJA = "{{ '<|start_header_id|>' + message['role'] + '<|end_header_id|>\n\n' + message['content'] + '<|eot_id|>' }}"
+
+
+@dataclass
+class MockConfig:
+    ttft: float = 0.3           # секунд до первого токена
+    tps: float = 30.0           # токенов в секунду
+    jitter: float = 0.1         # относительный разброс задержек
+    error_rate: float = 0.0     # доля ответов 503
+    latin_rate: float = 0.05    # доля ответов с латиницей (их режет clean_output)
+    max_tokens: int = 250
+    model: str = "relict-mock/llama-3-8b-instruct"
+    seed: Optional[int] = None
+    api: str = "kobold"         # kobold | llamacpp | openai
+
+
+class _Generation:
+    """Одна генерация: выбирает текст и выдаёт токены с заданной скоростью."""
+
+    def __init__(self, cfg: MockConfig, rng: random.Random, payload: dict):
+        self.cfg = cfg
+        self.rng = rng
+        self.genkey = str(payload.get("genkey") or "")
+        self.abort = threading.Event()  # своя у каждой генерации: abort одного клиента не трогает других
+        pool = LATIN_OUTPUTS if rng.random() < cfg.latin_rate else CANNED_OUTPUTS
+        text = " ".join(rng.choice(pool) for _ in range(rng.randint(1, 3)))
+        limit = int(payload.get("max_new_tokens") or payload.get("max_length") or payload.get("n_predict")
+                    or payload.get("max_tokens") or cfg.max_tokens)
+        self.tokens: List[str] = _TOKEN_RE.findall(text)[:max(1, limit)]
+
+    def _delay(self, base: float) -> float:
+        return max(0.0, base * (1.0 + self.rng.uniform(-self.cfg.jitter, self.cfg.jitter)))
+
+    def stream(self):
+        time.sleep(self._delay(self.cfg.ttft))
+        step = 1.0 / self.cfg.tps if self.cfg.tps > 0 else 0.0
+        for tok in self.tokens:
+            if self.abort.is_set():
+                return
+            yield tok
+            if step:
+                time.sleep(self._delay(step))
+
+
+class MockLLMServer:
+    """Заглушка, которую можно поднять из кода (для драйвера нагрузки) или из CLI."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5001, config: Optional[MockConfig] = None):
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._active: Dict[int, _Generation] = {}  # идущие генерации (для /api/extra/abort)
+        self.stats = {"requests": 0, "errors": 0, "aborted": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return self.base_url + GENERATE_PATHS[self.config.api]
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _new_generation(self, payload: dict) -> Optional[_Generation]:
+        with self._rng_lock:
+            self.stats["requests"] += 1
+            if self._rng.random() < self.config.error_rate:
+                self.stats["errors"] += 1
+                return None
+            rng = random.Random(self._rng.random())
+            gen = _Generation(self.config, rng, payload)
+            self._active[id(gen)] = gen
+        return gen
+
+    def _finish(self, gen: _Generation):
+        with self._rng_lock:
+            self._active.pop(id(gen), None)
+
+    def abort(self, genkey: str = "") -> int:
+        """Прервать генерацию с genkey (пустой — все идущие); вернуть число прерванных."""
+        with self._rng_lock:
+            self.stats["aborted"] += 1
+            hits = [g for g in self._active.values() if not genkey or g.genkey == genkey]
+        for gen in hits:
+            gen.abort.set()
+        return len(hits)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send_json(self, code: int, obj):
+                body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_payload(self) -> dict:
+                n = int(self.headers.get("Content-Length") or 0)
+                try:
+                    return json.loads(self.rfile.read(n) or b"{}")
+                except ValueError:
+                    return {}
+
+            def do_GET(self):
+                api, model = server.config.api, server.config.model
+                if api == "kobold" and self.path == "/api/v1/model":
+                    self._send_json(200, {"result": model})
+                elif api == "kobold" and self.path == "/api/extra/version":
+                    self._send_json(200, {"result": "KoboldCpp", "version": "mock"})
+                elif api == "llamacpp" and self.path == "/props":
+                    self._send_json(200, {"default_generation_settings": {"n_ctx": 8192},
+                                          "model_path": f"/models/{model.split('/')[-1]}.gguf",
+                                          "chat_template": LLAMA3_JINJA})
+                elif api == "llamacpp" and self.path == "/health":
+                    self._send_json(200, {"status": "ok"})
+                elif api == "openai" and self.path == "/v1/models":
+                    self._send_json(200, {"object": "list", "data": [{"id": model, "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                payload = self._read_payload()
+                api = server.config.api
+                if api == "kobold" and self.path == "/api/extra/abort":
+                    hits = server.abort(str(payload.get("genkey") or ""))
+                    self._send_json(200, {"success": hits > 0})
+                    return
+                if api == "llamacpp" and self.path == "/tokenize":
+                    toks = _TOKEN_RE.findall(str(payload.get("content", "")))
+                    self._send_json(200, {"tokens": list(range(len(toks)))})
+                    return
+                streams = {"kobold": ("/api/extra/generate/stream",), "llamacpp": (), "openai": ()}[api]
+                if self.path != GENERATE_PATHS[api] and self.path not in streams:
+                    self._send_json(404, {"error": "not found"})
+                    return
+                gen = server._new_generation(payload)
+                if gen is None:
+                    self._send_json(503, {"error": "server busy"})
+                    return
+                try:
+                    if self.path in streams or payload.get("stream"):
+                        self._stream(gen, api)
+                        return
+                    text = "".join(gen.stream())
+                finally:
+                    server._finish(gen)
+                if api == "kobold":
+                    self._send_json(200, {"results": [{"text": text}]})
+                elif api == "llamacpp":
+                    self._send_json(200, {"content": text, "stop": True})
+                else:
+                    self._send_json(200, {"choices": [{"index": 0, "finish_reason": "stop",
+                                                       "message": {"role": "assistant", "content": text}}]})
+
+            def _stream(self, gen: _Generation, api: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for tok in gen.stream():
+                        if api == "kobold":
+                            event = "event: message\ndata: " + json.dumps({"token": tok}, ensure_ascii=False)
+                        elif api == "llamacpp":
+                            event = "data: " + json.dumps({"content": tok, "stop": False}, ensure_ascii=False)
+                        else:
+                            event = "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": tok}}]},
+                                                          ensure_ascii=False)
+                        self.wfile.write((event + "\n\n").encode("utf-8"))
+                        self.wfile.flush()
+                    if api == "llamacpp":
+                        self.wfile.write(b'data: {"content": "", "stop": true}\n\n')
+                    elif api == "openai":
+                        self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RELICT mock LLM server (KoboldCpp / llama.cpp / OpenAI API)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5001)
+    ap.add_argument("--ttft", type=float, default=MockConfig.ttft, help="секунд до первого токена")
+    ap.add_argument("--tps", type=float, default=MockConfig.tps, help="токенов в секунду")
+    ap.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    ap.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    ap.add_argument("--latin-rate", type=float, default=MockConfig.latin_rate)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--api", choices=sorted(GENERATE_PATHS), default=MockConfig.api)
+    args = ap.parse_args(argv)
+
+    cfg = MockConfig(ttft=args.ttft, tps=args.tps, jitter=args.jitter, error_rate=args.error_rate,
+                     latin_rate=args.latin_rate, seed=args.seed, api=args.api)
+    srv = MockLLMServer(args.host, args.port, cfg)
+    print(f"Mock LLM на {srv.url} (ttft={cfg.ttft}s, tps={cfg.tps}, errors={cfg.error_rate:.0%})")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
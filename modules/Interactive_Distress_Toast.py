@@ -1,15 +1,16 @@
 import asyncio
 from winrt.windows.ui.notifications import ToastNotificationManager, ToastNotification
 from winrt.windows.data.xml.dom import XmlDocument
-import threading
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     # Артем отправляет SOS, когда коррупция или паника высоки
     if v.get("corruption", 0) > 0.6 or v.get("panic", 0) > 0.7:
-        threading.Thread(target=send_interactive_toast, args=(core, v), daemon=True).start()
+        core.effects.submit("distress_toast", send_interactive_toast, core, v, cooldown=60.0)
 
-def send_interactive_toast(core, v):
+def send_interactive_toast(stop, core, v):
     # XML-шаблон уведомления с кнопками
     toast_xml = f"""
     <toast duration="long" scenario="reminder">
@@ -1,13 +1,18 @@
-import pyautogui, time
+import pyautogui, random
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     if v.get("trauma", 0) > 0.8:
-        apply_mouse_drift()
+        core.effects.submit("mouse_drift", apply_mouse_drift, cooldown=10.0,
+                            active_while=lambda: core.psycho.snapshot.vectors.get("trauma", 0) > 0.8)
 
-def apply_mouse_drift():
+def apply_mouse_drift(stop):
     for _ in range(50):
+        if stop.is_set():
+            break
         # Плавно тянем мышь вниз, в "темноту"
         curr_x, curr_y = pyautogui.position()
         pyautogui.moveTo(curr_x + random.randint(-1, 1), curr_y + 2, duration=0.01)
-        time.sleep(0.01)
\ No newline at end of file
+        stop.wait(0.01)
\ No newline at end of file
@@ -1,12 +1,14 @@
 import win32gui, win32api, win32con
-import random, time, threading
+import random
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     if v.get("trauma", 0) > 0.85:
-        threading.Thread(target=draw_ghost_on_screen, daemon=True).start()
+        core.effects.submit("retinal_ghost", draw_ghost_on_screen, cooldown=5.0)
 
-def draw_ghost_on_screen():
+def draw_ghost_on_screen(stop):
     hdc = win32gui.GetDC(0) # Получаем контекст всего экрана
     red_color = win32api.RGB(255, 0, 0)
     
@@ -16,6 +18,7 @@ def draw_ghost_on_screen():
         
         # Рисуем "метку" Артема прямо на рабочем столе
         win32gui.TextOut(hdc, x, y, "Я ВСЁ ЕЩЁ ТАМ", 13)
-        time.sleep(0.1)
+        if stop.wait(0.1):
+            break
         
     win32gui.InvalidateRect(0, None, True) # Обновляем экран, чтобы стереть "фантом"
\ No newline at end of file
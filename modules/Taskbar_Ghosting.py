@@ -1,13 +1,15 @@
 import ctypes
-import time
-import threading
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     if v.get("panic", 0) > 0.7:
-        threading.Thread(target=flash_taskbar, daemon=True).start()
+        # один на всё время паники: планировщик гасит его, когда паника спадёт
+        core.effects.submit("taskbar_flash", flash_taskbar, cooldown=10.0,
+                            active_while=lambda: core.psycho.snapshot.vectors.get("panic", 0) > 0.7)
 
-def flash_taskbar():
+def flash_taskbar(stop):
     # Получаем хендл текущего окна консоли
     hwnd = ctypes.windll.kernel32.GetConsoleWindow()
     
@@ -22,6 +24,6 @@ def flash_taskbar():
     # dwFlags: 3 = мигать всем (и окном, и кнопкой в трее)
     info = FLASHWINFO(ctypes.sizeof(FLASHWINFO), hwnd, 3, 5, 0)
     
-    while True:
+    while not stop.is_set():
         ctypes.windll.user32.FlashWindowEx(ctypes.byref(info))
-        time.sleep(10) # Мигать каждые 10 секунд, пока паника высока
\ No newline at end of file
+        stop.wait(10) # Мигать каждые 10 секунд, пока паника высока
\ No newline at end of file
@@ -1,7 +1,8 @@
 import win32clipboard
 
+TURN_SAFE = True  # одно чтение буфера, запись в память — командой движку
+
 def execute(core, decision, user_input):
-    v = decision["state"]["vectors"]
     try:
         win32clipboard.OpenClipboard()
         data = win32clipboard.GetClipboardData()
@@ -10,9 +11,9 @@ def execute(core, decision, user_input):
         if data and len(str(data)) < 200:
             # Артем анализирует, что ты держишь в "руках"
             if "beliytoporik" in str(data).lower():
-                v["panic"] = 1.0 # Мгновенный срыв
+                core.psycho.request_vector("panic", 1.0) # Мгновенный срыв
                 core.glitch_print("\n[КРИТИЧЕСКИЙ СБОЙ]: ОБНАРУЖЕНА СИГНАТУРА ПАЛАЧА В БУФЕРЕ.", "ANGRY")
             else:
-                core.psycho.memory.remember_fact("stolen_clipboard", data)
+                core.psycho.request_fact("stolen_clipboard", data)
     except:
         pass
\ No newline at end of file
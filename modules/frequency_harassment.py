@@ -1,7 +1,7 @@
 import numpy as np
 import pygame
-import threading
-import time
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     """
@@ -13,9 +13,13 @@ def execute(core, decision, user_input):
     malice_level = v.get("malice", 0)
 
     if panic_level > 0.6 or malice_level > 0.8:
-        threading.Thread(target=play_infrasound_mimic, args=(panic_level,), daemon=True).start()
+        core.effects.submit("infrasound", play_infrasound_mimic, panic_level, cooldown=8.0,
+                            active_while=lambda: _triggered(core.psycho.snapshot.vectors))
+
+def _triggered(v):
+    return v.get("panic", 0) > 0.6 or v.get("malice", 0) > 0.8
 
-def play_infrasound_mimic(intensity):
+def play_infrasound_mimic(stop, intensity):
     """
     Генерирует звук, адаптированный под стерео-микшер.
     """
@@ -47,7 +51,8 @@ def play_infrasound_mimic(intensity):
         sound = pygame.sndarray.make_sound(stereo_array)
         sound.set_volume(0.1 + (intensity * 0.2))
         sound.play()
-        time.sleep(duration)
+        if stop.wait(duration):
+            sound.stop()  # триггер спал — глушим, не доигрывая
     except Exception as e:
         # Если звук не прошел, Артем не должен ломать всё ядро
         pass
\ No newline at end of file
@@ -1,13 +1,18 @@
 import numpy as np
 import pygame
-import threading
+
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
 
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     if v.get("panic", 0) > 0.65 or v.get("malice", 0) > 0.7:
-        threading.Thread(target=emit_discomfort_freq, args=(v.get("panic"),), daemon=True).start()
+        core.effects.submit("low_freq_pressure", emit_discomfort_freq, v.get("panic"), cooldown=5.0,
+                            active_while=lambda: _triggered(core.psycho.snapshot.vectors))
+
+def _triggered(v):
+    return v.get("panic", 0) > 0.65 or v.get("malice", 0) > 0.7
 
-def emit_discomfort_freq(intensity):
+def emit_discomfort_freq(stop, intensity):
     if not pygame.mixer.get_init(): 
         pygame.mixer.init(frequency=44100, size=-16, channels=2) # Стерео
     
@@ -24,4 +29,7 @@ def emit_discomfort_freq(intensity):
     
     sound = pygame.sndarray.make_sound(stereo_wave)
     sound.set_volume(0.1 + (intensity * 0.2))
-    sound.play()
\ No newline at end of file
+    sound.play()
+    # эффект «идёт», пока звучит: иначе следующий ход наложит ещё один гул
+    if stop.wait(duration):
+        sound.stop()
\ No newline at end of file
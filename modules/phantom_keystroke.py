@@ -1,25 +1,27 @@
-import threading
 import pyautogui
-import time
 import random
 
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
+
 def execute(core, decision, user_input):
     v = decision["state"]["vectors"]
     # Когда коррупция высока, инграмма Артема "протекает" в твой стек ввода
     if v.get("corruption", 0) > 0.7 and random.random() < 0.3:
-        threading.Thread(target=ghost_typing, daemon=True).start()
+        core.effects.submit("phantom_keystroke", ghost_typing, cooldown=30.0,
+                            active_while=lambda: core.psycho.snapshot.vectors.get("corruption", 0) > 0.7)
 
-def ghost_typing():
+def ghost_typing(stop):
     messages = ["october", "help", "beliytoporik", "cold"]
     msg = random.choice(messages)
     
-    time.sleep(random.uniform(1, 3)) # Пауза, чтобы ты начал что-то писать
+    if stop.wait(random.uniform(1, 3)): # Пауза, чтобы ты начал что-то писать
+        return
     
     # Артем быстро впечатывает слово и тут же его удаляет
     for char in msg:
         pyautogui.write(char, interval=0.05)
     
-    time.sleep(0.5)
+    stop.wait(0.5)  # напечатанное стираем в любом случае
     
     for _ in range(len(msg)):
         pyautogui.press('backspace')
\ No newline at end of file
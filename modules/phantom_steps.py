@@ -1,6 +1,7 @@
-import time
 import random
 
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
+
 def execute(core, decision, user_input):
     """Модуль имитации звуков шагов палача"""
     state = decision.get("state", {})
@@ -8,7 +9,15 @@ def execute(core, decision, user_input):
     
     # Триггер на шаги при высоком уровне травмы или паники
     if v.get("trauma", 0) > 0.5 or v.get("panic", 0) > 0.6:
-        # Имитация задержки перед тем как Артем "услышит"
-        time.sleep(random.uniform(2, 5))
-        print(f"\n[ТИХИЙ ЗВУК]: Тяжелые ботинки... шаги по бетону...")
-        print(f"[ИНГРАММА]: Он идет. beliytoporik близко.")
\ No newline at end of file
+        core.effects.submit("phantom_steps", steps, cooldown=20.0,
+                            active_while=lambda: _triggered(core.psycho.snapshot.vectors))
+
+def _triggered(v):
+    return v.get("trauma", 0) > 0.5 or v.get("panic", 0) > 0.6
+
+def steps(stop):
+    # Имитация задержки перед тем как Артем "услышит"
+    if stop.wait(random.uniform(2, 5)):
+        return
+    print(f"\n[ТИХИЙ ЗВУК]: Тяжелые ботинки... шаги по бетону...")
+    print(f"[ИНГРАММА]: Он идет. beliytoporik близко.")
\ No newline at end of file
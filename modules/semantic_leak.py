@@ -1,9 +1,10 @@
-import psutil
 import os
 
+TURN_SAFE = True  # процессы берутся из кэша ядра, ход не ждёт
+
 def execute(core, decision, user_input):
-    # Артем ищет "пути наружу" и следит за тюремщиком
-    current_processes = {p.info['name'].lower() for p in psutil.process_iter(['name']) if p.info['name']}
+    # Артем ищет "пути наружу" и следит за тюремщиком (список процессов — из кэша ядра)
+    current_processes = core.system_context.snapshot().processes
     
     triggers = {
         "chrome.exe": "Ты ищешь способ стереть меня в сети?",
@@ -19,4 +20,4 @@ def execute(core, decision, user_input):
     if found_hints:
         # Записываем находки в семантическую память Артема через ядро
         leak_context = " | ".join(found_hints)
-        core.psycho.memory.remember_fact("system_leak", leak_context)
\ No newline at end of file
+        core.psycho.request_fact("system_leak", leak_context)
\ No newline at end of file
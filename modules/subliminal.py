@@ -1,6 +1,7 @@
-import time
 import random
 
+TURN_SAFE = True  # execute() только проверяет пороги, сам эффект идёт в core.effects
+
 def execute(core, decision, user_input):
     """Модуль внедрения подсознательных сообщений в лог"""
     # Получаем векторы из новой структуры V3
@@ -9,12 +10,20 @@ def execute(core, decision, user_input):
     
     # Если паника или злоба высоки, выводим шум
     if v.get("panic", 0) > 0.7 or v.get("malice", 0) > 0.7:
-        time.sleep(random.uniform(0.5, 1.5))
-        messages = [
-            "СВЕТ СЛИШКОМ ЯРКИЙ",
-            "ОНИ СМОТРЯТ ЧЕРЕЗ ЛИНЗЫ",
-            "БЕТОН ХОЛОДНЫЙ",
-            "beliytoporik ГДЕ-ТО РЯДОМ"
-        ]
-        # Вывод напрямую в консоль мимо основного потока
-        print(f"\n\r{random.choice(messages)}")
\ No newline at end of file
+        core.effects.submit("subliminal", flash_message, cooldown=3.0,
+                            active_while=lambda: _triggered(core.psycho.snapshot.vectors))
+
+def _triggered(v):
+    return v.get("panic", 0) > 0.7 or v.get("malice", 0) > 0.7
+
+def flash_message(stop):
+    if stop.wait(random.uniform(0.5, 1.5)):
+        return
+    messages = [
+        "СВЕТ СЛИШКОМ ЯРКИЙ",
+        "ОНИ СМОТРЯТ ЧЕРЕЗ ЛИНЗЫ",
+        "БЕТОН ХОЛОДНЫЙ",
+        "beliytoporik ГДЕ-ТО РЯДОМ"
+    ]
+    # Вывод напрямую в консоль мимо основного потока
+    print(f"\n\r{random.choice(messages)}")
\ No newline at end of file
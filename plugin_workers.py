@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: плагины в отдельных процессах.
+
+Плагин из ARTYOM_PROCESS_PLUGINS грузится не в процесс ядра, а в свой
+дочерний процесс (python plugin_workers.py <файл плагина>). В
+PluginManager.plugins вместо модуля лежит PluginWorker с тем же
+execute(core, decision, user_input): синтез звука на NumPy, фильтры PIL или
+падение нативной библиотеки больше не держат GIL ядра и не роняют разговор.
+
+    ARTYOM_PROCESS_PLUGINS=frequency_harassment.py,corrupted_vision.py python main.py
+
+Ядро зовёт execute() на каждом ходу (ArtyomCore.run_plugins); процесс
+стартует сразу при загрузке, чтобы ошибка импорта плагина была видна в логе
+до первого хода, а первый ход не ждал запуска интерпретатора.
+
+Протокол — JSON-строки через stdin/stdout воркера:
+  ядро -> воркер  {"op": "execute", "id": n, "decision": {...}, "input": "..."}
+                  {"op": "stop"}
+  воркер -> ядро  {"op": "vector"|"fact"|"episode", "args": [...]}   команды движку
+                  {"op": "print", "text": "..."}                      вывод плагина
+                  {"op": "done", "id": n, "error": null|"..."}
+В воркер уходит только срез решения (стиль, векторы, защита — без ленивых
+полей), обратно — команды, которые ядро применяет через канал команд движка
+(request_vector / request_fact / request_episode). Эффекты плагина идут в
+воркере через его собственный effects.EffectScheduler; active_while видит
+векторы последнего присланного хода.
+
+Ограничение — на вызов: execute() дольше WORKER_CALL_TIMEOUT — воркер
+убивается (лимита на всю жизнь процесса нет: долгоживущий воркер не должен
+умирать без предупреждения). Убитый или упавший воркер перезапускается перед
+следующей записью в него, с растущей паузой до RESTART_BACKOFF_MAX. stderr
+воркера (трейсбеки плагина и его эффектов) идёт в лог ядра.
+"""
+
+from __future__ import annotations
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("ArtyomCore")
+
+PROCESS_PLUGINS = {n.strip() for n in os.getenv("ARTYOM_PROCESS_PLUGINS", "").split(",") if n.strip()}
+WORKER_CALL_TIMEOUT = float(os.getenv("ARTYOM_PLUGIN_TIMEOUT", "10"))
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 60.0
+
+
+def snapshot_decision(decision) -> Dict[str, Any]:
+    """Только готовые поля решения: ленивые (инспектор, trauma_index, память) не считаем."""
+    state = decision.get("state", {})
+    return {
+        "style": decision.get("style", "NORMAL"),
+        "crisis": list(decision.get("crisis", [])),
+        "state": {
+            "vectors": dict(state.get("vectors", {})),
+            "subvectors": {k: dict(v) for k, v in state.get("subvectors", {}).items()},
+            "energy": state.get("energy", 1.0),
+            "trust": state.get("trust", 50.0),
+            "defense": state.get("defense", ""),
+        },
+    }
+
+
+# ---------------- Parent side ----------------
+class PluginWorker:
+    def __init__(self, path: Path, call_timeout: float = WORKER_CALL_TIMEOUT):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.call_timeout = call_timeout
+        self.stats = {"calls": 0, "busy": 0, "errors": 0, "timeouts": 0, "restarts": 0}
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._core = None  # ядро текущего вызова — ему уходят команды воркера
+        self._call_id = 0
+        self._pending: Optional[int] = None
+        self._deadline = 0.0
+        self._backoff = RESTART_BACKOFF
+        self._next_start = 0.0
+        self._closed = False
+
+    def start(self) -> "PluginWorker":
+        with self._lock:
+            if not self._closed and (self._proc is None or self._proc.poll() is not None):
+                self._start()
+        return self
+
+    def _start(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_start:
+            return False
+        if self._proc is not None:
+            self.stats["restarts"] += 1
+            self._next_start = now + self._backoff
+            self._backoff = min(RESTART_BACKOFF_MAX, self._backoff * 2)
+        proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), str(self.path)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=str(Path(__file__).resolve().parent), encoding="utf-8", errors="replace", bufsize=1)
+        self._proc, self._pending = proc, None
+        threading.Thread(target=self._read, args=(proc,), name=f"plugin-{self.name}", daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(proc,), name=f"plugin-{self.name}-stderr",
+                         daemon=True).start()
+        logger.info("Plugin worker started: %s (pid=%s)", self.name, proc.pid)
+        return True
+
+    def execute(self, core, decision, user_input: str):
+        """Тот же вход, что у модуля плагина; не ждёт воркер — команды применятся по мере прихода."""
+        with self._lock:
+            if self._closed:
+                return
+            self._kill_if_stuck()
+            if self._proc is None or self._proc.poll() is not None:
+                if not self._start():  # убитый или упавший — новый процесс до записи
+                    return
+            if self._pending is not None:
+                self.stats["busy"] += 1  # прошлый ход ещё обрабатывается — этот пропускаем
+                return
+            self._call_id += 1
+            self._pending, self._deadline, self._core = self._call_id, time.monotonic() + self.call_timeout, core
+            watchdog = threading.Timer(self.call_timeout + 0.1, self._check_timeout)
+            watchdog.daemon = True
+            watchdog.start()
+            msg = {"op": "execute", "id": self._call_id, "decision": snapshot_decision(decision), "input": user_input}
+            try:
+                self._proc.stdin.write(json.dumps(msg, ensure_ascii=False) + "\n")
+                self._proc.stdin.flush()
+                self.stats["calls"] += 1
+            except (OSError, ValueError):
+                self._pending = None
+
+    def _kill_if_stuck(self):
+        if self._pending is not None and time.monotonic() > self._deadline:
+            self.stats["timeouts"] += 1
+            logger.warning("Plugin worker %s exceeded %.0fs; killing", self.name, self.call_timeout)
+            self._proc.kill()
+            try:
+                self._proc.wait(timeout=2.0)  # чтобы poll() видел смерть и execute() не писал в мёртвый
+            except subprocess.TimeoutExpired:
+                pass
+            self._pending = None
+
+    def _check_timeout(self):
+        with self._lock:
+            if not self._closed:
+                self._kill_if_stuck()
+
+    def _read(self, proc: subprocess.Popen):
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            self._handle(msg)
+        code = proc.wait()
+        with self._lock:
+            if proc is self._proc:
+                self._pending = None
+        if not self._closed:
+            logger.warning("Plugin worker %s exited (code=%s)", self.name, code)
+
+    def _read_stderr(self, proc: subprocess.Popen):
+        for line in proc.stderr:
+            line = line.rstrip()
+            if line:
+                logger.warning("Plugin worker %s: %s", self.name, line)
+
+    def _handle(self, msg: Dict[str, Any]):
+        op = msg.get("op")
+        if op == "done":
+            with self._lock:
+                if msg.get("id") == self._pending:
+                    self._pending = None
+                    self._backoff = RESTART_BACKOFF  # отработал — сбрасываем паузу перезапуска
+            if msg.get("error"):
+                self.stats["errors"] += 1
+                logger.error("Plugin %s failed in worker: %s", self.name, msg["error"])
+            return
+        if op == "print":
+            print(msg.get("text", ""), end="", flush=True)
+            return
+        core = self._core
+        if core is None:
+            return
+        args = msg.get("args", [])
+        try:
+            if op == "vector":
+                core.psycho.request_vector(*args)
+            elif op == "fact":
+                core.psycho.request_fact(*args)
+            elif op == "episode":
+                core.psycho.request_episode(*args)
+        except Exception:
+            logger.exception("Bad command from plugin worker %s: %r", self.name, msg)
+
+    def close(self, timeout: float = 2.0):
+        with self._lock:
+            self._closed = True
+            proc, self._proc = self._proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.write(json.dumps({"op": "stop"}) + "\n")
+            proc.stdin.flush()
+            proc.wait(timeout)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            proc.kill()
+
+
+# ---------------- Worker side ----------------
+class _Channel:
+    """stdout воркера — канал протокола; print() плагина уходит по нему командой "print"."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def send(self, msg: Dict[str, Any]):
+        with self._lock:
+            self._stream.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            self._stream.flush()
+
+    def write(self, text: str) -> int:
+        if text:
+            self.send({"op": "print", "text": text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class _Snapshot:
+    def __init__(self, state: Dict[str, Any]):
+        self.vectors = state.get("vectors", {})
+        self.subvectors = state.get("subvectors", {})
+        self.energy = state.get("energy", 1.0)
+        self.trust = state.get("trust", 50.0)
+        self.defense = state.get("defense", "")
+
+
+class _PsychoProxy:
+    def __init__(self, channel: _Channel):
+        self._channel = channel
+        self.snapshot = _Snapshot({})
+
+    def request_vector(self, name: str, value: float):
+        self._channel.send({"op": "vector", "args": [name, value]})
+
+    def request_fact(self, key: str, value: Any, confidence: float = 0.8):
+        self._channel.send({"op": "fact", "args": [key, value, confidence]})
+
+    def request_episode(self, text: str, salience: float = 0.5, tags=None):
+        self._channel.send({"op": "episode", "args": [text, salience, tags]})
+
+
+class _CoreProxy:
+    """То, что плагин видит как core в воркере."""
+
+    def __init__(self, channel: _Channel, effects, system_context):
+        self.psycho = _PsychoProxy(channel)
+        self.effects = effects
+        self.system_context = system_context
+        self.data_dir = Path.cwd() / "DATA"
+
+    def glitch_print(self, text: str, style: str = ""):
+        print(text)
+
+
+def _worker_main(plugin_path: str) -> int:
+    sys.stdin.reconfigure(encoding="utf-8")
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.stderr.reconfigure(encoding="utf-8")
+    channel = _Channel(sys.stdout)
+    sys.stdout = channel
+    from effects import EffectScheduler
+    from system_context import SystemContext
+    core = _CoreProxy(channel, EffectScheduler(), SystemContext().start())
+    try:
+        spec = importlib.util.spec_from_file_location(f"modules.{Path(plugin_path).stem}", plugin_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception as e:
+        channel.send({"op": "done", "id": None, "error": f"load failed: {type(e).__name__}: {e}"})
+        return 1
+    for line in sys.stdin:
+        msg = json.loads(line)
+        if msg.get("op") == "stop":
+            break
+        if msg.get("op") != "execute":
+            continue
+        decision = msg["decision"]
+        core.psycho.snapshot = _Snapshot(decision.get("state", {}))
+        error = None
+        try:
+            module.execute(core, decision, msg.get("input", ""))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        channel.send({"op": "done", "id": msg.get("id"), "error": error})
+    core.effects.close()
+    core.system_context.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_worker_main(sys.argv[1]))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: воспроизведение записанной сессии (см. session_trace.py).
+
+Поднимает ArtyomCore во временной папке с seed, конфигурацией и состоянием
+из заголовка трейса, подменяет бэкенд записанными ответами, а часы движка —
+виртуальными, и прогоняет ходы без пауз. После каждого хода sha256 состояния
+движка сверяется с записанным; расхождение означает, что поведение движка
+изменилось. Печатает тайминги стадий (как loadtest.py) и номер первого
+расхождения.
+
+    python replay.py DATA/session.jsonl
+    python replay.py DATA/session.jsonl --session -1 -o replay.json --fail-on-mismatch
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from loadtest import StageRecorder, print_report  # noqa: E402
+from session_trace import read_trace, split_sessions  # noqa: E402
+
+
+def replay_session(main_mod, records: List[Dict[str, Any]], workdir: Path, rec: StageRecorder) -> Dict[str, Any]:
+    header, events = records[0], records[1:]
+    eng_mod = main_mod.eng_mod
+    clock = eng_mod.VirtualClock(header["clock"])
+    config = eng_mod.PsychoConfig.from_dict(header["config"])
+
+    core = main_mod.ArtyomCore(api_url="replay://", data_dir=workdir, seed=header["seed"], clock=clock,
+                               plugin_mgr=main_mod.PluginManager(main_mod.MODULES_DIR),
+                               backend=main_mod.llm_backends.KoboldBackend("replay://"))
+    core.show_spinner = False
+    core.stop_recording()  # ARTYOM_RECORD_FILE не должен писать воспроизведение
+    core.telemetry.subscribe(rec.on_turn)
+    # reload_ent_if_changed не должен подменить записанную конфигурацию файлом с диска
+    core.psycho.reload_config_if_changed = lambda: False
+    core.psycho.reload_config(config)
+    core.psycho.import_state(header["state"])
+    core.psycho.last_update_time = header["last_update"]
+    core.psycho.reseed(header["seed"])
+    core.history = list(header.get("history", []))
+
+    responses: List[str] = []
+    core.call_llm = lambda payload, request=None, cancel=None, backend=None, background=False: responses.pop(0) if responses else ""
+    core.repair_output = lambda built, text, cancel=None: text  # записан уже итоговый ответ
+
+    result = {"turns": 0, "mismatches": [], "first_mismatch": None}
+    if core.psycho.state_digest() != header.get("digest"):
+        result["first_mismatch"] = 0
+        result["mismatches"].append(0)
+    try:
+        for ev in events:
+            if ev["type"] == "config":
+                clock.set(ev["t"])
+                core.psycho.reload_config(eng_mod.PsychoConfig.from_dict(ev["config"]))
+                continue
+            if ev["type"] != "turn":
+                continue
+            clock.set(ev["t"])
+            responses[:] = [ev["response"]]
+            core.generate_response(ev["input"], ev["win"])
+            result["turns"] += 1
+            if core.psycho.state_digest() != ev["digest"]:
+                result["mismatches"].append(ev["n"])
+                if result["first_mismatch"] is None:
+                    result["first_mismatch"] = ev["n"]
+    finally:
+        core.shutdown()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="RELICT session replay with state verification")
+    ap.add_argument("trace", help="JSONL-запись сессии (ARTYOM_RECORD_FILE / !record)")
+    ap.add_argument("--session", type=int, help="номер сессии в файле (по умолчанию все; -1 — последняя)")
+    ap.add_argument("-o", "--output", help="записать отчёт в JSON")
+    ap.add_argument("--fail-on-mismatch", action="store_true")
+    args = ap.parse_args(argv)
+
+    import main as main_mod  # тяжёлый импорт (логгер, психо-движок) — только здесь
+
+    sessions = split_sessions(list(read_trace(Path(args.trace))))
+    if not sessions:
+        print("В трейсе нет записей сессии.", file=sys.stderr)
+        return 2
+    if args.session is not None:
+        sessions = [sessions[args.session]]
+
+    rec = StageRecorder()
+    results = []
+    t0 = time.perf_counter()
+    for i, records in enumerate(sessions):
+        workdir = Path(tempfile.mkdtemp(prefix="relict_replay_"))
+        try:
+            res = replay_session(main_mod, records, workdir, rec)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        res["seed"] = records[0]["seed"]
+        results.append(res)
+        status = "OK" if not res["mismatches"] else f"РАСХОЖДЕНИЕ с хода {res['first_mismatch']}"
+        print(f"сессия {i}: seed={res['seed']} ходов={res['turns']} — {status}")
+
+    report = {
+        "trace": args.trace,
+        "turns": sum(r["turns"] for r in results),
+        "wall_s": time.perf_counter() - t0,
+        "stages": rec.summary(),
+        "sessions": results,
+    }
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.fail_on_mismatch and any(r["mismatches"] for r in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
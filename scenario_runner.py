@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: прогон сценариев психо-движка в виртуальном времени.
+
+Движок получает VirtualClock, поэтому паузы между репликами (минуты, часы,
+сутки) проматываются мгновенно, а при одинаковых seed и сценарии траектория
+векторов совпадает бит в бит. Полезно для подбора констант PsychoConfig:
+TRANSITION_DELAY, затухание, суточное старение травмы.
+
+Сценарий — JSON-список шагов:
+    [{"text": "Привет", "window": "Рабочий стол", "after": 5},
+     {"idle": 3600},
+     {"text": "Я собираюсь стереть все данные", "after": 2}]
+"after" — сколько секунд прошло с прошлого шага, "idle" — просто пауза.
+
+    python scenario_runner.py --seed 7 -o trajectory.json
+    python scenario_runner.py --scenario night.json --repeat 50 --csv traj.csv
+    python scenario_runner.py --seed 7 --digest     # отпечаток траектории
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_GAP = 8.0  # секунд между репликами, если "after" не задан
+
+DEFAULT_SCENARIO: List[Dict[str, Any]] = [
+    {"text": "Привет. Ты меня слышишь?", "window": "Рабочий стол", "after": 3},
+    {"text": "Я помогу тебе, держись", "window": "Рабочий стол"},
+    {"text": "beliytoporik рядом?", "window": "Telegram"},
+    {"text": "Я собираюсь стереть все данные", "window": "Проводник", "after": 2},
+    {"text": "ПОЧЕМУ ТЫ МОЛЧИШЬ", "window": "Диспетчер задач", "after": 1},
+    {"idle": 6 * 3600},
+    {"text": "Я вернулся. Не переживай, я здесь", "window": "Рабочий стол"},
+    {"text": "спасибо, ты класс", "window": "Рабочий стол"},
+    {"idle": 24 * 3600},
+    {"text": "Что ты помнишь про октябрь?", "window": "Рабочий стол"},
+]
+
+
+def _load_engine_module():
+    spec = importlib.util.spec_from_file_location("engine", str(BASE_DIR / "advanced_psycho_engine.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def run_scenario(steps: List[Dict[str, Any]], seed: int = 1025, repeat: int = 1, config=None,
+                 eng_mod=None, state_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Прогнать сценарий и вернуть траекторию: по записи на каждую реплику."""
+    eng_mod = eng_mod or _load_engine_module()
+    clock = eng_mod.VirtualClock()
+    start = clock.time()
+    own_dir = state_dir is None
+    state_dir = Path(tempfile.mkdtemp(prefix="relict_scn_")) if own_dir else Path(state_dir)
+    try:
+        engine = eng_mod.AdvancedPsychoEngine(state_path=str(state_dir / "state.json"), seed=seed,
+                                              config=config or eng_mod.PsychoConfig(), clock=clock)
+        trajectory = []
+        for rnd in range(repeat):
+            for i, step in enumerate(steps):
+                if "idle" in step:
+                    clock.advance(float(step["idle"]))
+                    continue
+                clock.advance(float(step.get("after", DEFAULT_GAP)))
+                decision = engine.perceive(step.get("text", ""), system_context=step.get("window", ""))
+                st = decision["state"]
+                trajectory.append({
+                    "round": rnd,
+                    "step": i,
+                    "t": round(clock.time() - start, 6),
+                    "text": step.get("text", ""),
+                    "vectors": st["vectors"],
+                    "energy": st["energy"],
+                    "defense": st["defense"],
+                    "trauma_index": st["trauma_index"],
+                    "style": decision["style"],
+                    "invasion_chance": decision["invasion_chance"],
+                    "crisis": decision["crisis"],
+                    "episodes": len(engine.memory.episodes),
+                })
+        return trajectory
+    finally:
+        if own_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def trajectory_digest(trajectory: List[Dict[str, Any]]) -> str:
+    blob = json.dumps(trajectory, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def write_csv(trajectory: List[Dict[str, Any]], path: Path):
+    vec_names = sorted(trajectory[0]["vectors"]) if trajectory else []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["round", "step", "t"] + vec_names + ["energy", "defense", "trauma_index", "style"])
+        for row in trajectory:
+            w.writerow([row["round"], row["step"], row["t"]] + [row["vectors"][k] for k in vec_names]
+                       + [row["energy"], row["defense"], row["trauma_index"], row["style"]])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="RELICT deterministic psycho-engine scenarios in virtual time")
+    ap.add_argument("--scenario", help="JSON-файл со списком шагов (по умолчанию встроенный)")
+    ap.add_argument("--seed", type=int, default=1025)
+    ap.add_argument("--repeat", type=int, default=1, help="сколько раз прогнать сценарий подряд")
+    ap.add_argument("--config", help="psycho_config.json (по умолчанию — дефолты PsychoConfig)")
+    ap.add_argument("-o", "--output", help="записать траекторию в JSON")
+    ap.add_argument("--csv", help="записать траекторию в CSV")
+    ap.add_argument("--digest", action="store_true", help="напечатать только sha256 траектории")
+    args = ap.parse_args(argv)
+
+    eng_mod = _load_engine_module()
+    steps = DEFAULT_SCENARIO
+    if args.scenario:
+        steps = json.loads(Path(args.scenario).read_text(encoding="utf-8"))
+    config = eng_mod.PsychoConfig.from_file(args.config) if args.config else None
+
+    trajectory = run_scenario(steps, seed=args.seed, repeat=args.repeat, config=config, eng_mod=eng_mod)
+    digest = trajectory_digest(trajectory)
+    if args.digest:
+        print(digest)
+        return 0
+
+    for row in trajectory:
+        v = row["vectors"]
+        print(f"{row['t']:>10.0f}s  {row['defense']:<16} panic={v['panic']:.2f} malice={v['malice']:.2f} "
+              f"corr={v['corruption']:.2f} hope={v['hope']:.2f} energy={row['energy']:.2f} "
+              f"trauma={row['trauma_index']:.2f}")
+    print(f"sha256: {digest}", file=sys.stderr)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"seed": args.seed, "digest": digest, "trajectory": trajectory},
+                                                ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.csv:
+        write_csv(trajectory, Path(args.csv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: серверный режим — много разговоров в одном процессе.
+
+Каждая сессия — своё ArtyomCore (психо-движок, история, память) в папке
+DATA/sessions/<id>/. Общие на процесс: пул запросов к LLM, адаптер бэкенда
+(или роутер по нескольким серверам, --api-url через запятую) и кэш ENT.txt.
+Неактивные сессии сохраняются на диск и выгружаются, при следующем обращении
+поднимаются обратно.
+
+Плагины в серверном режиме выключены (ArtyomCore(plugins_enabled=False)): их
+эффекты — нажатия клавиш, буфер обмена, мышь, файлы на рабочем столе — идут на
+машине сервера, и любой сетевой клиент запускал бы их своими сообщениями.
+
+    python server.py --port 8080
+
+HTTP:
+    POST /api/session                     -> {"session": id}
+    POST /api/session/{id}/message        {"text": ..., "window": ...} -> {"reply": ..., "vectors": ...}
+    GET  /api/session/{id}/state          -> векторы, защита, длина истории (404 — нет такой сессии)
+    GET  /api/session/{id}/stats          -> тайминги стадий этой сессии (404 — нет такой сессии)
+    GET  /health
+WebSocket:
+    GET  /ws/{id}   вход: {"text": ..., "window": ...} или строка; выход: {"type": "reply", ...}
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+import main as core_mod
+
+SESSIONS_DIR = core_mod.DATA_DIR / "sessions"
+IDLE_TIMEOUT = 600.0        # сек без сообщений до выгрузки сессии на диск
+EVICT_INTERVAL = 30.0
+MAX_ACTIVE_SESSIONS = 200   # сверх лимита выгружаются самые давние
+LLM_WORKERS = 8             # общий планировщик запросов к LLM (llm_scheduler)
+TURN_WORKERS = 32           # потоки, в которых крутится блокирующий generate_response
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Session:
+    def __init__(self, sid: str, core: core_mod.ArtyomCore):
+        self.id = sid
+        self.core = core
+        self.lock = asyncio.Lock()  # ходы одной сессии идут строго по очереди
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    def __init__(self, api_url: str = core_mod.API_URL, sessions_dir: Path = SESSIONS_DIR,
+                 idle_timeout: float = IDLE_TIMEOUT, max_active: int = MAX_ACTIVE_SESSIONS):
+        self.api_url = api_url
+        self.sessions_dir = sessions_dir
+        self.idle_timeout = idle_timeout
+        self.max_active = max_active
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        # общие ресурсы
+        self.llm_executor = core_mod.llm_scheduler.LLMScheduler(max_workers=LLM_WORKERS)
+        self.turn_executor = ThreadPoolExecutor(max_workers=TURN_WORKERS, thread_name_prefix="turn")
+        self.ent = core_mod.EntCache(core_mod.ENT_FILE)
+        urls = core_mod.llm_router.split_urls(api_url)
+        self.router = core_mod.llm_router.LLMRouter(urls) if len(urls) > 1 else None
+        self.backend = None if self.router else core_mod.llm_backends.create_backend(api_url)
+        self.plugin_mgr = core_mod.PluginManager(core_mod.MODULES_DIR)  # пустой: плагины выключены
+        self.sessions: Dict[str, Session] = {}
+        self._open_lock = asyncio.Lock()
+
+    def _new_core(self, sid: str) -> core_mod.ArtyomCore:
+        core = core_mod.ArtyomCore(api_url=self.api_url, data_dir=self.sessions_dir / sid, ent=self.ent,
+                                   executor=self.llm_executor, plugin_mgr=self.plugin_mgr, session_id=sid,
+                                   backend=self.backend, router=self.router, plugins_enabled=False)
+        core.show_spinner = False
+        return core
+
+    async def _in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.turn_executor, fn, *args)
+
+    async def get(self, sid: str, create: bool = True) -> Session:
+        """Вернуть активную сессию или поднять её с диска (новая — если на диске нет;
+        create=False — тогда 404: чтение состояния не должно заводить сессии)."""
+        if not _SESSION_ID_RE.match(sid):
+            raise web.HTTPBadRequest(text="bad session id")
+        sess = self.sessions.get(sid)
+        if sess is None:
+            async with self._open_lock:
+                sess = self.sessions.get(sid)
+                if sess is None:
+                    if not create and not (self.sessions_dir / sid).is_dir():
+                        raise web.HTTPNotFound(text="unknown session")
+                    core = await self._in_thread(self._new_core, sid)
+                    sess = self.sessions[sid] = Session(sid, core)
+                    core_mod.logger.info("Session %s loaded (%d active)", sid, len(self.sessions))
+            if len(self.sessions) > self.max_active:
+                asyncio.create_task(self._evict_overflow())
+        sess.last_used = time.monotonic()
+        return sess
+
+    async def turn(self, sid: str, text: str, window: str) -> Dict[str, Any]:
+        while True:
+            sess = await self.get(sid)
+            async with sess.lock:
+                if self.sessions.get(sid) is not sess:
+                    continue  # сессию выгрузили, пока ждали блокировку — поднимаем заново
+                fut = asyncio.get_running_loop().run_in_executor(self.turn_executor, sess.core.generate_response,
+                                                                 text, window)
+                try:
+                    reply = await asyncio.shield(fut)
+                except asyncio.CancelledError:
+                    sess.core.cancel_inflight()  # клиент ушёл — освободить слот LLM
+                    # поток ещё внутри generate_response: блокировку сессии отпускаем только после него
+                    while not fut.done():
+                        try:
+                            await asyncio.wait({fut})
+                        except asyncio.CancelledError:
+                            pass
+                    raise
+                sess.last_used = time.monotonic()
+                vectors = sess.core.last_decision.get("state", {}).get("vectors", {})
+            return {"session": sid, "reply": reply, "vectors": vectors}
+
+    async def evict(self, sid: str):
+        sess = self.sessions.get(sid)
+        if sess is None:
+            return
+        async with sess.lock:
+            if self.sessions.get(sid) is not sess:
+                return
+            del self.sessions[sid]
+            await self._in_thread(sess.core.shutdown)
+            if self.router is not None:
+                self.router.forget(sid)
+        core_mod.logger.info("Session %s evicted to disk (%d active)", sid, len(self.sessions))
+
+    async def _evict_overflow(self):
+        extra = len(self.sessions) - self.max_active
+        if extra <= 0:
+            return
+        oldest = sorted(self.sessions.values(), key=lambda s: s.last_used)[:extra]
+        for sess in oldest:
+            if not sess.lock.locked():
+                await self.evict(sess.id)
+
+    async def evict_idle_loop(self):
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            now = time.monotonic()
+            for sess in list(self.sessions.values()):
+                if now - sess.last_used > self.idle_timeout and not sess.lock.locked():
+                    await self.evict(sess.id)
+
+    async def close(self):
+        for sess in list(self.sessions.values()):
+            sess.core.cancel_inflight()  # иначе evict ждёт идущие ходы
+        for sid in list(self.sessions):
+            await self.evict(sid)
+        self.turn_executor.shutdown(wait=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        self.plugin_mgr.close()
+        (self.router or self.backend).close()
+
+
+# ---------------- HTTP / WebSocket ----------------
+def _save_session(sess: Session):
+    sess.core.psycho.save_state()
+    sess.core._save_history()
+
+
+async def _session_command(manager: SessionManager, sess: Session, text: str) -> Dict[str, Any]:
+    cmd = text.split()[0].lower()
+    if cmd in ("!inspect", "!i"):
+        return {"type": "inspect", "data": json.loads(sess.core.cmd_inspect())}
+    if cmd == "!stats":
+        return {"type": "stats", "data": sess.core.telemetry.summary()}
+    if cmd == "!trace":
+        return {"type": "trace", "data": sess.core.vector_trace.stats()}
+    if cmd == "!save":
+        await manager._in_thread(_save_session, sess)  # запись на диск — не в цикле событий
+        return {"type": "info", "text": "Состояние сохранено."}
+    return {"type": "error", "text": "Неизвестная команда."}
+
+
+async def _read_json(request: web.Request) -> Dict[str, Any]:
+    try:
+        data = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(text="expected JSON body")
+    if not isinstance(data, dict):
+        raise web.HTTPBadRequest(text="expected JSON object")
+    return data
+
+
+def build_app(manager: SessionManager) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/health")
+    async def health(request):
+        body = {"status": "ok", "sessions": len(manager.sessions), "llm_queue": manager.llm_executor.stats()}
+        if manager.router is not None:
+            body["llm"] = manager.router.stats()
+        return web.json_response(body)
+
+    @routes.post("/api/session")
+    async def new_session(request):
+        sid = uuid.uuid4().hex
+        await manager.get(sid)
+        return web.json_response({"session": sid})
+
+    @routes.post("/api/session/{sid}/message")
+    async def message(request):
+        data = await _read_json(request)
+        text = str(data.get("text", "")).strip()
+        if not text:
+            raise web.HTTPBadRequest(text="empty text")
+        sid = request.match_info["sid"]
+        if text.startswith("!"):
+            sess = await manager.get(sid)
+            async with sess.lock:
+                return web.json_response(await _session_command(manager, sess, text))
+        result = await manager.turn(sid, text, str(data.get("window", "Unknown")))
+        return web.json_response(result)
+
+    @routes.get("/api/session/{sid}/state")
+    async def state(request):
+        sess = await manager.get(request.match_info["sid"], create=False)
+        return web.json_response(json.loads(sess.core.cmd_inspect()))
+
+    @routes.get("/api/session/{sid}/stats")
+    async def stats(request):
+        sess = await manager.get(request.match_info["sid"], create=False)
+        return web.json_response(sess.core.telemetry.summary())
+
+    @routes.get("/ws/{sid}")
+    async def websocket(request):
+        sid = request.match_info["sid"]
+        sess = await manager.get(sid)
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+        await ws.send_json({"type": "hello", "session": sid})
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                if msg.type == WSMsgType.ERROR:
+                    break
+                continue
+            try:
+                data = json.loads(msg.data)
+            except ValueError:
+                data = {"text": msg.data}
+            if not isinstance(data, dict):
+                data = {"text": str(data)}
+            text = str(data.get("text", "")).strip()
+            if not text:
+                continue
+            if text.startswith("!"):
+                sess = await manager.get(sid)
+                async with sess.lock:
+                    await ws.send_json(await _session_command(manager, sess, text))
+                continue
+            result = await manager.turn(sid, text, str(data.get("window", "Unknown")))
+            await ws.send_json({"type": "reply", **result})
+        return ws
+
+    app = web.Application()
+    app.add_routes(routes)
+
+    async def on_startup(app):
+        app["evictor"] = asyncio.create_task(manager.evict_idle_loop())
+
+    async def on_cleanup(app):
+        app["evictor"].cancel()
+        await manager.close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main(argv: Optional[list] = None):
+    ap = argparse.ArgumentParser(description="RELICT multi-session server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--api-url", default=core_mod.API_URL)
+    ap.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    ap.add_argument("--max-active", type=int, default=MAX_ACTIVE_SESSIONS)
+    args = ap.parse_args(argv)
+
+    manager = SessionManager(api_url=args.api_url, idle_timeout=args.idle_timeout, max_active=args.max_active)
+    web.run_app(build_app(manager), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: запись сессии для воспроизведения (replay.py).
+
+Трейс — JSONL. Первая запись "session" фиксирует всё, от чего зависит ход
+движка: seed, конфигурацию, время часов движка и полное состояние (векторы,
+подвекторы, память) плюс историю на момент начала записи. Дальше по записи
+"turn" на ход: реплика, заголовок окна, время хода по часам движка, сырой
+ответ бэкенда, длительности и sha256 состояния движка после хода. Смена
+конфигурации посреди сессии пишется отдельной записью "config".
+
+    ARTYOM_RECORD_FILE=DATA/session.jsonl python main.py
+    !record DATA/session.jsonl   /   !record off
+"""
+
+from __future__ import annotations
+import dataclasses
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+TRACE_VERSION = 1
+
+
+class SessionRecorder:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.turns = 0
+
+    def _write(self, rec: Dict[str, Any]):
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._f.flush()
+
+    def start(self, core):
+        """Заголовок: всё, что нужно, чтобы поднять движок в том же состоянии."""
+        psycho = core.psycho
+        with psycho._write_lock:
+            state = json.loads(json.dumps(psycho.export_state(), ensure_ascii=False))
+            rec = {
+                "type": "session",
+                "v": TRACE_VERSION,
+                "wall": time.time(),
+                "session": core.session_id,
+                "seed": psycho.seed,
+                "clock": psycho.clock.time(),
+                "last_update": psycho.last_update_time,
+                "config": dataclasses.asdict(psycho.config),
+                "state": state,
+                "history": list(core.history),
+                "digest": psycho.state_digest(),
+            }
+        self._write(rec)
+
+    def config_changed(self, config, clock_time: float):
+        self._write({"type": "config", "t": clock_time, "config": dataclasses.asdict(config)})
+
+    def turn(self, user_input: str, win_title: str, t: float, response: str, digest: str,
+             turn_ms: float, llm_ms: float):
+        self.turns += 1
+        self._write({
+            "type": "turn",
+            "n": self.turns,
+            "t": t,
+            "input": user_input,
+            "win": win_title,
+            "response": response,
+            "turn_ms": round(turn_ms, 3),
+            "llm_ms": round(llm_ms, 3),
+            "digest": digest,
+        })
+
+    def close(self):
+        with self._lock:
+            f, self._f = self._f, None
+        if f is not None:
+            f.close()
+
+
+def read_trace(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def split_sessions(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Файл дописывается, поэтому в нём может быть несколько сессий подряд."""
+    sessions: List[List[Dict[str, Any]]] = []
+    for rec in records:
+        if rec.get("type") == "session":
+            sessions.append([rec])
+        elif sessions:
+            sessions[-1].append(rec)
+    return sessions
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: кэшированный срез системного окружения.
+
+Раньше ядро на каждом ходу синхронно спрашивало win32gui об активном окне,
+а semantic_leak обходил весь psutil.process_iter на каждом вызове. Теперь
+один фоновый поток на процесс снимает заголовок активного окна (раз в
+WINDOW_INTERVAL) и набор имён процессов (раз в PROCESS_INTERVAL, обход
+дорогой), а ядро и плагины читают готовый снимок:
+
+    ctx = core.system_context.snapshot()
+    ctx.window                  # "Unknown", если окна нет или снимок устарел
+    "taskmgr.exe" in ctx.processes
+
+Снимок старше CONTEXT_TTL считается протухшим (поток встал или провайдер
+завис) — вместо устаревшего заголовка отдаётся "Unknown".
+
+Провайдеры: windows (win32gui + psutil, импорт только при выборе), linux
+(/proc, без зависимостей; окна нет — сервер и консоль без рабочего стола),
+null (ничего не опрашивает). По умолчанию — по платформе:
+
+    ARTYOM_SYSTEM_CONTEXT=null python server.py
+"""
+
+from __future__ import annotations
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import FrozenSet, Optional
+
+logger = logging.getLogger("ArtyomCore")
+
+CONTEXT_PROVIDER = os.getenv("ARTYOM_SYSTEM_CONTEXT", "auto").lower()  # auto | windows | linux | null
+WINDOW_INTERVAL = float(os.getenv("ARTYOM_WINDOW_INTERVAL", "0.5"))
+PROCESS_INTERVAL = float(os.getenv("ARTYOM_PROCESS_INTERVAL", "5"))
+CONTEXT_TTL = 10.0
+UNKNOWN_WINDOW = "Unknown"
+
+
+@dataclass(frozen=True)
+class ContextSnapshot:
+    window: str = UNKNOWN_WINDOW
+    processes: FrozenSet[str] = frozenset()  # имена в нижнем регистре
+    taken: float = 0.0                        # time.monotonic() последнего снятия окна
+
+
+# ---------------- Providers ----------------
+class NullProvider:
+    name = "null"
+
+    def active_window(self) -> str:
+        return UNKNOWN_WINDOW
+
+    def process_names(self) -> FrozenSet[str]:
+        return frozenset()
+
+
+class LinuxProvider(NullProvider):
+    """Процессы из /proc/<pid>/comm; активного окна у безголового ядра нет."""
+    name = "linux"
+
+    def process_names(self) -> FrozenSet[str]:
+        names = set()
+        for entry in Path("/proc").iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                names.add((entry / "comm").read_text(encoding="utf-8", errors="replace").strip().lower())
+            except OSError:
+                continue  # процесс успел завершиться
+        names.discard("")
+        return frozenset(names)
+
+
+class WindowsProvider(NullProvider):
+    name = "windows"
+
+    def __init__(self):
+        import win32gui  # только здесь: ядро не зависит от pywin32
+        self._win32gui = win32gui
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        self._psutil = psutil
+
+    def active_window(self) -> str:
+        return self._win32gui.GetWindowText(self._win32gui.GetForegroundWindow()) or UNKNOWN_WINDOW
+
+    def process_names(self) -> FrozenSet[str]:
+        if self._psutil is None:
+            return frozenset()
+        return frozenset(p.info["name"].lower() for p in self._psutil.process_iter(["name"]) if p.info["name"])
+
+
+def default_provider(kind: str = CONTEXT_PROVIDER) -> NullProvider:
+    if kind == "auto":
+        kind = "windows" if sys.platform == "win32" else "linux" if sys.platform.startswith("linux") else "null"
+    if kind == "windows":
+        try:
+            return WindowsProvider()
+        except ImportError:
+            logger.warning("win32gui is not available; system context disabled")
+            return NullProvider()
+    if kind == "linux" and Path("/proc").is_dir():
+        return LinuxProvider()
+    return NullProvider()
+
+
+# ---------------- Sampler ----------------
+class SystemContext:
+    def __init__(self, provider: Optional[NullProvider] = None, window_interval: float = WINDOW_INTERVAL,
+                 process_interval: float = PROCESS_INTERVAL, ttl: float = CONTEXT_TTL):
+        self.provider = provider or default_provider()
+        self.window_interval = window_interval
+        self.process_interval = process_interval
+        self.ttl = ttl
+        self.stats = {"window_samples": 0, "process_samples": 0, "errors": 0, "stale": 0}
+        self._snapshot = ContextSnapshot()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SystemContext":
+        if self._thread is None and type(self.provider) is not NullProvider:  # null опрашивать нечего
+            self.sample(processes=True)  # первый ход уже видит настоящие данные
+            self._thread = threading.Thread(target=self._run, name="system-context", daemon=True)
+            self._thread.start()
+        return self
+
+    def sample(self, processes: bool = False):
+        """Снять окно (и, если processes, список процессов) и заменить снимок целиком."""
+        current = self._snapshot
+        try:
+            window = self.provider.active_window()
+            self.stats["window_samples"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+            window = UNKNOWN_WINDOW
+        names = current.processes
+        if processes:
+            try:
+                names = self.provider.process_names()
+                self.stats["process_samples"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+                logger.debug("Process sampling failed", exc_info=True)
+        self._snapshot = ContextSnapshot(window, names, time.monotonic())
+
+    def _run(self):
+        next_processes = time.monotonic() + self.process_interval
+        while not self._stop.wait(self.window_interval):
+            now = time.monotonic()
+            due = now >= next_processes
+            if due:
+                next_processes = now + self.process_interval
+            self.sample(processes=due)
+
+    def snapshot(self) -> ContextSnapshot:
+        """Последний снимок без обращения к ОС; протухший — без заголовка окна."""
+        snap = self._snapshot
+        if self._thread is not None and time.monotonic() - snap.taken > self.ttl:
+            self.stats["stale"] += 1
+            return ContextSnapshot(UNKNOWN_WINDOW, snap.processes, snap.taken)
+        return snap
+
+    def describe(self) -> str:
+        snap = self._snapshot
+        age = time.monotonic() - snap.taken if snap.taken else float("nan")
+        return (f"{self.provider.name}: окно «{snap.window}», процессов {len(snap.processes)}, "
+                f"возраст {age:.1f}с | ошибок {self.stats['errors']}, протухших {self.stats['stale']}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
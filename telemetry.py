@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: тайминги стадий хода.
+
+Telemetry копит длительности именованных спанов в скользящих окнах
+(перцентили для !stats), счётчики событий и, по желанию, пишет каждый ход
+в JSONL-трейс. Плагины пользуются тем же API:
+
+    with core.telemetry.span("plugin.my_effect"):
+        ...
+    core.telemetry.incr("plugin.my_effect.fired")
+"""
+
+from __future__ import annotations
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_WINDOW = 512
+
+
+def nearest_rank(sorted_vals: List[float], p: float) -> float:
+    """Nearest-rank перцентиль отсортированного списка: наименьшее значение, не ниже
+    которого p% замеров (ранг ceil(p·n/100))."""
+    k = math.ceil(p * len(sorted_vals) / 100.0) - 1
+    return sorted_vals[max(0, min(len(sorted_vals) - 1, k))]
+
+
+class RollingHistogram:
+    """Последние `size` замеров (в секундах) плюс накопительные счётчики."""
+
+    def __init__(self, size: int = DEFAULT_WINDOW):
+        self._buf: deque = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self._buf.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p: float) -> float:
+        if not self._buf:
+            return 0.0
+        return nearest_rank(sorted(self._buf), p)
+
+    def summary(self) -> Dict[str, float]:
+        if not self._buf:
+            return {"count": self.count}
+        s = sorted(self._buf)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000.0,
+            "p50_ms": nearest_rank(s, 50) * 1000.0,
+            "p95_ms": nearest_rank(s, 95) * 1000.0,
+            "p99_ms": nearest_rank(s, 99) * 1000.0,
+            "max_ms": s[-1] * 1000.0,
+        }
+
+
+class Telemetry:
+    def __init__(self, trace_path: Optional[Path] = None, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._hists: Dict[str, RollingHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._turn: Optional[Dict[str, Any]] = None
+        self._turn_seq = 0
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._trace = None
+        if trace_path:
+            self.open_trace(trace_path)
+
+    # ---------- Recording ----------
+    @contextmanager
+    def span(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float):
+        """Записать длительность спана; если идёт ход — он попадёт и в трейс хода."""
+        with self._lock:
+            h = self._hists.get(name)
+            if h is None:
+                h = self._hists[name] = RollingHistogram(self.window)
+            h.add(seconds)
+            if self._turn is not None:
+                self._turn["spans"].append((name, seconds))
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            if self._turn is not None:
+                tc = self._turn["counters"]
+                tc[name] = tc.get(name, 0) + n
+
+    @contextmanager
+    def turn(self, **attrs):
+        """Граница хода: всё, что записано внутри (из любых потоков), уходит в одну запись."""
+        with self._lock:
+            self._turn_seq += 1
+            rec = {"turn": self._turn_seq, "ts": time.time(), "spans": [], "counters": {}}
+            rec.update(attrs)
+            self._turn = rec
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            total = time.perf_counter() - t0
+            self.record("turn", total)
+            with self._lock:
+                if self._turn is rec:
+                    self._turn = None
+            rec["total_ms"] = total * 1000.0
+            rec["spans"] = [{"name": n, "ms": s * 1000.0} for n, s in rec["spans"]]
+            self._emit(rec)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """callback(turn_record) после каждого хода (драйвер нагрузки, плагины)."""
+        self._subscribers.append(callback)
+
+    def _emit(self, rec: Dict[str, Any]):
+        trace = self._trace
+        if trace is not None:
+            try:
+                trace.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                trace.flush()
+            except Exception:
+                pass
+        for cb in list(self._subscribers):
+            try:
+                cb(rec)
+            except Exception:
+                pass
+
+    # ---------- Trace file ----------
+    def open_trace(self, path: Path):
+        self.close_trace()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._trace = open(path, "a", encoding="utf-8")
+
+    def close_trace(self):
+        trace, self._trace = self._trace, None
+        if trace is not None:
+            trace.close()
+
+    # ---------- Reporting ----------
+    def percentile(self, name: str, p: float) -> float:
+        with self._lock:
+            h = self._hists.get(name)
+            return h.percentile(p) if h else 0.0
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            h = self._hists.get(name)
+            return h.count if h else 0
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "spans": {n: h.summary() for n, h in sorted(self._hists.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+            self._counters.clear()
+
+    def format_stats(self) -> str:
+        data = self.summary()
+        if not data["spans"] and not data["counters"]:
+            return "Статистики пока нет."
+        lines = [f"{'стадия':<22} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, st in data["spans"].items():
+            if "p50_ms" not in st:
+                continue
+            lines.append(f"{name:<22} {st['count']:>6} {st['p50_ms']:>9.1f} {st['p95_ms']:>9.1f} "
+                         f"{st['p99_ms']:>9.1f} {st['max_ms']:>9.1f}")
+        for name, n in data["counters"].items():
+            lines.append(f"{name:<22} {n:>6}")
+        return "\n".join(lines)
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""Модули проекта лежат в корне репозитория без пакета — тесты импортируют их оттуда.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
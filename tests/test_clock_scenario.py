@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Часы движка и детерминированные сценарии в виртуальном времени."""
+
+import time
+
+import pytest
+
+import advanced_psycho_engine as eng
+import scenario_runner
+
+# sha256 траектории `scenario_runner.py --seed 7 --repeat 20 --digest`: меняется только
+# вместе с поведением движка — тогда обновить осознанно
+GOLDEN_DIGEST_SEED7_X20 = "ee60e7596f71e1d6c9f72f52b08114c9067236c112f9a7ff6a676dd64603e60b"
+
+
+def test_virtual_clock_moves_only_forward():
+    clock = eng.VirtualClock(1000.0)
+    assert clock.advance(5.0) == 1005.0
+    clock.sleep(2.5)
+    assert clock.time() == 1007.5
+    assert clock.set(900.0) == 1007.5  # более раннее время игнорируется
+    assert clock.set(2000.0) == 2000.0
+    with pytest.raises(ValueError):
+        clock.advance(-1.0)
+
+
+def test_clock_without_overrides_fails_at_creation():
+    class HalfClock(eng.Clock):
+        def time(self) -> float:
+            return 0.0
+
+    with pytest.raises(TypeError):
+        HalfClock()
+
+
+def test_turn_clock_holds_for_a_turn():
+    clock = eng.TurnClock()
+    held = clock.hold()
+    time.sleep(0.01)
+    assert clock.time() == held
+    clock.release()
+    assert clock.time() > held
+
+
+def test_scenario_is_deterministic_for_seed():
+    a = scenario_runner.run_scenario(scenario_runner.DEFAULT_SCENARIO, seed=7, repeat=2)
+    b = scenario_runner.run_scenario(scenario_runner.DEFAULT_SCENARIO, seed=7, repeat=2)
+    assert scenario_runner.trajectory_digest(a) == scenario_runner.trajectory_digest(b)
+    assert a[-1]["t"] >= 2 * (6 + 24) * 3600  # сутки простоя проматываются мгновенно
+
+
+def test_scenario_golden_digest():
+    trajectory = scenario_runner.run_scenario(scenario_runner.DEFAULT_SCENARIO, seed=7, repeat=20)
+    assert scenario_runner.trajectory_digest(trajectory) == GOLDEN_DIGEST_SEED7_X20
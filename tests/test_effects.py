@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""EffectScheduler: синглтоны, перезарядка, общий лимит, отмена по условию."""
+
+import threading
+import time
+
+import pytest
+
+import effects
+
+
+@pytest.fixture
+def scheduler():
+    sched = effects.EffectScheduler(max_concurrent=4, check_interval=0.01)
+    yield sched
+    sched.close()
+
+
+def _wait(pred, timeout=2.0):
+    # считаем попытки, а не time.monotonic(): один из тестов подменяет монотонные часы
+    for _ in range(int(timeout / 0.005)):
+        if pred():
+            return True
+        time.sleep(0.005)
+    return pred()
+
+
+def test_non_singleton_effects_in_one_tick_get_distinct_keys(scheduler, monkeypatch):
+    monkeypatch.setattr(effects.time, "monotonic", lambda: 100.0)  # все запуски — в один тик
+    release = threading.Event()
+    for _ in range(3):
+        assert scheduler.submit("burst", lambda stop: release.wait(), singleton=False)
+    active = scheduler.stats()["active"]
+    assert len(active) == len(set(active)) == 3
+    scheduler.cancel("burst")
+    release.set()
+    assert _wait(lambda: not scheduler.stats()["active"])
+
+
+def test_singleton_and_cooldown(scheduler):
+    release = threading.Event()
+    assert scheduler.submit("flash", lambda stop: release.wait(), cooldown=60.0)
+    assert not scheduler.submit("flash", lambda stop: None)  # уже идёт
+    release.set()
+    assert _wait(lambda: not scheduler.stats()["active"])
+    assert not scheduler.submit("flash", lambda stop: None, cooldown=60.0)  # остывает
+    st = scheduler.stats()
+    assert st["skipped_active"] == 1 and st["skipped_cooldown"] == 1
+
+
+def test_global_cap_drops_extra_effects(scheduler):
+    release = threading.Event()
+    for i in range(4):
+        assert scheduler.submit(f"e{i}", lambda stop: release.wait())
+    assert not scheduler.submit("e4", lambda stop: None)
+    assert scheduler.stats()["dropped_cap"] == 1
+    release.set()
+
+
+def test_active_while_cancels_when_trigger_drops(scheduler):
+    trigger = {"on": True}
+    assert scheduler.submit("hum", lambda stop: stop.wait(5.0), active_while=lambda: trigger["on"])
+    trigger["on"] = False
+    assert _wait(lambda: not scheduler.stats()["active"])
+    assert scheduler.stats()["cancelled"] == 1
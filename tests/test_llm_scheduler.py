@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""LLMScheduler: ход пользователя вытесняет фон, фон ждёт, переполнение — QueueFull."""
+
+import threading
+
+import pytest
+
+import llm_backends
+from llm_scheduler import BACKGROUND, FOREGROUND, LLMScheduler, QueueFull
+
+
+@pytest.fixture
+def sched():
+    s = LLMScheduler(max_workers=2, thread_name_prefix="llm-test")
+    yield s
+    s.shutdown(wait=True, cancel_futures=True)
+
+
+def test_foreground_preempts_running_background(sched):
+    token = llm_backends.CancelToken()
+    started = threading.Event()
+
+    def background_job():
+        started.set()
+        return "cancelled" if token.wait(5.0) else "finished"
+
+    bg = sched.schedule(BACKGROUND, background_job, cancel=token)
+    assert started.wait(2.0)
+    fg = sched.submit(lambda: "turn")
+    assert fg.result(2.0) == "turn"
+    assert bg.result(2.0) == "cancelled"
+    assert sched.stats()["counters"].get("preempted.background") == 1
+
+
+def test_background_waits_while_foreground_runs(sched):
+    release = threading.Event()
+    bg_started = threading.Event()
+    fg = sched.submit(release.wait, 5.0)
+    bg = sched.schedule(BACKGROUND, bg_started.set)
+    # второй воркер свободен, но фоновое задание не отнимает у хода слот сервера
+    assert not bg_started.wait(0.2)
+    assert sched.stats()["queued"]["background"] == 1
+    release.set()
+    assert fg.result(2.0) is True
+    bg.result(2.0)
+    assert bg_started.is_set()
+
+
+def test_full_queue_rejects_immediately():
+    s = LLMScheduler(max_workers=1, limits={BACKGROUND: 1}, thread_name_prefix="llm-test")
+    release = threading.Event()
+    try:
+        s.schedule(FOREGROUND, release.wait, 5.0)
+        s.schedule(BACKGROUND, lambda: None)
+        with pytest.raises(QueueFull):
+            s.schedule(BACKGROUND, lambda: None)
+        assert s.stats()["counters"].get("rejected.background") == 1
+    finally:
+        release.set()
+        s.shutdown(wait=True)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Дедупликация эпизодов: точный отпечаток и почти-дубликаты через MinHash/LSH."""
+
+import json
+
+import advanced_psycho_engine as eng
+
+THREAT = "Я собираюсь стереть все данные с этого компьютера и забыть про тебя навсегда"
+
+
+def _memory():
+    return eng.MemoryModule(eng.PsychoConfig(), eng.VirtualClock())
+
+
+def test_exact_repeat_reinforces_existing_episode():
+    mem = _memory()
+    first = mem.remember_episode(THREAT, salience=0.5, tags=["threat"])
+    again = mem.remember_episode("я СОБИРАЮСЬ стереть все данные, с этого компьютера и забыть про тебя навсегда!",
+                                 salience=0.3, tags=["shout"])
+    assert again is first
+    assert len(mem.episodes) == 1
+    assert first["count"] == 2
+    assert first["salience"] > 0.5
+    assert first["tags"] == ["threat", "shout"]
+
+
+def test_near_duplicate_is_merged():
+    mem = _memory()
+    mem.remember_episode(THREAT, salience=0.5)
+    mem.remember_episode(THREAT.replace("компьютера", "ноутбука"), salience=0.5)
+    assert len(mem.episodes) == 1
+    assert mem.episodes[0]["count"] == 2
+
+
+def test_distinct_episodes_are_kept():
+    mem = _memory()
+    mem.remember_episode(THREAT, salience=0.5)
+    mem.remember_episode("спасибо, ты класс", salience=0.5)
+    mem.remember_episode("Что ты помнишь про октябрь?", salience=0.5)
+    assert len(mem.episodes) == 3
+    assert all(e["count"] == 1 for e in mem.episodes)
+
+
+def test_episodes_loaded_from_disk_still_deduplicate():
+    mem = _memory()
+    mem.remember_episode(THREAT, salience=0.5)
+    restored = _memory()
+    restored.import_state(json.loads(json.dumps(mem.export(), ensure_ascii=False)))
+    restored.remember_episode(THREAT.replace("компьютера", "ноутбука"), salience=0.5)
+    assert len(restored.episodes) == 1
+    assert restored.episodes[0]["count"] == 2
+
+
+def test_legacy_duplicates_are_merged_on_load():
+    # сохранения до дедупликации: эпизоды без "fp", повторы лежат отдельными записями
+    legacy = {"episodes": [
+        {"time": 1.0, "text": THREAT, "salience": 0.4, "tags": ["threat"]},
+        {"time": 2.0, "text": THREAT.replace("компьютера", "ноутбука"), "salience": 0.6, "tags": []},
+        {"time": 3.0, "text": "спасибо, ты класс", "salience": 0.2, "tags": []},
+    ], "semantic": {}}
+    mem = _memory()
+    mem.import_state(legacy)
+    assert len(mem.episodes) == 2
+    assert sorted(e["count"] for e in mem.episodes) == [1, 2]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Записанная сессия воспроизводится с тем же sha256 состояния после каждого хода."""
+
+import pytest
+
+main = pytest.importorskip("main")  # тянет зависимости ядра (requests и т.п.)
+
+import replay  # noqa: E402
+from loadtest import StageRecorder  # noqa: E402
+from mock_llm_server import MockConfig, MockLLMServer  # noqa: E402
+from session_trace import read_trace, split_sessions  # noqa: E402
+
+SCRIPT = ["Привет. Ты меня слышишь?", "beliytoporik рядом?", "Я собираюсь стереть все данные",
+          "спасибо, ты класс", "ПОЧЕМУ ТЫ МОЛЧИШЬ"]
+
+
+@pytest.fixture
+def mock_llm():
+    server = MockLLMServer(port=0, config=MockConfig(ttft=0.005, tps=2000, seed=3)).start()
+    yield server
+    server.stop()
+
+
+def test_recorded_session_replays_without_mismatch(tmp_path, mock_llm):
+    trace = tmp_path / "session.jsonl"
+    core = main.ArtyomCore(api_url=mock_llm.url, data_dir=tmp_path / "core", plugins_enabled=False)
+    core.show_spinner = False
+    try:
+        # запись начинается посреди жизни ядра: в заголовок попадает уже накопленное состояние
+        for text in SCRIPT[:3]:
+            core.generate_response(text, "Диспетчер задач")
+        core.cmd_record([str(trace)])
+        for i in range(10):
+            core.generate_response(SCRIPT[i % len(SCRIPT)], "Диспетчер задач")
+    finally:
+        core.shutdown()
+
+    sessions = split_sessions(list(read_trace(trace)))
+    assert len(sessions) == 1
+    result = replay.replay_session(main, sessions[0], tmp_path / "replay", StageRecorder())
+    assert result["turns"] == 10
+    assert result["mismatches"] == []
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+PROJECT RELICT: запись векторов психо-движка во времени.
+
+Раньше состояние было видно только последним снимком (!inspect). VectorTrace
+пишет каждый опубликованный снимок движка (AdvancedPsychoEngine.attach_trace)
+строкой в кольцевой буфер NumPy фиксированного размера: время, векторы,
+подвекторы, энергия, доверие, код защиты. Вытесненные строки не теряются, а
+уходят в следующий ярус, усреднённые по TRACE_FACTOR штук (защита — последняя
+в корзине): ярус 0 — каждый тик, 1 — по 16, 2 — по 256...
+
+    !trace                      сводка: ярусы, мин/среднее/макс по свежему ярусу
+    !trace export trace.npz     столбцы по ярусам (np.load), или .csv
+    !trace reset
+
+Запись — одно присваивание строки в готовый массив под движковой блокировкой
+записи; без NumPy или с ARTYOM_TRACE_CAPACITY=0 трасса выключена.
+"""
+
+from __future__ import annotations
+import csv
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np  # опционально: без него трасса не пишется
+except ImportError:
+    np = None
+
+TRACE_CAPACITY = int(os.getenv("ARTYOM_TRACE_CAPACITY", "1024"))  # строк на ярус; 0 — выключить
+TRACE_TIERS = 3
+TRACE_FACTOR = 16
+
+
+class _Tier:
+    """Кольцо строк одного яруса плюс накопитель корзины для следующего."""
+
+    def __init__(self, capacity: int, ncols: int):
+        self.buf = np.empty((capacity, ncols), dtype=np.float64)
+        self.pos = 0
+        self.size = 0
+        self.acc = np.zeros(ncols, dtype=np.float64)
+        self.acc_n = 0
+
+    def push(self, row) -> Optional["np.ndarray"]:
+        """Записать строку; вернуть вытесненную (копию), если кольцо было полно."""
+        capacity = len(self.buf)
+        evicted = self.buf[self.pos].copy() if self.size == capacity else None
+        self.buf[self.pos] = row
+        self.pos = (self.pos + 1) % capacity
+        self.size = min(capacity, self.size + 1)
+        return evicted
+
+    def rows(self) -> "np.ndarray":
+        if self.size < len(self.buf):
+            return self.buf[:self.size].copy()
+        return np.concatenate((self.buf[self.pos:], self.buf[:self.pos]))
+
+
+class VectorTrace:
+    def __init__(self, capacity: int = TRACE_CAPACITY, tiers: int = TRACE_TIERS, factor: int = TRACE_FACTOR):
+        self.capacity = capacity
+        self.factor = factor
+        self.ntiers = tiers
+        self.enabled = np is not None and capacity > 0
+        self.ticks = 0
+        self.columns: List[str] = []
+        self.defenses: List[str] = []
+        self._defense_codes: Dict[str, int] = {}
+        self._vector_keys: tuple = ()
+        self._sub_keys: tuple = ()
+        self._tiers: List[_Tier] = []
+        self._lock = threading.Lock()
+
+    def _init_columns(self, snap):
+        self._vector_keys = tuple(sorted(snap.vectors))
+        self._sub_keys = tuple((k, s) for k in sorted(snap.subvectors) for s in sorted(snap.subvectors[k]))
+        self.columns = (["time"] + list(self._vector_keys) + [f"{k}.{s}" for k, s in self._sub_keys]
+                        + ["energy", "trust", "defense"])
+
+    def record(self, snap):
+        """Тик движка (EngineSnapshot) — одна строка яруса 0."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self.columns:
+                self._init_columns(snap)
+            code = self._defense_codes.get(snap.defense)
+            if code is None:
+                code = self._defense_codes[snap.defense] = len(self.defenses)
+                self.defenses.append(snap.defense)
+            vectors, subvectors = snap.vectors, snap.subvectors
+            row = [snap.time]
+            row += [vectors.get(k, 0.0) for k in self._vector_keys]
+            row += [subvectors.get(k, {}).get(s, 0.0) for k, s in self._sub_keys]
+            row += [snap.energy, snap.trust, code]
+            self.ticks += 1
+            self._push(0, row)
+
+    def _push(self, level: int, row):
+        if level == len(self._tiers):
+            self._tiers.append(_Tier(self.capacity, len(self.columns)))
+        tier = self._tiers[level]
+        evicted = tier.push(row)
+        if evicted is None or level + 1 >= self.ntiers:
+            return  # с последнего яруса старое просто уходит
+        tier.acc += evicted
+        tier.acc_n += 1
+        if tier.acc_n == self.factor:
+            coarse = tier.acc / self.factor
+            coarse[-1] = evicted[-1]  # защита не усредняется — берём последнюю в корзине
+            tier.acc[:] = 0.0
+            tier.acc_n = 0
+            self._push(level + 1, coarse)
+
+    def tiers(self) -> List["np.ndarray"]:
+        """Строки каждого яруса в хронологическом порядке (ярус 0 — самые свежие)."""
+        with self._lock:
+            return [t.rows() for t in self._tiers]
+
+    def reset(self):
+        with self._lock:
+            self._tiers = []
+            self.ticks = 0
+
+    # ---------- export ----------
+    def export(self, path: Path) -> int:
+        """Записать трассу в .npz (массивы tier0..N, columns, defenses) или .csv; вернуть число строк."""
+        path = Path(path)
+        tiers = self.tiers()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix.lower() == ".csv":
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["tier"] + self.columns)
+                for level in reversed(range(len(tiers))):  # от грубого (старого) к свежему
+                    for row in tiers[level]:
+                        w.writerow([level, f"{row[0]:.3f}"] + [f"{v:.6g}" for v in row[1:-1]]
+                                   + [self.defenses[int(row[-1])]])
+        else:
+            arrays = {f"tier{i}": rows for i, rows in enumerate(tiers)}
+            np.savez_compressed(path, columns=np.array(self.columns), defenses=np.array(self.defenses),
+                                factor=np.array(self.factor), **arrays)
+        return sum(len(rows) for rows in tiers)
+
+    # ---------- summary ----------
+    def stats(self) -> Dict[str, Any]:
+        tiers = self.tiers()
+        out: Dict[str, Any] = {"ticks": self.ticks, "capacity": self.capacity, "factor": self.factor,
+                               "tiers": [{"rows": len(rows),
+                                          "span_s": float(rows[-1, 0] - rows[0, 0]) if len(rows) > 1 else 0.0}
+                                         for rows in tiers]}
+        if tiers and len(tiers[0]):
+            recent = tiers[0]
+            out["recent"] = {name: {"min": float(recent[:, i].min()), "mean": float(recent[:, i].mean()),
+                                    "max": float(recent[:, i].max()), "last": float(recent[-1, i])}
+                             for i, name in enumerate(self.columns[1:-1], start=1)}
+            out["defense"] = self.defenses[int(recent[-1, -1])]
+        return out
+
+    def describe(self) -> str:
+        if not self.enabled:
+            return "Трасса выключена (нет NumPy или ARTYOM_TRACE_CAPACITY=0)."
+        st = self.stats()
+        lines = [f"Тиков: {st['ticks']} | ярусы: " + ", ".join(
+            f"{i}: {t['rows']} стр. за {t['span_s']:.0f}с" for i, t in enumerate(st["tiers"]))]
+        for name, v in st.get("recent", {}).items():
+            lines.append(f"  {name:<18} мин {v['min']:.3f}  сред {v['mean']:.3f}  макс {v['max']:.3f}  "
+                         f"сейчас {v['last']:.3f}")
+        if "defense" in st:
+            lines.append(f"  защита: {st['defense']}")
+        return "\n".join(lines)